@@ -0,0 +1,82 @@
+"""
+Extended-Precision Operations Benchmark
+
+Times power, root, modulo and factorial at 50, 500 and 5000 digits of
+precision, next to straightforward baselines (Decimal's ln/exp for roots,
+Decimal's ** for fractional powers, one-at-a-time multiplication for integer
+powers and factorials).
+
+Usage: python benchmarks/bench_operations.py [repeat]
+"""
+import os
+import sys
+import time
+from decimal import Decimal, localcontext
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from calculator.operation import power, root, modulo, factorial
+
+PRECISIONS = (50, 500, 5000)
+
+def naive_power(base, exponent):
+    """Baseline: multiply exponent times."""
+    result = Decimal(1)
+    for _ in range(exponent):
+        result *= base
+    return result
+
+def naive_root(value, degree):
+    """Baseline: exp(ln(x) / n) at the working precision."""
+    return (value.ln() / degree).exp()
+
+def naive_factorial(number):
+    """Baseline: multiply 1 * 2 * ... * n in Decimal arithmetic."""
+    result = Decimal(1)
+    for i in range(2, number + 1):
+        result *= i
+    return result
+
+# Built from an int so every digit is kept whatever the working precision
+BIG_DIVIDEND = Decimal(10 ** 4000 + 1)
+
+CASES = [
+    ("power 1.0001^5000", lambda: power(Decimal('1.0001'), Decimal(5000)),
+     lambda: naive_power(Decimal('1.0001'), 5000)),
+    ("power 2^0.5", lambda: power(Decimal(2), Decimal('0.5')),
+     lambda: Decimal(2) ** Decimal('0.5')),
+    ("root sqrt(2)", lambda: root(Decimal(2), Decimal(2)), lambda: naive_root(Decimal(2), 2)),
+    ("root 7th root of 10", lambda: root(Decimal(10), Decimal(7)),
+     lambda: naive_root(Decimal(10), 7)),
+    ("root 2.5th root of 16", lambda: root(Decimal(16), Decimal('2.5')),
+     lambda: Decimal(16) ** Decimal('0.4')),
+    # No baseline: Decimal's % raises DivisionImpossible when the quotient needs more digits
+    ("modulo (10^4000+1) % 7", lambda: modulo(BIG_DIVIDEND, Decimal(7)), None),
+    ("factorial 2000!", lambda: factorial(Decimal(2000)), lambda: naive_factorial(2000)),
+]
+
+def best_time(function, repeat):
+    """Best wall-clock time of several runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main(repeat=5):
+    """Run every case at every precision and print a table."""
+    print(f"{'case':<26}{'digits':>8}{'ms':>12}{'baseline ms':>14}")
+    for name, function, baseline in CASES:
+        for precision in PRECISIONS:
+            with localcontext() as ctx:
+                ctx.prec = precision
+                elapsed = best_time(function, repeat)
+                baseline_elapsed = best_time(baseline, repeat) if baseline else None
+            baseline_text = f"{baseline_elapsed:14.3f}" if baseline_elapsed is not None else \
+                f"{'-':>14}"
+            print(f"{name:<26}{precision:>8}{elapsed:12.3f}{baseline_text}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,308 @@
+"""
+Load Generator and Soak Test
+
+Simulates concurrent users, one thread each, driving either the Calculator
+facade or the REPL CommandHandler with a weighted mix of operations and
+history commands. Operands come from the Faker-based generator in
+test/conftest.py. A run lasts for a fixed duration or a fixed number of
+operations. It reports throughput, latency percentiles per command, RSS and
+history size over time, and RSS growth, which is how memory leaks and
+throughput cliffs show up before production finds them.
+
+A call that raises counts as an error, and so does a REPL command whose
+output reports a failure, since commands print their errors rather than
+raise them.
+
+Usage: python benchmarks/load_test.py [--users N] [--duration S | --count N]
+           [--mode facade|repl] [--mix addition=4,division=1,history=1]
+"""
+import io
+import os
+import re
+import sys
+import time
+import random
+import logging
+import argparse
+import itertools
+import threading
+from contextlib import contextmanager, redirect_stdout
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from calculator import Calculator
+from calculator.commands.command_handler import CommandHandler
+from calculator.history_sessions import current_history
+from calculator.history_stats import QuantileSketch
+from calculator.operation import OPERATIONS
+from test.conftest import create_test_cases
+
+DEFAULT_MIX = "addition=4,subtraction=4,multiplication=4,division=4,power=1,root=1,modulo=1," \
+              "factorial=1,history=1"
+OPERAND_POOL_SIZE = 2000
+QUANTILES = (0.5, 0.95, 0.99)
+
+# REPL spelling of each operation; factorial takes a single operand
+REPL_COMMANDS = {
+    'addition': 'add', 'subtraction': 'sub', 'multiplication': 'mul', 'division': 'div',
+    'power': 'pow', 'root': 'root', 'modulo': 'mod', 'factorial': 'fact',
+}
+REPL_HISTORY_COMMANDS = ('history stats', 'history page 1', 'history filter addition',
+                         'history rollup minute')
+FACADE_HISTORY_CALLS = (
+    lambda: current_history().get_statistics(),
+    lambda: current_history().get_window(len(current_history()) - 10, len(current_history())),
+    lambda: current_history().filter_by_operation('addition'),
+    lambda: current_history().get_rollup('minute'),
+)
+# What a REPL command prints when it fails; operations print "Result:" when they succeed
+REPL_FAILURE = re.compile(r"error|failed|invalid|unknown command|too many arguments",
+                          re.IGNORECASE)
+
+class CommandFailed(Exception):
+    """A REPL command whose output reported a failure."""
+
+class UserOutput(io.TextIOBase):
+    """Stand-in for sys.stdout that keeps what each user thread prints while capturing."""
+
+    def __init__(self):
+        """Start with no thread capturing."""
+        super().__init__()
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        """Keep the text if the calling thread is capturing, otherwise drop it."""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            buffer.write(text)
+        return len(text)
+
+    @contextmanager
+    def capture(self):
+        """Collect what the calling thread prints inside the block."""
+        self._local.buffer = buffer = io.StringIO()
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+user_output = UserOutput()
+
+class Sample(NamedTuple):
+    """Process state at one point of the run."""
+    elapsed: float
+    operations: int
+    rss_bytes: int
+    history_records: int
+
+class LoadReport(NamedTuple):
+    """Outcome of a load run."""
+    users: int
+    mode: str
+    operations: int
+    errors: int
+    seconds: float
+    latencies: Dict[str, Dict[str, float]]
+    samples: List[Sample]
+
+    @property
+    def per_second(self) -> float:
+        """Operations per second over the whole run."""
+        return self.operations / self.seconds if self.seconds else 0.0
+
+    @property
+    def rss_growth(self) -> int:
+        """RSS at the end of the run minus RSS at the start, in bytes."""
+        return self.samples[-1].rss_bytes - self.samples[0].rss_bytes
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse 'name=weight,...' where each name is an operation or 'history'."""
+    mix = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, weight = item.partition('=')
+        if name not in OPERATIONS and name != 'history':
+            raise ValueError(f"Unknown mix entry '{name}'")
+        mix[name] = float(weight) if weight else 1.0
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("The mix needs at least one entry with a positive weight")
+    return mix
+
+def make_operands(count: int) -> List[Tuple]:
+    """Generate operand pairs with the Faker-based test case generator."""
+    return [(value1, value2) for value1, value2, *_ in create_test_cases(count)]
+
+def current_rss() -> int:
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource  # pylint: disable=import-outside-toplevel
+        # Peak rather than current RSS, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+class User:
+    """One simulated user issuing a weighted mix of commands in a loop."""
+
+    def __init__(self, user_id: int, mode: str, mix: Dict[str, float], operands: List[Tuple]):
+        """Set up the user's random stream, handler and latency sketches."""
+        self.random = random.Random(user_id)
+        self.mode = mode
+        self.kinds = list(mix)
+        self.weights = list(mix.values())
+        self.operands = operands
+        self.handler = CommandHandler() if mode == 'repl' else None
+        self.sketches = {kind: QuantileSketch() for kind in self.kinds}
+        self._buffers: Dict[str, List[float]] = {kind: [] for kind in self.kinds}
+        self.operations = 0
+        self.errors = 0
+
+    def _execute(self, kind: str) -> None:
+        """Issue one command of the given kind."""
+        if kind == 'history':
+            if self.mode == 'repl':
+                self._execute_line(self.random.choice(REPL_HISTORY_COMMANDS), False)
+            else:
+                self.random.choice(FACADE_HISTORY_CALLS)()
+            return
+        value1, value2 = self.random.choice(self.operands)
+        if self.mode == 'repl':
+            operands = f"{value1}" if kind == 'factorial' else f"{value1} {value2}"
+            self._execute_line(f"{REPL_COMMANDS[kind]} {operands}", True)
+        else:
+            Calculator.execute_operation(value1, value2, OPERATIONS[kind])
+
+    def _execute_line(self, line: str, prints_result: bool) -> None:
+        """Run a REPL command line, raising CommandFailed if its output reports a failure."""
+        with user_output.capture() as output:
+            self.handler.execute_command(line)
+        text = output.getvalue()
+        if REPL_FAILURE.search(text) or (prints_result and "Result:" not in text):
+            raise CommandFailed(f"{line}: {text.strip()}")
+
+    def run(self, budget, deadline: Optional[float]) -> None:
+        """Issue commands until the shared budget or the deadline runs out."""
+        while True:
+            for kind in self.random.choices(self.kinds, self.weights, k=100):
+                if (deadline is not None and time.perf_counter() >= deadline) or \
+                   (budget is not None and next(budget) <= 0):
+                    for pending in self.kinds:
+                        self._fold(pending)
+                    return
+                started = time.perf_counter()
+                try:
+                    self._execute(kind)
+                except Exception:  # pylint: disable=broad-exception-caught
+                    # Division by zero and the like, but also bugs: count them, keep going
+                    self.errors += 1
+                buffer = self._buffers[kind]
+                buffer.append(time.perf_counter() - started)
+                self.operations += 1
+                if len(buffer) >= 1000:
+                    self._fold(kind)
+
+    def _fold(self, kind: str) -> None:
+        """Move buffered latencies into the bounded-memory sketch."""
+        if self._buffers[kind]:
+            self.sketches[kind].update(np.array(self._buffers[kind]))
+            self._buffers[kind] = []
+
+def _latency_table(users: List[User]) -> Dict[str, Dict[str, float]]:
+    """Merge the users' sketches into per-kind and overall latency percentiles in ms."""
+    merged: Dict[str, QuantileSketch] = {}
+    overall = QuantileSketch()
+    for user in users:
+        for kind, sketch in user.sketches.items():
+            merged.setdefault(kind, QuantileSketch()).merge(sketch)
+            overall.merge(sketch)
+    merged['all'] = overall
+    return {kind: {'count': sketch.count,
+                   **{f"p{q * 100:g} ms": sketch.quantile(q) * 1000 for q in QUANTILES}}
+            for kind, sketch in merged.items() if sketch.count}
+
+def run_load(users: int = 4, mode: str = 'facade', mix: Optional[Dict[str, float]] = None,
+             duration: Optional[float] = 10.0, count: Optional[int] = None,
+             sample_interval: float = 1.0) -> LoadReport:
+    """Run users concurrently for duration seconds or count operations in total."""
+    mix = mix or parse_mix(DEFAULT_MIX)
+    operands = make_operands(OPERAND_POOL_SIZE)
+    simulated = [User(user_id, mode, mix, operands) for user_id in range(users)]
+    # next() on itertools.count is atomic, so users can share it as a countdown
+    budget = itertools.count(count, -1) if count is not None else None
+    done = threading.Event()
+    started = time.perf_counter()
+    deadline = started + duration if count is None and duration is not None else None
+
+    def sample() -> Sample:
+        return Sample(time.perf_counter() - started, sum(user.operations for user in simulated),
+                      current_rss(), len(current_history()))
+
+    samples = [sample()]
+
+    def sampler():
+        while not done.wait(sample_interval):
+            samples.append(sample())
+
+    threads = [threading.Thread(target=user.run, args=(budget, deadline))
+               for user in simulated]
+    sampler_thread = threading.Thread(target=sampler, daemon=True)
+    with redirect_stdout(user_output):
+        sampler_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    done.set()
+    sampler_thread.join()
+    seconds = time.perf_counter() - started
+    samples.append(sample())
+    return LoadReport(users, mode, samples[-1].operations, sum(user.errors for user in simulated),
+                      seconds, _latency_table(simulated), samples)
+
+def print_report(report: LoadReport) -> None:
+    """Print throughput, latency percentiles and the RSS/history timeline."""
+    print(f"{report.users} users ({report.mode}): {report.operations} operations in "
+          f"{report.seconds:.2f}s, {report.per_second:.0f} ops/s, {report.errors} errors")
+    rows = [{'command': kind, **latencies} for kind, latencies in report.latencies.items()]
+    print(tabulate(rows, headers='keys', tablefmt='simple', floatfmt='.3f'))
+    print()
+    print(tabulate([{'seconds': s.elapsed, 'operations': s.operations,
+                     'rss MiB': s.rss_bytes / 2 ** 20, 'history records': s.history_records}
+                    for s in report.samples], headers='keys', tablefmt='simple', floatfmt='.1f'))
+    first, last = report.samples[0], report.samples[-1]
+    added = last.history_records - first.history_records
+    per_record = f", {report.rss_growth / added:.0f} bytes per added record" if added else ""
+    print(f"\nRSS growth: {report.rss_growth / 2 ** 20:.1f} MiB{per_record}; "
+          f"history grew from {first.history_records} to {last.history_records} records")
+
+def main(argv=None):
+    """Parse arguments, run the load and print the report."""
+    parser = argparse.ArgumentParser(description="Simulate concurrent calculator users.")
+    parser.add_argument('--users', type=int, default=4, help="concurrent simulated users")
+    parser.add_argument('--mode', choices=['facade', 'repl'], default='facade',
+                        help="drive the Calculator facade or the REPL command handler")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help="weighted operations and 'history', e.g. addition=4,history=1")
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    limit.add_argument('--count', type=int, help="total operations to run instead")
+    parser.add_argument('--sample-interval', type=float, default=1.0,
+                        help="seconds between RSS and history size samples")
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    # The REPL logs every command at INFO; keep the log out of the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    report = run_load(args.users, args.mode, mix, args.duration, args.count,
+                      args.sample_interval)
+    print_report(report)
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,42 @@
 """My Calculator"""
 from decimal import Decimal
 from typing import Callable
+from .jobs import checkpoint
 from .operation import addition, subtraction, multiplication, division
+from .operation import power, root, modulo, factorial
 from .calculation import Calculation
 from .calculations import Calculations
-# Import our history manager
-from .history_manager import history_manager
 
 class Calculator:
     """Calculator class"""
 
     @staticmethod
     def execute_operation(value1: Decimal, value2: Decimal,
-                         operation: Callable[[Decimal, Decimal], Decimal]) -> Decimal:
-        """Create and perform a calculation, then return the result."""
+                         operation: Callable[[Decimal, Decimal], Decimal],
+                         record: bool = True) -> Decimal:
+        """Create and perform a calculation, then return the result.
+
+        With record=False the calculation is not added to the history, which
+        keeps memory flat when streaming large batches.
+        """
         calculation = Calculation.create(value1, value2, operation)
-        Calculations.add_calculation(calculation)
-        # Add to pandas history manager
-        history_manager.add_calculation(calculation)
-        return calculation.perform()
+        result = calculation.perform()
+        # A background job stopped while this ran ends here, without recording its result
+        checkpoint()
+        if record:
+            # Calculations is a view of the history manager's store, so this records it once
+            Calculations.add_calculation(calculation, result)
+        return result
+
+    @staticmethod
+    def session(session_id: str):
+        """Return a context manager that records calculations made in it in the session's history.
+
+        Use as 'with Calculator.session("alice"): ...'; see calculator.history_sessions.
+        """
+        # Imported on use so importing calculator does not create the history managers
+        from calculator.history_sessions import history_session  # pylint: disable=import-outside-toplevel
+        return history_session(session_id)
 
     @staticmethod
     def add_numbers(value1: Decimal, value2: Decimal) -> Decimal:
@@ -39,3 +57,23 @@ class Calculator:
     def divide_numbers(value1: Decimal, value2: Decimal) -> Decimal:
         """Division operation"""
         return Calculator.execute_operation(value1, value2, division)
+
+    @staticmethod
+    def power_numbers(value1: Decimal, value2: Decimal) -> Decimal:
+        """Power operation"""
+        return Calculator.execute_operation(value1, value2, power)
+
+    @staticmethod
+    def root_numbers(value1: Decimal, value2: Decimal) -> Decimal:
+        """Root operation: the value2-th root of value1"""
+        return Calculator.execute_operation(value1, value2, root)
+
+    @staticmethod
+    def modulo_numbers(value1: Decimal, value2: Decimal) -> Decimal:
+        """Modulo operation"""
+        return Calculator.execute_operation(value1, value2, modulo)
+
+    @staticmethod
+    def factorial_number(value: Decimal) -> Decimal:
+        """Factorial operation (recorded with a second value of 0)"""
+        return Calculator.execute_operation(value, Decimal(0), factorial)
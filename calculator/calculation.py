@@ -1,11 +1,95 @@
 """Module for handling arithmetic calculations."""
+from collections.abc import Sequence
 from decimal import Decimal
-from typing import Callable
+from typing import Callable, Iterable, Iterator, List, Mapping, Optional
+from calculator.operation import OPERATIONS
+
+class CalculationHistory(Sequence):
+    """List-like view of the shared calculation history as Calculation objects.
+
+    Nothing is stored here: Calculation objects are rebuilt from the records
+    of the history manager when they are read, so every calculation is kept
+    once, in the manager's compact store.
+    """
+
+    @staticmethod
+    def _manager():
+        """Return the active session's history manager, or the process-wide one."""
+        # Imported on use because the history manager module imports this one
+        from calculator.history_sessions import current_history  # pylint: disable=import-outside-toplevel
+        return current_history()
+
+    def __len__(self) -> int:
+        """Return the number of calculations in the history."""
+        return len(self._manager())
+
+    def __getitem__(self, index):
+        """Return one calculation, or a list of them for a slice."""
+        manager = self._manager()
+        total = len(manager)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(total)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return [Calculation.from_record(record)
+                    for record in manager.get_window(start, stop).to_dict('records')]
+        if index < 0:
+            index += total
+        if not 0 <= index < total:
+            raise IndexError("calculation index out of range")
+        return Calculation.from_record(manager.get_window(index, index + 1).iloc[0])
+
+    def __iter__(self) -> Iterator["Calculation"]:
+        """Iterate over the history chunk by chunk."""
+        for chunk in self._manager().iter_chunks():
+            for record in chunk.to_dict('records'):
+                yield Calculation.from_record(record)
+
+    def append(self, calculation: "Calculation", result: Optional[Decimal] = None) -> None:
+        """Record a calculation, with its result if it is already known."""
+        self._manager().add_calculation(calculation, result)
+
+    def extend(self, calculations: Iterable["Calculation"]) -> None:
+        """Record several calculations."""
+        for calculation in calculations:
+            self.append(calculation)
+
+    def clear(self) -> None:
+        """Remove every calculation from the history."""
+        self._manager().clear_history()
+
+    def by_operation(self, operation_name: str) -> List["Calculation"]:
+        """Return the calculations of one operation."""
+        records = self._manager().filter_by_operation(operation_name)
+        return [Calculation.from_record(record) for record in records.to_dict('records')]
+
+def _recorded_operation(name: str,
+                        record: Mapping[str, str]) -> Callable[[Decimal, Decimal], Decimal]:
+    """Stand-in for an operation that is in stored history but not in OPERATIONS.
+
+    Custom and plugin operations are not importable by name, so instead of
+    re-executing, the stand-in returns the result stored with the record for
+    the recorded operands. Any other operands, or a record without a usable
+    result, raise ValueError as an unknown operation would.
+    """
+    try:
+        operands = (Decimal(record['value1']), Decimal(record['value2']))
+        result = Decimal(record['result'])
+    except (KeyError, TypeError, ArithmeticError):
+        operands, result = None, None
+    if result is not None and not result.is_finite():
+        result = None
+    def operation(value1: Decimal, value2: Decimal) -> Decimal:
+        if result is None or (value1, value2) != operands:
+            raise ValueError(f"Unknown operation: {name}")
+        return result
+    operation.__name__ = name
+    return operation
 
 class Calculation:
     """A class to represent a calculation operation between two decimal values."""
 
-    history = [] # Class-level variable to hold history of calculations
+    history = CalculationHistory() # Class-level view of the shared calculation history
 
     def __init__(self, value1: Decimal, value2: Decimal,
                  operation: Callable[[Decimal, Decimal], Decimal]):
@@ -24,6 +108,13 @@ class Calculation:
         """Create a new calculation instance"""
         return Calculation(value1, value2, operation)
 
+    @staticmethod
+    def from_record(record: Mapping[str, str]) -> "Calculation":
+        """Rebuild a calculation from a stored history record."""
+        name = record['operation']
+        operation = OPERATIONS.get(name) or _recorded_operation(name, record)
+        return Calculation(Decimal(record['value1']), Decimal(record['value2']), operation)
+
     def perform(self) -> Decimal:
         """Execute the calculation"""
         return self.operation(self.value1, self.value2)
@@ -31,7 +122,18 @@ class Calculation:
     @classmethod
     def clear_history(cls):
         """Clears the calculation history."""
-        cls.history = []
+        cls.history.clear()
+
+    def __eq__(self, other) -> bool:
+        """Calculations are equal when their values and operation are."""
+        if not isinstance(other, Calculation):
+            return NotImplemented
+        return (self.value1, self.value2, self.operation.__name__) == \
+               (other.value1, other.value2, other.operation.__name__)
+
+    def __hash__(self) -> int:
+        """Hash consistently with __eq__."""
+        return hash((self.value1, self.value2, self.operation.__name__))
 
     def __repr__(self) -> str:
         """Return string representation of the calculation"""
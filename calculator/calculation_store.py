@@ -0,0 +1,115 @@
+"""
+Calculation Store Module
+
+The single in-memory store of calculation records. HistoryManager keeps its
+history here, and Calculations and Calculation.history are views of the same
+records, so a calculation is stored once, in the compact column types of
+calculator.history_dtypes.
+
+Appends go to a short list of text records that is encoded into a chunk
+in one step when the list reaches TAIL_LIMIT records. Chunks are merged
+only with neighbours no larger than themselves, so their sizes grow
+geometrically: there are O(log N) of them and each record is copied
+O(log N) times, instead of the whole frame every TAIL_LIMIT appends. The
+chunks are concatenated into one frame when the whole history is read.
+Windows (pages, the latest calculation) are served from the chunks and
+the list without compacting, so alternating appends and window reads
+stay cheap.
+"""
+import threading
+from typing import Dict, List, Tuple
+import pandas as pd
+from calculator.history_dtypes import COLUMNS, Scales, concat_frames, encode_frame
+
+TAIL_LIMIT = 1024
+# Approximate memory of one uncompacted record: a dict of five strings
+TAIL_RECORD_BYTES = 500
+
+class CalculationStore:
+    """Thread-safe columnar store of calculation records."""
+
+    def __init__(self):
+        """Start with no records."""
+        self._lock = threading.RLock()
+        # Encoded chunks in record order, each no larger than the one before it
+        self._chunks: List[Tuple[pd.DataFrame, Scales]] = [
+            encode_frame(pd.DataFrame(columns=COLUMNS))]
+        self._size = 0
+        self._tail: List[Dict[str, str]] = []
+
+    def __len__(self) -> int:
+        """Return the number of records, including ones not yet compacted."""
+        with self._lock:
+            return self._size + len(self._tail)
+
+    def memory_usage(self) -> int:
+        """Estimate the bytes held, without compacting the tail."""
+        with self._lock:
+            return (sum(int(frame.memory_usage(deep=True).sum()) for frame, _ in self._chunks)
+                    + len(self._tail) * TAIL_RECORD_BYTES)
+
+    def append(self, record: Dict[str, str]) -> None:
+        """Append one text record."""
+        with self._lock:
+            self._tail.append(record)
+            if len(self._tail) >= TAIL_LIMIT:
+                self._seal()
+
+    def _seal(self) -> None:
+        """Encode the pending tail records into a chunk, merging chunks of similar size."""
+        if self._tail:
+            self._chunks.append(encode_frame(pd.DataFrame(self._tail, columns=COLUMNS)))
+            self._size += len(self._tail)
+            self._tail = []
+            while len(self._chunks) > 1 and len(self._chunks[-1][0]) >= len(self._chunks[-2][0]):
+                last = self._chunks.pop()
+                self._chunks[-1] = concat_frames([self._chunks[-1], last])
+
+    def _compact(self) -> None:
+        """Encode the tail and concatenate every chunk into one frame."""
+        self._seal()
+        if len(self._chunks) > 1:
+            self._chunks = [concat_frames(self._chunks)]
+
+    def window(self, start: int, stop: int) -> Tuple[pd.DataFrame, Scales]:
+        """Return the records in positions [start, stop), indexed by position.
+
+        Records still in the tail are encoded for the window only; the store
+        itself is left as it is.
+        """
+        with self._lock:
+            chunks, size = list(self._chunks), self._size
+            start = max(0, start)
+            stop = max(start, min(stop, size + len(self._tail)))
+            tail = self._tail[max(start - size, 0):max(stop - size, 0)]
+        parts, offset = [], 0
+        for frame, scales in chunks:
+            if offset < stop and start < offset + len(frame):
+                parts.append((frame.iloc[max(start - offset, 0):stop - offset], scales))
+            offset += len(frame)
+        if tail:
+            parts.append(encode_frame(pd.DataFrame(tail, columns=COLUMNS)))
+        if len(chunks) == 1 and not tail:
+            # Positions in a single chunk are already its index
+            return chunks[0][0].iloc[start:stop], chunks[0][1]
+        if not parts:
+            return chunks[0][0].iloc[0:0], chunks[0][1]
+        window, window_scales = concat_frames(parts)
+        window.index = pd.RangeIndex(start, stop)
+        return window, window_scales
+
+    def snapshot(self) -> Tuple[pd.DataFrame, Scales]:
+        """Return the records and their scales as one consistent pair.
+
+        The frame is never modified in place, so the snapshot stays valid
+        after later appends or replacements.
+        """
+        with self._lock:
+            self._compact()
+            return self._chunks[0]
+
+    def replace(self, frame: pd.DataFrame, scales: Scales) -> None:
+        """Replace all records with an already encoded frame."""
+        with self._lock:
+            self._chunks, self._size = [(frame, scales)], len(frame)
+            self._tail = []
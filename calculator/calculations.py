@@ -1,19 +1,24 @@
 """Module for managing calculation history"""
-from typing import List
+from decimal import Decimal
+from typing import List, Optional, Sequence
 from calculator.calculation import Calculation
 
 class Calculations:
-    """Class to store and manage calculation history"""
+    """Class to store and manage calculation history
 
-    history: List[Calculation] = []
+    A view of the history manager's records, shared with Calculation.history,
+    so the two can never disagree.
+    """
+
+    history = Calculation.history
 
     @classmethod
-    def add_calculation(cls, calculation: Calculation):
+    def add_calculation(cls, calculation: Calculation, result: Optional[Decimal] = None):
         """Add a new calculation to the history."""
-        cls.history.append(calculation)
+        cls.history.append(calculation, result)
 
     @classmethod
-    def get_history(cls) -> List[Calculation]:
+    def get_history(cls) -> Sequence[Calculation]:
         """Retrieve the entire history of calculations."""
         return cls.history
 
@@ -25,11 +30,11 @@ class Calculations:
     @classmethod
     def get_latest(cls) -> Calculation:
         """Get the latest calculation. Returns None if there's no history."""
-        if cls.history:
+        if len(cls.history):
             return cls.history[-1]
         return None
 
     @classmethod
     def find_by_operation(cls, operation_name: str) -> List[Calculation]:
         """Find calculations by operation name."""
-        return [calc for calc in cls.history if calc.operation.__name__ == operation_name]
+        return cls.history.by_operation(operation_name)
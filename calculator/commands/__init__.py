@@ -9,12 +9,9 @@ import os
 import sys
 import logging
 from dotenv import load_dotenv, dotenv_values
-from calculator.plugins.addition import AdditionCommand
-from calculator.plugins.substraction import SubtractionCommand
-from calculator.plugins.multiplication import MultiplicationCommand
-from calculator.plugins.division import DivisionCommand
 from calculator.plugins.menu_command import MenuCommand
 from calculator.commands.command_handler import CommandHandler
+from calculator.history_manager import history_manager
 
 # Ensure logs directory exists
 os.makedirs("logs", exist_ok=True)
@@ -40,23 +37,15 @@ logging.info("Host: %s, Port: %s", os.getenv('Host'), os.getenv('Port'))
 
 def start():
     """Start the calculator REPL with logging and error handling."""
-    command_handler = CommandHandler()
+    # Heavy commands run on background workers; COMMAND_WORKERS=0 runs everything inline
+    timeout = os.getenv("COMMAND_TIMEOUT")
+    command_handler = CommandHandler(workers=int(os.getenv("COMMAND_WORKERS", "2")),
+                                     timeout=float(timeout) if timeout else None,
+                                     session=os.getenv("CALCULATOR_SESSION") or None)
 
-    # Register commands with validation to avoid duplicates
-    commands = {
-        "add": AdditionCommand(),
-        "subtract": SubtractionCommand(),
-        "multiply": MultiplicationCommand(),
-        "divide": DivisionCommand(),
-        "menu": MenuCommand()
-    }
-
-    for name, cmd in commands.items():
-        if name not in command_handler.commands:
-            command_handler.register_command(name, cmd)
-            logging.info("Registered command: %s", name)
-        else:
-            logging.warning("Command '%s' is already registered.", name)
+    # Plugins are registered by the handler; short names like 'add' are their aliases
+    for name, cmd in command_handler.commands.items():
+        logging.info("Registered command: %s (aliases: %s)", name, ", ".join(cmd.aliases))
 
     logging.info("Calculator REPL started.")
     print("\nWelcome to Calculator!")
@@ -74,7 +63,7 @@ def start():
             logging.info("Executing command: %s", command)
             command_handler.execute_command(command)
 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             logging.info("Calculator exited via keyboard interrupt.")
             print("\n >> Goodbye!")
             break
@@ -88,5 +77,10 @@ def start():
             logging.critical("Unexpected error: %s", e, exc_info=True)
             print(f"Unexpected error: {e}")
 
+    command_handler.shutdown()
+    # Write out any history still queued by write-behind autosave and
+    # snapshot it so the next start can skip parsing the CSV
+    history_manager.save_snapshot()
+
 if __name__ == "__main__":
     start()
@@ -10,10 +10,34 @@ Commands:
 
 # pylint: disable=too-few-public-methods
 from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import Any, Callable, Optional, Tuple
+
+def finite_decimal(text: str) -> Decimal:
+    """Argument converter for operands: a Decimal, rejecting NaN and Infinity."""
+    value = Decimal(text)
+    if not value.is_finite():
+        raise ValueError(f"{text} is not a finite number")
+    return value
 
 class Command(ABC):
     """Abstract base class for all commands."""
 
+    # Converters the CommandHandler applies once to the inline arguments before
+    # calling execute; None passes the raw argument strings through unchanged.
+    arguments: Optional[Tuple[Callable[[str], Any], ...]] = None
+    # Additional names the command can be invoked by
+    aliases: Tuple[str, ...] = ()
+    # Heavy commands run on the CommandHandler's worker pool, when it has one,
+    # so a long computation does not freeze the REPL
+    heavy: bool = False
+    # Seconds a heavy command may run before it is stopped; None uses the pool default
+    timeout: Optional[float] = None
+
+    def is_heavy(self, *args) -> bool:
+        """Whether this invocation, with these converted arguments, runs on the worker pool."""
+        return self.heavy
+
     @abstractmethod
-    def execute(self):
-        """Abstract method to be implemented by concrete commands"""
+    def execute(self, *args):
+        """Run the command with its inline arguments, converted by arguments if it has them."""
@@ -4,21 +4,54 @@ CommandHandler Module
 This module defines the CommandHandler class, which dynamically loads and executes commands
 from the plugins folder. It supports registering commands, executing them, and handling
 special commands like 'exit' and 'help'.
+
+Commands are resolved through a dispatch table compiled once after registration. It maps
+every command name, alias and unambiguous name prefix to the command and its argument
+converters, so executing a command is a single dictionary lookup.
+
+With workers > 0, commands that declare themselves heavy are queued on a
+pool of worker threads (see calculator.jobs) instead of running in the REPL
+thread; 'jobs' lists them and 'cancel <id>' stops one.
+
+A handler created for a session runs every command in that session's
+history partition (see calculator.history_sessions).
 """
 
 # pylint: disable=broad-exception-caught
 import sys
+import inspect
 import importlib
 import pkgutil
+from contextlib import nullcontext
+from decimal import Decimal, InvalidOperation
+from typing import Optional
 import calculator.plugins
-from calculator.commands.command import Command
+from calculator.commands.command import Command, finite_decimal
+from calculator.history_sessions import history_session, session_histories
+from calculator.jobs import JobRunner
+
+SPECIAL_COMMANDS = ('exit', 'help', 'jobs', 'cancel')
+# What each argument converter expects, for error messages
+CONVERTER_NAMES = {Decimal: 'a number', finite_decimal: 'a finite number', int: 'an integer'}
+
+def argument_name(command, position):
+    """Return the name execute gives its position-th argument, or None for *args."""
+    parameters = [parameter for parameter in inspect.signature(command.execute).parameters.values()
+                  if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)]
+    return parameters[position - 1].name if position <= len(parameters) else None
 
 class CommandHandler:
     """CommandHandler dynamically loads and executes commands from the plugins folder."""
 
-    def __init__(self):
-        """Initializes the command registry and loads available plugins."""
+    def __init__(self, workers: int = 0, timeout: Optional[float] = None,
+                 session: Optional[str] = None):
+        """Initializes the command registry, the optional worker pool and the plugins."""
+        if session is not None:
+            session_histories.path(session)  # reject invalid session ids up front
+        self.session = session
         self.commands = {}
+        self._dispatch = None
+        self.jobs = JobRunner(workers, timeout) if workers > 0 else None
         self.load_plugins()
 
     def load_plugins(self):
@@ -37,12 +70,82 @@ class CommandHandler:
     def register_command(self, command_name, command):
         """Registers a command in the command dictionary."""
         self.commands[command_name] = command
+        self._dispatch = None  # recompiled on next use
+
+    def _compile_dispatch(self):
+        """Build the lookup table of names, aliases and unique prefixes."""
+        exact = {}
+        for command_name, command in self.commands.items():
+            entry = (command_name, command, command.arguments)
+            exact[command_name] = entry
+            for alias in command.aliases:
+                exact.setdefault(alias, entry)
+
+        # A prefix resolves only if every name starting with it means the same command
+        targets = {}
+        for name, (command_name, _, _) in exact.items():
+            for length in range(1, len(name)):
+                targets.setdefault(name[:length], set()).add(command_name)
+        for name in SPECIAL_COMMANDS:
+            for length in range(1, len(name) + 1):
+                targets.setdefault(name[:length], set()).add(name)
+
+        dispatch = {prefix: exact[next(iter(names))] for prefix, names in targets.items()
+                    if len(names) == 1 and next(iter(names)) in exact}
+        dispatch.update(exact)
+        self._dispatch = dispatch
+        return dispatch
+
+    def resolve(self, name):
+        """Return (command_name, command, converters) for a name, alias or unique prefix."""
+        dispatch = self._dispatch if self._dispatch is not None else self._compile_dispatch()
+        return dispatch.get(name.lower())
+
+    def _show_help(self):
+        """List the registered commands with their aliases."""
+        names = [f"{name} ({', '.join(command.aliases)})" if command.aliases else name
+                 for name, command in self.commands.items()]
+        print("Available commands:", ", ".join(names))
+        if self.jobs is not None:
+            print("Background jobs: jobs (list running jobs), cancel <id>")
+
+    def _show_jobs(self):
+        """List queued and running background jobs with their progress."""
+        if self.jobs is None:
+            print("Background jobs are disabled.")
+            return
+        active = self.jobs.active()
+        if not active:
+            print("No background jobs running.")
+            return
+        for job in active:
+            progress = job.describe_progress()
+            print(f"[job {job.id}] {job.status} {job.elapsed:.1f}s"
+                  f"{' ' + progress if progress else ''}: {job.description}")
+
+    def _cancel_job(self, args):
+        """Cancel a background job by id."""
+        try:
+            job_id = int(args[0])
+        except (IndexError, ValueError):
+            print("Usage: cancel <job id>")
+            return
+        if self.jobs is None or not self.jobs.cancel(job_id):
+            print(f"No running job {job_id}.")
+
+    def shutdown(self):
+        """Cancel any background jobs still queued or running."""
+        if self.jobs is not None:
+            self.jobs.shutdown()
 
     def execute_command(self, command_input):
-        """Executes a registered command or handles special commands like 'exit' and 'help'."""
+        """Executes a registered command or handles special commands like 'exit' and 'help'.
+
+        Returns the Job when the command was queued on the worker pool, otherwise None.
+        """
         parts = command_input.strip().split()
         if not parts:
-            return
+            return None
 
         command_name, *args = parts
         command_name = command_name.lower()
@@ -51,20 +154,64 @@ class CommandHandler:
             print("Goodbye!")
             sys.exit()
         elif command_name == 'help':
-            print("Available commands:", ", ".join(self.commands.keys()))
-            return
+            self._show_help()
+            return None
+        elif command_name == 'jobs':
+            self._show_jobs()
+            return None
+        elif command_name == 'cancel':
+            self._cancel_job(args)
+            return None
 
-        command = self.commands.get(command_name)
-        if command:
-            try:
-                command.execute(*args)
-            except ValueError as e:
-                print(f"Value Error executing '{command_name}': {e}")
-            except TypeError as e:
-                print(f"Type Error executing '{command_name}': {e}")
-            except AttributeError as e:
-                print(f"Attribute Error: {e}")
-            except Exception as e:
-                print(f"Unexpected error: {e}")
-        else:
+        entry = self.resolve(command_name)
+        if entry is None:
             print(f"Unknown command: {command_name}")
+            return None
+
+        command_name, command, converters = entry
+        if converters is not None:
+            if len(args) > len(converters):
+                print(f"Too many arguments for '{command_name}': "
+                      f"expected at most {len(converters)}.")
+                return None
+            converted = []
+            for position, (convert, arg) in enumerate(zip(converters, args), 1):
+                try:
+                    converted.append(convert(arg))
+                except (InvalidOperation, ValueError):
+                    expected = CONVERTER_NAMES.get(
+                        convert, f"a valid {getattr(convert, '__name__', 'value')}")
+                    name = argument_name(command, position)
+                    argument = f"Argument {position} ({name})" if name else f"Argument {position}"
+                    print(f"Invalid input! {argument} of '{command_name}' "
+                          f"must be {expected}, not '{arg}'.")
+                    return None
+            args = converted
+        if self.jobs is not None and command.is_heavy(*args):
+            job = self.jobs.submit(command_input.strip(), self._run_in_session,
+                                   command_name, command, args, timeout=command.timeout)
+            print(f"[job {job.id}] started: {job.description}")
+            return job
+        self._run_in_session(command_name, command, args)
+        return None
+
+    def _run_in_session(self, command_name, command, args):
+        """Execute a resolved command in this handler's history session, if it has one."""
+        # Entered here rather than in execute_command so background jobs keep
+        # their session resident until they finish
+        with history_session(self.session) if self.session is not None else nullcontext():
+            self._run_command(command_name, command, args)
+
+    @staticmethod
+    def _run_command(command_name, command, args):
+        """Execute a resolved command, reporting its errors."""
+        try:
+            command.execute(*args)
+        except ValueError as e:
+            print(f"Value Error executing '{command_name}': {e}")
+        except TypeError as e:
+            print(f"Type Error executing '{command_name}': {e}")
+        except AttributeError as e:
+            print(f"Attribute Error: {e}")
+        except Exception as e:
+            print(f"Unexpected error: {e}")
@@ -0,0 +1,253 @@
+"""
+History Archive Module
+
+Rolls old calculation history out of the main CSV file into time-bucketed
+segment files. Cold segments are compressed with gzip or lzma, expired ones
+are removed by a retention policy, and range queries only open (and stream
+decompress) the segments that overlap the requested time range.
+
+Compressed segments are never written in place: a new version is written
+beside the segment and renamed over it, and a plain segment is removed
+only once its compressed copy is in place, so an interrupted roll leaves
+every record readable.
+"""
+import io
+import os
+import re
+import gzip
+import lzma
+import shutil
+import logging
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Iterator, List, NamedTuple, Optional
+import pandas as pd
+from calculator.history_dtypes import parse_timestamps
+
+class Segment(NamedTuple):
+    """A single archive file covering the time range [start, end)."""
+    start: datetime
+    end: datetime
+    path: str
+    compressed: bool
+
+class HistoryArchive:
+    """Stores history records in per-bucket segment files with transparent compression."""
+
+    BUCKET_FORMATS = {
+        "hourly": "%Y-%m-%dT%H",
+        "daily": "%Y-%m-%d",
+        "monthly": "%Y-%m",
+    }
+    COMPRESSION_SUFFIXES = {
+        "gzip": ".gz",
+        "lzma": ".xz",
+    }
+    COLUMNS = ['timestamp', 'value1', 'value2', 'operation', 'result']
+    SEGMENT_PATTERN = re.compile(r"^history-(?P<key>[0-9T-]+)\.csv(?P<suffix>\.gz|\.xz)?$")
+
+    def __init__(self, directory: str, bucket: str = "daily", compression: str = "gzip",
+                 hot_segments: int = 1, retention_days: Optional[int] = None):
+        """Initialize the archive in the given directory with its bucketing and retention policy."""
+        if bucket not in self.BUCKET_FORMATS:
+            raise ValueError(f"Unknown segment bucket: {bucket}")
+        if compression not in self.COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.directory = directory
+        self.bucket = bucket
+        self.compression = compression
+        self.hot_segments = max(1, hot_segments)
+        self.retention_days = retention_days
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["HistoryArchive"]:
+        """Create an archive from environment variables, or None if archiving is disabled."""
+        directory = os.getenv("HISTORY_ARCHIVE_DIR")
+        if not directory:
+            return None
+        retention = os.getenv("HISTORY_RETENTION_DAYS")
+        return cls(directory,
+                   bucket=os.getenv("HISTORY_SEGMENT", "daily").lower(),
+                   compression=os.getenv("HISTORY_COMPRESSION", "gzip").lower(),
+                   hot_segments=int(os.getenv("HISTORY_HOT_SEGMENTS", "1")),
+                   retention_days=int(retention) if retention else None)
+
+    def bucket_start(self, moment: datetime) -> datetime:
+        """Return the start of the bucket containing the given moment."""
+        return datetime.strptime(moment.strftime(self.BUCKET_FORMATS[self.bucket]),
+                                 self.BUCKET_FORMATS[self.bucket])
+
+    def _bucket_end(self, start: datetime) -> datetime:
+        """Return the (exclusive) end of the bucket starting at start."""
+        if self.bucket == "hourly":
+            return start + timedelta(hours=1)
+        if self.bucket == "daily":
+            return start + timedelta(days=1)
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    def segments(self) -> List[Segment]:
+        """List the archive segments ordered by time."""
+        fmt = self.BUCKET_FORMATS[self.bucket]
+        found = []
+        for name in os.listdir(self.directory):
+            match = self.SEGMENT_PATTERN.match(name)
+            if not match:
+                continue
+            try:
+                start = datetime.strptime(match.group("key"), fmt)
+            except ValueError:
+                continue  # written with a different bucket size
+            found.append(Segment(start, self._bucket_end(start),
+                                 os.path.join(self.directory, name), bool(match.group("suffix"))))
+        return sorted(found)
+
+    def _segment_path(self, start: datetime) -> str:
+        """Return the path of the plain (hot) segment for a bucket start."""
+        key = start.strftime(self.BUCKET_FORMATS[self.bucket])
+        return os.path.join(self.directory, f"history-{key}.csv")
+
+    @staticmethod
+    def _open(path: str, mode: str):
+        """Open a segment, transparently handling its compression."""
+        text_args = {} if "b" in mode else {"newline": "", "encoding": "utf-8"}
+        if path.endswith(".gz"):
+            return gzip.open(path, mode, **text_args)
+        if path.endswith(".xz"):
+            return lzma.open(path, mode, **text_args)
+        return open(path, mode, **text_args)  # pylint: disable=unspecified-encoding
+
+    @staticmethod
+    def _compressor(path: str, stream):
+        """Wrap a binary stream in the compressor for a compressed segment path."""
+        if path.endswith(".gz"):
+            return gzip.GzipFile(fileobj=stream, mode="wb")
+        return lzma.LZMAFile(stream, "wb")
+
+    @staticmethod
+    def _replace(path: str, write) -> None:
+        """Write a new version of path with write(stream) beside it and rename it into place."""
+        temporary = path + ".tmp"
+        try:
+            with open(temporary, "wb") as stream:
+                write(stream)
+                stream.flush()
+                os.fsync(stream.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def _compress(self, source_path: str, target: str) -> None:
+        """Write a compressed copy of a plain segment to target."""
+        def write(stream):
+            with open(source_path, "rb") as source, self._compressor(target, stream) as sink:
+                shutil.copyfileobj(source, sink)
+        self._replace(target, write)
+
+    def _append_compressed(self, path: str, group: pd.DataFrame) -> None:
+        """Add records to a compressed segment as a new compressed member/stream."""
+        def write(stream):
+            with open(path, "rb") as old:
+                shutil.copyfileobj(old, stream)
+            with self._compressor(path, stream) as sink, \
+                    io.TextIOWrapper(sink, encoding="utf-8", newline="") as handle:
+                group.to_csv(handle, columns=self.COLUMNS, header=False, index=False)
+        self._replace(path, write)
+
+    def write(self, records: pd.DataFrame) -> int:
+        """Append records to the segments of their buckets and return the number written."""
+        if len(records) == 0:
+            return 0
+        fmt = self.BUCKET_FORMATS[self.bucket]
+        stamps = parse_timestamps(records['timestamp'])
+        # Segments are written, and their records kept, in timestamp order
+        order = stamps.argsort(kind="stable").to_numpy()
+        records, stamps = records.iloc[order], stamps.iloc[order]
+        keys = stamps.dt.strftime(fmt)
+        existing = {segment.start: segment for segment in self.segments()}
+        for key, group in records.groupby(keys, sort=True):
+            start = datetime.strptime(key, fmt)
+            segment = existing.get(start)
+            if segment is not None and segment.compressed:
+                # Late records for an already compressed bucket are added as a new
+                # compressed member/stream, which both gzip and lzma readers accept
+                self._append_compressed(segment.path, group)
+                continue
+            path = self._segment_path(start)
+            write_header = not os.path.exists(path)
+            with self._open(path, "at") as handle:
+                group.to_csv(handle, columns=self.COLUMNS, header=write_header, index=False)
+        self.logger.info("Archived %d history records into %s", len(records), self.directory)
+        return len(records)
+
+    def compress_cold(self, now: Optional[datetime] = None) -> int:
+        """Compress plain segments older than the newest hot buckets; return how many."""
+        current = self.bucket_start(now or datetime.now())
+        hot_start = current
+        for _ in range(self.hot_segments - 1):
+            hot_start = self.bucket_start(hot_start - timedelta(seconds=1))
+        compressed = 0
+        for segment in self.segments():
+            if segment.compressed or segment.start >= hot_start:
+                continue
+            target = segment.path + self.COMPRESSION_SUFFIXES[self.compression]
+            # A compressed copy already in place means an earlier roll stopped
+            # before removing the plain segment; it holds these records already
+            if not os.path.exists(target):
+                self._compress(segment.path, target)
+            os.remove(segment.path)
+            compressed += 1
+        if compressed:
+            self.logger.info("Compressed %d cold history segments", compressed)
+        return compressed
+
+    def apply_retention(self, now: Optional[datetime] = None) -> int:
+        """Delete segments that ended before the retention window; return how many."""
+        if self.retention_days is None:
+            return 0
+        cutoff = (now or datetime.now()) - timedelta(days=self.retention_days)
+        removed = 0
+        for segment in self.segments():
+            if segment.end <= cutoff:
+                os.remove(segment.path)
+                removed += 1
+        if removed:
+            self.logger.info("Removed %d history segments past retention", removed)
+        return removed
+
+    def read_range(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """Stream records with start <= timestamp < end from the overlapping segments."""
+        for segment in self.segments():
+            if (start is not None and segment.end <= start) or \
+               (end is not None and segment.start >= end):
+                continue
+            inside = (start is None or segment.start >= start) and \
+                     (end is None or segment.end <= end)
+            for chunk in pd.read_csv(segment.path, chunksize=chunksize, dtype=str,
+                                     compression="infer"):
+                if not inside:
+                    stamps = parse_timestamps(chunk['timestamp'])
+                    mask = pd.Series(True, index=chunk.index)
+                    if start is not None:
+                        mask &= stamps >= start
+                    if end is not None:
+                        mask &= stamps < end
+                    chunk = chunk[mask]
+                if len(chunk):
+                    yield chunk
+
+    def disk_usage(self) -> int:
+        """Return the total size in bytes of all segments."""
+        return sum(os.path.getsize(segment.path) for segment in self.segments())
+
+def archived_and_live_chunks(manager, since: Optional[datetime] = None,
+                             chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+    """Yield a history manager's archived records from since onwards, then its live history."""
+    chunks = manager.iter_chunks(chunksize)
+    if manager.archive is not None:
+        chunks = chain(manager.archive.read_range(since, None, chunksize), chunks)
+    return chunks
@@ -0,0 +1,171 @@
+"""
+History Audit Module
+
+Re-executes stored history records against the current operation
+implementations to find records whose stored result no longer matches, and
+replays stored history through the Calculator facade as a load generator.
+
+Verification groups each chunk of history by operation and hands the groups
+to a process pool, so large histories are checked on every core. The pool
+spawns fresh interpreters rather than forking, since the process forking it
+runs autosave and job threads that may hold locks at that moment.
+
+Power, root, modulo and factorial can be run at a chosen precision, which
+records do not keep; their stored results are also accepted when they
+equal the operation evaluated at the precision of the stored digits.
+"""
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, localcontext
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from calculator import Calculator
+from calculator.jobs import checkpoint
+from calculator.operation import OPERATIONS
+
+# Operations the commands accept a precision argument for
+PRECISION_OPERATIONS = frozenset({'power', 'root', 'modulo', 'factorial'})
+
+logger = logging.getLogger(__name__)
+
+class Mismatch(NamedTuple):
+    """A stored record whose result differs from a fresh computation."""
+    record_id: int
+    operation: str
+    value1: str
+    value2: str
+    stored: str
+    recomputed: str
+
+class VerificationReport(NamedTuple):
+    """Outcome of verifying a history."""
+    checked: int
+    mismatches: List[Mismatch]
+    seconds: float
+
+class ReplayReport(NamedTuple):
+    """Outcome of replaying a history through the Calculator."""
+    replayed: int
+    errors: int
+    seconds: float
+
+    @property
+    def per_second(self) -> float:
+        """Replayed calculations per second."""
+        return self.replayed / self.seconds if self.seconds else 0.0
+
+# A group of records sharing one operation: (operation, ids, value1s, value2s, results)
+Group = Tuple[str, List[int], List[str], List[str], List[str]]
+
+def _matches_at_stored_precision(operation, value1: str, value2: str, stored: str) -> bool:
+    """Whether stored is the result at the precision given by its number of digits."""
+    try:
+        expected = Decimal(stored)
+        with localcontext() as ctx:
+            ctx.prec = max(len(expected.as_tuple().digits), 1)
+            return expected == operation(Decimal(value1), Decimal(value2))
+    except (ArithmeticError, ValueError):
+        return False
+
+def verify_group(group: Group) -> List[Mismatch]:
+    """Re-execute one group of records and return the mismatches.
+
+    Runs in a worker process, so it only takes and returns plain picklable data.
+    """
+    operation_name, ids, values1, values2, results = group
+    operation = OPERATIONS.get(operation_name)
+    mismatches = []
+    for record_id, value1, value2, stored in zip(ids, values1, values2, results):
+        if operation is None:
+            recomputed = f"unknown operation '{operation_name}'"
+        else:
+            try:
+                recomputed_value = operation(Decimal(value1), Decimal(value2))
+                if Decimal(stored) == recomputed_value:
+                    continue
+                if operation_name in PRECISION_OPERATIONS and \
+                   _matches_at_stored_precision(operation, value1, value2, stored):
+                    continue
+                recomputed = str(recomputed_value)
+            except (ArithmeticError, ValueError) as e:
+                # InvalidOperation (bad stored strings) is an ArithmeticError
+                recomputed = f"error: {e}"
+        mismatches.append(Mismatch(record_id, operation_name, value1, value2,
+                                   stored, recomputed))
+    return mismatches
+
+def _groups(manager, chunk_size: int) -> Iterable[Group]:
+    """Split the history into per-operation groups of at most chunk_size records."""
+    for chunk in manager.iter_chunks(chunk_size):
+        for operation_name, frame in chunk.groupby('operation', sort=False, observed=True):
+            yield (str(operation_name), [int(i) for i in frame.index],
+                   frame['value1'].astype(str).tolist(), frame['value2'].astype(str).tolist(),
+                   frame['result'].astype(str).tolist())
+
+def verify_history(manager, workers: Optional[int] = None,
+                   chunk_size: int = 10000) -> VerificationReport:
+    """Re-execute every record in the history and report the mismatches.
+
+    With workers=1, or when the history fits in a single chunk, the check runs
+    in-process; otherwise groups are spread over a process pool.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    mismatches: List[Mismatch] = []
+    checked = len(manager)
+    done = 0
+    if workers == 1 or checked <= chunk_size:
+        for group in _groups(manager, chunk_size):
+            mismatches.extend(verify_group(group))
+            done += len(group[1])
+            checkpoint(done, checked)
+    else:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Keep a bounded number of groups in flight so memory stays flat
+            in_flight = deque()
+            for group in _groups(manager, chunk_size):
+                in_flight.append((pool.submit(verify_group, group), len(group[1])))
+                while len(in_flight) >= workers * 2 or (in_flight and in_flight[0][0].done()):
+                    future, size = in_flight.popleft()
+                    mismatches.extend(future.result())
+                    done += size
+                    checkpoint(done, checked)
+            while in_flight:
+                future, size = in_flight.popleft()
+                mismatches.extend(future.result())
+                done += size
+                checkpoint(done, checked)
+    mismatches.sort(key=lambda mismatch: mismatch.record_id)
+    seconds = time.perf_counter() - started
+    logger.info("Verified %d history records in %.3fs: %d mismatches",
+                checked, seconds, len(mismatches))
+    return VerificationReport(checked, mismatches, seconds)
+
+def replay_history(manager, limit: Optional[int] = None,
+                   chunk_size: int = 10000) -> ReplayReport:
+    """Push the stored history through Calculator.execute_operation as fast as possible.
+
+    Replayed calculations are recorded like any other, so only the records
+    present when the replay starts are replayed.
+    """
+    total = len(manager) if limit is None else min(limit, len(manager))
+    replayed = errors = 0
+    started = time.perf_counter()
+    for start in range(0, total, chunk_size):
+        window = manager.get_window(start, min(start + chunk_size, total))
+        for value1, value2, operation_name in zip(window['value1'], window['value2'],
+                                                  window['operation']):
+            try:
+                Calculator.execute_operation(Decimal(str(value1)), Decimal(str(value2)),
+                                             OPERATIONS[operation_name])
+                replayed += 1
+            except (KeyError, ArithmeticError, ValueError):
+                errors += 1
+            checkpoint(replayed + errors, total)
+    seconds = time.perf_counter() - started
+    logger.info("Replayed %d history records in %.3fs (%d errors)", replayed, seconds, errors)
+    return ReplayReport(replayed, errors, seconds)
@@ -0,0 +1,494 @@
+"""
+History Dtypes Module
+
+Compact column types for the in-memory history DataFrame. Operations are
+stored as a categorical, timestamps as datetime64, and operands and results
+as int64 scaled by a per-column power of ten, so a record costs a few dozen
+bytes instead of several hundred bytes of Python strings.
+
+Numbers decode to exactly the text they were written as. A column whose
+values are written with more digits than their plain form needs (e.g.
+'1.50' or '1E+3') gets a companion int8 column of written exponents, and
+the values that cannot be held exactly in int64 at the column's scale (e.g.
+a 28-digit division result) keep their text in a companion categorical
+column, row by row, while the rest of the column stays numeric. Only a
+column with no value that fits (or with missing values) falls back to its
+original text (object dtype) as a whole; a timestamp column does the same
+when it does not parse or carries UTC offsets. Frames are decoded back to
+text at the edges (display, CSV, archive), so files on disk keep their
+existing format.
+
+Numbers are parsed and formatted in numpy, on matrices of character codes,
+so loading a history costs about as much as reading its CSV; only text
+that is not written as a plain decimal goes through Decimal row by row.
+"""
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['timestamp', 'value1', 'value2', 'operation', 'result']
+NUMERIC_COLUMNS = ('value1', 'value2', 'result')
+
+INT64_MIN = int(np.iinfo(np.int64).min)
+INT64_MAX = int(np.iinfo(np.int64).max)
+# int64 holds every integer of up to this many digits
+EXACT_DIGITS = 18
+
+# Column name -> scale (values are stored as value * 10**scale), or None for text
+Scales = Dict[str, Optional[int]]
+
+def exponent_column(column: str) -> str:
+    """Return the name of the companion column of written exponents of a numeric column."""
+    return column + '_exponent'
+
+def text_column(column: str) -> str:
+    """Return the name of the companion column of values a numeric column keeps as text."""
+    return column + '_text'
+
+def stored_columns(present: Iterable[str]) -> List[str]:
+    """Return the columns of a compact frame, companions after their column, in order."""
+    present = set(present)
+    return [name for column in COLUMNS
+            for name in (column, exponent_column(column), text_column(column))
+            if name in present]
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """Return a column as object dtype text, the fallback representation."""
+    return values.astype(object)
+
+def _choose_scale(needed: np.ndarray, integer_digits: np.ndarray) -> int:
+    """Return the scale at which the most values fit int64, the smallest one on ties."""
+    best, best_count = 0, -1
+    for scale in range(EXACT_DIGITS + 1):
+        count = int(np.count_nonzero((needed <= scale)
+                                     & (integer_digits + scale <= EXACT_DIGITS)))
+        if count > best_count:
+            best, best_count = scale, count
+    return best
+
+# How a text is written: not as a number a scaled integer can give back, as
+# format_scaled writes its value, or as str(Decimal) does with other exponents
+_OTHER, _PLAIN, _WRITTEN = 0, 1, 2
+_ZERO, _MINUS, _POINT = ord('0'), ord('-'), ord('.')
+# Rows parsed at a time, which bounds the character matrix of _scan_plain
+_SCAN_ROWS = 65536
+_POWERS = np.array([10 ** k for k in range(EXACT_DIGITS + 1)], dtype=np.int64)
+# Largest coefficient that fits int64 when shifted by k digits (none past EXACT_DIGITS)
+_LIMITS = np.array([INT64_MAX // 10 ** k for k in range(EXACT_DIGITS + 2)], dtype=np.int64)
+
+class _Parsed(NamedTuple):
+    """Decimal texts split into sign, coefficient and exponent, one array entry per row."""
+    form: np.ndarray          # _OTHER, _PLAIN or _WRITTEN
+    negative: np.ndarray
+    coefficient: np.ndarray   # uint64, valid where fits
+    fits: np.ndarray          # the coefficient is at most INT64_MAX
+    exponent: np.ndarray
+    digits: np.ndarray        # significant digits, as in Decimal.as_tuple()
+    parsed: np.ndarray        # a finite Decimal, whether or not form is _OTHER
+
+def _scan_plain(texts: np.ndarray) -> _Parsed:
+    """Parse texts such as '-12.50' with numpy, as a matrix of character codes.
+
+    Rows that are not plain decimals (e.g. '1E+3', '+1', '007' or anything
+    that is not a number) are left unparsed, for _parse_text.
+    """
+    rows = len(texts)
+    try:
+        chars = texts.astype(bytes)
+        codes = chars.view(np.uint8).reshape(rows, chars.dtype.itemsize)
+    except UnicodeEncodeError:
+        chars = texts.astype(str)
+        codes = chars.view(np.uint32).reshape(rows, chars.dtype.itemsize // 4)
+    if codes.shape[1] == 0:
+        # Only empty texts: one column of NUL characters
+        codes = np.zeros((rows, 1), dtype=codes.dtype)
+    width = codes.shape[1]
+    index = np.arange(rows)
+    nonzero = codes != 0
+    length = np.count_nonzero(nonzero, axis=1)
+    # Where the text ends; before length - 1 if it holds a NUL character
+    end = width - 1 - nonzero[:, ::-1].argmax(axis=1)
+    # Wraps around for characters below '0', so only digits are below 10
+    values = codes - codes.dtype.type(_ZERO)
+    digit = values < 10
+    point = codes == _POINT
+    negative = codes[:, 0] == _MINUS
+    sign = negative.astype(np.int64)
+    digit_count = np.count_nonzero(digit, axis=1)
+    points = np.count_nonzero(point, axis=1)
+    point_at = np.where(points == 1, point.argmax(axis=1), length)
+    whole = point_at - sign
+    fraction = np.where(points == 1, length - point_at - 1, 0)
+    first = codes[index, np.minimum(sign, width - 1)]
+    last = codes[index, np.maximum(length - 1, 0)]
+    scanned = ((digit_count + points + sign == length) & (end == length - 1) & (points <= 1)
+               & (whole >= 1) & ((points == 0) | (fraction >= 1))
+               & ~((first == _ZERO) & (whole > 1)))
+    significant = digit & (values != 0)
+    first_significant = significant.argmax(axis=1)
+    zero = ~significant[index, first_significant]
+    # Digits from the first significant one: all of them less the leading zeros
+    digits = np.where(zero, 1, digit_count - first_significant + sign
+                      + (point_at < first_significant))
+    coefficient = np.zeros(rows, dtype=np.uint64)
+    columns = np.where(digit, values, 0).T.astype(np.uint64)
+    for column, digits_in_column in zip(columns, digit.T):
+        # Wraps past 20 digits, which fits rules out
+        coefficient = np.where(digits_in_column, coefficient * np.uint64(10) + column,
+                               coefficient)
+    fits = (digits < EXACT_DIGITS + 1) | ((digits == EXACT_DIGITS + 1)
+                                          & (coefficient <= np.uint64(INT64_MAX)))
+    trailing = (fraction > 0) & (last == _ZERO)
+    form = np.full(rows, _OTHER, dtype=np.int8)
+    form[scanned & ~trailing & ~(negative & zero)] = _PLAIN
+    # str(Decimal) keeps trailing zeros unless it switches to an exponent
+    form[scanned & trailing & ~zero & (digits - 1 - fraction >= -6)] = _WRITTEN
+    return _Parsed(form, negative, coefficient, fits, -fraction, digits, scanned)
+
+def _parse_text(text: str) -> Tuple[int, bool, int, int, int]:
+    """Parse one text with Decimal: its form, sign, coefficient, exponent and digits.
+
+    The form is _OTHER with no coefficient for text that is not a finite number.
+    """
+    try:
+        decimal = Decimal(text)
+    except (InvalidOperation, ValueError):
+        return _OTHER, False, 0, 0, 0
+    if not decimal.is_finite():
+        return _OTHER, False, 0, 0, 0
+    sign, digit_tuple, exponent = decimal.as_tuple()
+    coefficient = int(''.join(map(str, digit_tuple)))
+    form = _OTHER
+    # Beyond EXACT_DIGITS either way a value cannot fit, whatever its form
+    if -EXACT_DIGITS <= exponent <= EXACT_DIGITS:
+        number = coefficient * 10 ** max(exponent, 0)
+        if format_scaled(-number if sign else number, max(0, -exponent)) == text:
+            form = _PLAIN
+        elif str(decimal) == text and coefficient != 0:
+            stripped = decimal.normalize().as_tuple().exponent
+            # With the exponent format_scaled would give, decoding could not tell them apart
+            if exponent != min(0, stripped):
+                form = _WRITTEN
+    return form, bool(sign), coefficient, exponent, len(digit_tuple)
+
+def _parse(texts: np.ndarray) -> _Parsed:
+    """Parse decimal texts, with numpy where they are plain and Decimal where they are not."""
+    blocks = []
+    for start in range(0, len(texts), _SCAN_ROWS):
+        block = _scan_plain(texts[start:start + _SCAN_ROWS])
+        for row in np.flatnonzero(~block.parsed).tolist():
+            form, negative, coefficient, exponent, digits = _parse_text(texts[start + row])
+            fits = coefficient <= INT64_MAX
+            for array, value in zip(block, (form, negative, coefficient if fits else 0, fits,
+                                            exponent, digits, digits > 0)):
+                array[row] = value
+        blocks.append(block)
+    if not blocks:
+        return _Parsed(*(np.zeros(0, dtype=dtype) for dtype in
+                         (np.int8, bool, np.uint64, bool, np.int64, np.int64, bool)))
+    return _Parsed(*(np.concatenate(arrays) for arrays in zip(*blocks)))
+
+def _categorical(texts: np.ndarray) -> pd.Categorical:
+    """Return texts (None where missing) as a categorical, categories in order of appearance."""
+    # Unlike pd.Categorical(texts), this does not sort the categories
+    codes, categories = pd.factorize(texts)
+    return pd.Categorical.from_codes(codes, categories)
+
+def encode_decimals(values: pd.Series) -> Tuple[Dict[str, pd.Series], Optional[int]]:
+    """Encode a column of decimal strings as scaled int64.
+
+    Returns the columns to store (the column and its companions, if any) and
+    the scale, which is None if the column had to stay text as a whole.
+    """
+    name = values.name
+    if pd.api.types.is_numeric_dtype(values):
+        if values.isna().any():
+            return {name: _as_text(values)}, None
+        values = values.astype(str)
+    texts = values.to_numpy(dtype=object)
+    parsed = _parse(texts)
+    # Missing values have no text to keep, so they keep the whole column text
+    if pd.isna(texts[~parsed.parsed]).any():
+        return {name: _as_text(values)}, None
+    needed = np.where(parsed.parsed, np.maximum(0, -parsed.exponent), EXACT_DIGITS + 1)
+    integer_digits = np.where(parsed.parsed, parsed.digits + parsed.exponent, 0)
+    scale = _choose_scale(needed, integer_digits)
+    shift = np.clip(scale + parsed.exponent, 0, EXACT_DIGITS + 1)
+    fit = ((parsed.form != _OTHER) & (needed <= scale) & parsed.fits
+           & (parsed.coefficient <= _LIMITS[shift].astype(np.uint64)))
+    numbers = np.where(fit, parsed.coefficient.astype(np.int64)
+                       * _POWERS[np.minimum(shift, EXACT_DIGITS)], 0)
+    numbers = np.where(parsed.negative, -numbers, numbers)
+    if len(texts) and not fit.any():
+        return {name: _as_text(values)}, None
+    columns = {name: pd.Series(numbers, index=values.index, name=name)}
+    if (fit & (parsed.form == _WRITTEN)).any():
+        exponents = np.where(fit, parsed.exponent, 0).astype(np.int8)
+        columns[exponent_column(name)] = pd.Series(exponents, index=values.index)
+    if not fit.all():
+        columns[text_column(name)] = pd.Series(_categorical(np.where(fit, None, texts)),
+                                               index=values.index)
+    return columns, scale
+
+def format_scaled(number: int, scale: int) -> str:
+    """Format number / 10**scale as plain decimal text without trailing zeros."""
+    if scale == 0:
+        return str(number)
+    whole, fraction = divmod(abs(number), 10 ** scale)
+    fraction_text = str(fraction).rjust(scale, '0').rstrip('0')
+    sign = '-' if number < 0 else ''
+    return f"{sign}{whole}.{fraction_text}" if fraction_text else f"{sign}{whole}"
+
+def _text_rows(codes: np.ndarray) -> List[str]:
+    """Return the rows of a matrix of ASCII codes, padded with NUL characters, as strings."""
+    framed = np.zeros((len(codes), codes.shape[1] + 1), dtype=np.uint8)
+    framed[:, :-1] = codes
+    framed[:, -1] = ord('\n')
+    # One decode and split, instead of a Python string per row built in a loop
+    return framed[framed != 0].tobytes().decode('ascii').split('\n')[:-1]
+
+def _format_scaled_rows(numbers: np.ndarray, scale: int) -> Tuple[List[str], np.ndarray]:
+    """Format int64 values / 10**scale as format_scaled does, digit by digit in numpy.
+
+    The text is laid out in a matrix of character codes: the sign, the whole
+    digits, then the point and fraction digits, if any, written after them.
+    Also returns the number of fraction digits written for each value.
+    """
+    rows = len(numbers)
+    index = np.arange(rows)
+    negative = numbers < 0
+    magnitude = numbers.astype(np.uint64)
+    # Two's complement, so INT64_MIN keeps its magnitude
+    magnitude[negative] = ~magnitude[negative] + np.uint64(1)
+    whole, fraction = np.divmod(magnitude, np.uint64(10 ** scale))
+    powers = _POWERS.astype(np.uint64)
+    width = len(str(int(whole.max()))) if rows else 1
+    whole_digits = 1 + sum((whole >= powers[k]).astype(np.int64) for k in range(1, width))
+    sign = negative.astype(np.int64)
+    codes = np.zeros((rows, width + scale + 2), dtype=np.uint8)
+    codes[:, 0] = np.where(negative, _MINUS, 0)
+    for position in range(width):
+        power = whole_digits - 1 - position
+        digit = whole // powers[np.maximum(power, 0)] % np.uint64(10)
+        codes[index, sign + position] = np.where(power >= 0, digit + _ZERO, 0)
+    point_at = sign + whole_digits
+    fraction_digits = np.zeros(rows, dtype=np.int64)
+    for position in range(scale):
+        digit = fraction // powers[scale - 1 - position] % np.uint64(10)
+        codes[index, point_at + 1 + position] = digit + _ZERO
+        fraction_digits[digit != 0] = position + 1
+    # Trailing zeros of the fraction are dropped, and the point with them if that is all
+    codes[np.arange(codes.shape[1]) > (point_at + fraction_digits)[:, None]] = 0
+    codes[index, point_at] = np.where(fraction_digits > 0, _POINT, 0)
+    return _text_rows(codes), fraction_digits
+
+def decode_decimals(values: pd.Series, scale: Optional[int],
+                    exponents: Optional[pd.Series] = None,
+                    texts: Optional[pd.Series] = None) -> pd.Series:
+    """Decode a scaled int64 column, with its companion columns, back to decimal strings."""
+    if scale is None:
+        return values
+    numbers = values.to_numpy(dtype=np.int64)
+    rows, fraction_digits = _format_scaled_rows(numbers, scale)
+    decoded = np.array(rows, dtype=object)
+    if exponents is not None:
+        # Only values written with other exponents than format_scaled uses differ
+        written = np.flatnonzero(exponents.to_numpy() != -fraction_digits)
+        for row, number, exponent in zip(written.tolist(), numbers[written].tolist(),
+                                         exponents.to_numpy()[written].tolist()):
+            decoded[row] = str(Decimal(number // 10 ** (scale + exponent)).scaleb(exponent))
+    if texts is not None:
+        kept = texts.notna().to_numpy()
+        decoded[kept] = texts.to_numpy(dtype=object)[kept]
+    return pd.Series(decoded, index=values.index, name=values.name, dtype=str)
+
+def _decode_column(frame: pd.DataFrame, scales: Scales, column: str) -> pd.Series:
+    """Decode a numeric column of compact records, with its companion columns."""
+    return decode_decimals(frame[column], scales[column], frame.get(exponent_column(column)),
+                           frame.get(text_column(column)))
+
+def to_decimals(frame: pd.DataFrame, scales: Scales, column: str) -> pd.Series:
+    """Return a numeric column of compact records as exact Decimal objects."""
+    values, scale = frame[column], scales[column]
+    if scale is None:
+        return values.apply(Decimal)
+    decimals = values.apply(lambda number: Decimal(number).scaleb(-scale))
+    texts = frame.get(text_column(column))
+    if texts is not None:
+        kept = texts.notna()
+        decimals[kept] = texts[kept].astype(str).map(Decimal)
+    return decimals
+
+def _natural_exponents(values: np.ndarray, scale: int) -> np.ndarray:
+    """Return the exponents of scaled values as format_scaled writes them."""
+    coefficients = values.copy()
+    exponents = np.full(len(values), -scale, dtype=np.int8)
+    strip = (coefficients % 10 == 0) & (coefficients != 0) & (exponents < 0)
+    while strip.any():
+        coefficients[strip] //= 10
+        exponents[strip] += 1
+        strip = (coefficients % 10 == 0) & (coefficients != 0) & (exponents < 0)
+    exponents[coefficients == 0] = 0
+    return exponents
+
+def _at_scale(frame: pd.DataFrame, column: str, scale: Optional[int], target: int
+              ) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+    """Return a part's numbers rescaled to target, its exponents and its kept texts.
+
+    Values that would overflow int64 at the target scale, and every value of a
+    part kept as text, are moved to the kept texts.
+    """
+    values = frame[column]
+    if scale is None:
+        return (np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=np.int8),
+                values.to_numpy(dtype=object))
+    numbers = values.to_numpy(dtype=np.int64)
+    exponents = frame.get(exponent_column(column))
+    exponents = exponents.to_numpy() if exponents is not None else None
+    texts = frame.get(text_column(column))
+    texts = texts.to_numpy(dtype=object) if texts is not None else None
+    if target == scale:
+        return numbers, exponents, texts
+    factor = 10 ** (target - scale)
+    limit = INT64_MAX // factor
+    overflow = (numbers > limit) | (numbers < -limit)
+    if overflow.any():
+        decoded = _decode_column(frame, {column: scale}, column).to_numpy(dtype=object)
+        if texts is None:
+            texts = np.full(len(numbers), None, dtype=object)
+        texts = np.where(overflow, decoded, texts)
+        numbers = np.where(overflow, 0, numbers)
+    return numbers * np.int64(factor), exponents, texts
+
+# Timestamp text that ends in a UTC offset or Z, i.e. names an absolute time
+_OFFSET = r'[T ]\d.*(?:Z|[+-]\d\d(?::?\d\d)?)$'
+
+def parse_timestamps(values: pd.Series, utc: bool = True) -> pd.Series:
+    """Parse ISO timestamp text to naive datetime64, NaT where it does not parse.
+
+    Timestamps written with a UTC offset are converted to UTC, or are NaT if
+    utc is False; pandas refuses to parse them mixed with naive ones or with
+    other offsets.
+    """
+    text = values.astype(object)
+    try:
+        stamps = pd.to_datetime(text, format='ISO8601', errors='coerce')
+    except ValueError:
+        # Naive timestamps mixed with offsets, or several offsets: parse each kind apart
+        aware = text.astype(str).str.contains(_OFFSET).to_numpy()
+        stamps = pd.Series(pd.NaT, index=values.index, dtype='datetime64[us]')
+        stamps[~aware] = pd.to_datetime(text[~aware], format='ISO8601', errors='coerce')
+        if utc:
+            stamps[aware] = pd.to_datetime(text[aware], format='ISO8601', errors='coerce',
+                                           utc=True).dt.tz_convert(None)
+        return stamps
+    if isinstance(stamps.dtype, pd.DatetimeTZDtype):
+        if not utc:
+            return pd.Series(pd.NaT, index=values.index, dtype='datetime64[us]')
+        stamps = stamps.dt.tz_convert('UTC').dt.tz_convert(None)
+    return stamps.astype('datetime64[us]')
+
+def encode_timestamps(values: pd.Series) -> pd.Series:
+    """Parse ISO timestamps to datetime64, keeping the text if any do not parse.
+
+    Timestamps with a UTC offset keep their text too, as datetime64 would drop the offset.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    stamps = parse_timestamps(values, utc=False)
+    if stamps.isna().any():
+        return _as_text(values)
+    return stamps
+
+def decode_timestamps(values: pd.Series) -> pd.Series:
+    """Format datetime64 timestamps the way datetime.isoformat() does."""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    # numpy formats in C, several times faster than Series.dt.strftime
+    text = np.datetime_as_string(values.to_numpy(dtype='datetime64[us]'), unit='us')
+    codes = text.view(np.uint32).reshape(len(text), text.dtype.itemsize // 4).astype(np.uint8)
+    # isoformat() leaves out a fraction of zero microseconds
+    length = np.count_nonzero(codes, axis=1)
+    suffix = np.frombuffer(b'.000000', dtype=np.uint8)
+    start = np.maximum(length - len(suffix), 0)
+    tail = codes[np.arange(len(codes))[:, None], start[:, None] + np.arange(len(suffix))]
+    whole = (length > len(suffix)) & (tail == suffix).all(axis=1)
+    codes[whole[:, None] & (np.arange(codes.shape[1]) >= start[:, None])] = 0
+    return pd.Series(_text_rows(codes), index=values.index, dtype=str)
+
+def encode_frame(frame: pd.DataFrame) -> Tuple[pd.DataFrame, Scales]:
+    """Convert a frame of text history records to the compact dtypes."""
+    frame = frame.reindex(columns=COLUMNS)
+    scales: Scales = {}
+    columns = {}
+    for column in COLUMNS:
+        if column in NUMERIC_COLUMNS:
+            encoded, scales[column] = encode_decimals(frame[column])
+            columns.update(encoded)
+        elif column == 'timestamp':
+            columns[column] = encode_timestamps(frame[column])
+        else:
+            columns[column] = frame[column].astype(str).astype('category')
+    return pd.DataFrame(columns, index=frame.index), scales
+
+def decode_frame(frame: pd.DataFrame, scales: Scales) -> pd.DataFrame:
+    """Convert compact history records back to text columns, keeping the index."""
+    columns = {}
+    for column in COLUMNS:
+        if column in NUMERIC_COLUMNS:
+            columns[column] = _decode_column(frame, scales, column)
+        elif column == 'timestamp':
+            columns[column] = decode_timestamps(frame[column])
+        else:
+            columns[column] = frame[column].astype(str)
+    return pd.DataFrame(columns, index=frame.index)
+
+def concat_frames(parts: Iterable[Tuple[pd.DataFrame, Scales]]) -> Tuple[pd.DataFrame, Scales]:
+    """Concatenate compact frames, aligning scales and categories.
+
+    A numeric column is rescaled to the largest scale of the parts; values of
+    a text part, or that would overflow int64, keep their text in the
+    column's companion text column. The column stays text only if every
+    part is text. At least one part is required.
+    """
+    parts = list(parts)
+    scales: Scales = {}
+    columns: Dict[str, object] = {}
+    stamps = [frame['timestamp'] for frame, _ in parts]
+    if not all(pd.api.types.is_datetime64_any_dtype(series) for series in stamps):
+        stamps = [_as_text(decode_timestamps(series)) for series in stamps]
+    columns['timestamp'] = pd.concat(stamps, ignore_index=True)
+    for column in NUMERIC_COLUMNS:
+        numeric = [part_scales[column] for _, part_scales in parts
+                   if part_scales[column] is not None]
+        # Missing values have no text to keep, so they keep the whole column text
+        missing = any(part_scales[column] is None and frame[column].isna().any()
+                      for frame, part_scales in parts)
+        if not numeric or missing:
+            columns[column] = pd.concat([_as_text(_decode_column(frame, part_scales, column))
+                                         for frame, part_scales in parts], ignore_index=True)
+            scales[column] = None
+            continue
+        target = max(numeric)
+        aligned = [_at_scale(frame, column, part_scales[column], target)
+                   for frame, part_scales in parts]
+        columns[column] = pd.Series(np.concatenate([numbers for numbers, _, _ in aligned]))
+        if any(exponents is not None for _, exponents, _ in aligned):
+            columns[exponent_column(column)] = pd.Series(np.concatenate([
+                exponents if exponents is not None else _natural_exponents(numbers, target)
+                for numbers, exponents, _ in aligned]))
+        if any(texts is not None for _, _, texts in aligned):
+            columns[text_column(column)] = pd.Series(pd.Categorical(np.concatenate([
+                texts if texts is not None else np.full(len(numbers), None, dtype=object)
+                for numbers, _, texts in aligned])))
+        scales[column] = target
+    columns['operation'] = pd.Series(pd.api.types.union_categoricals(
+        [frame['operation'] for frame, _ in parts], ignore_order=True))
+    return pd.DataFrame({name: columns[name] for name in stored_columns(columns)}), scales
+
+def memory_per_row(frame: pd.DataFrame) -> float:
+    """Return the deep memory usage of a frame in bytes per row."""
+    if len(frame) == 0:
+        return 0.0
+    return frame.memory_usage(deep=True).sum() / len(frame)
@@ -0,0 +1,66 @@
+"""
+History Export Module
+
+Streams history records out to CSV or JSON lines through a generator
+pipeline: archived and live records are read in bounded chunks, filtered
+by operation and time on the fly, and written chunk by chunk. Memory use
+depends on the chunk size, never on the size of the history.
+"""
+import logging
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+import pandas as pd
+from calculator.history_archive import archived_and_live_chunks
+from calculator.history_dtypes import COLUMNS, parse_timestamps
+from calculator.jobs import checkpoint
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_CHUNK_SIZE = 10000
+
+logger = logging.getLogger(__name__)
+
+def filter_chunks(chunks: Iterable[pd.DataFrame], operation: Optional[str] = None,
+                  since: Optional[datetime] = None) -> Iterator[pd.DataFrame]:
+    """Keep only the records of one operation and/or with timestamp >= since."""
+    scanned = 0
+    for chunk in chunks:
+        scanned += len(chunk)
+        checkpoint(scanned)
+        if operation is not None:
+            chunk = chunk[chunk['operation'] == operation]
+        if since is not None and len(chunk):
+            chunk = chunk[parse_timestamps(chunk['timestamp']) >= since]
+        if len(chunk):
+            yield chunk
+
+def write_csv(chunks: Iterable[pd.DataFrame], stream) -> int:
+    """Write chunks to a text stream as CSV with one header row; return the record count."""
+    stream.write(','.join(COLUMNS) + '\n')
+    written = 0
+    for chunk in chunks:
+        chunk.to_csv(stream, columns=COLUMNS, header=False, index=False)
+        written += len(chunk)
+    return written
+
+def write_jsonl(chunks: Iterable[pd.DataFrame], stream) -> int:
+    """Write chunks to a text stream as one JSON object per line; return the record count."""
+    written = 0
+    for chunk in chunks:
+        lines = chunk[COLUMNS].to_json(orient='records', lines=True)
+        stream.write(lines if lines.endswith('\n') else lines + '\n')
+        written += len(chunk)
+    return written
+
+def export_history(manager, path: str, output_format: str = 'csv',
+                   operation: Optional[str] = None, since: Optional[datetime] = None,
+                   chunksize: int = EXPORT_CHUNK_SIZE) -> int:
+    """Stream the (optionally filtered) history to path; return the number of records written."""
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{output_format}'. "
+                         f"Use one of: {', '.join(EXPORT_FORMATS)}")
+    writer = write_csv if output_format == 'csv' else write_jsonl
+    records = filter_chunks(archived_and_live_chunks(manager, since, chunksize), operation, since)
+    with open(path, 'w', newline='', encoding='utf-8') as stream:
+        written = writer(records, stream)
+    logger.info("Exported %d history records to %s as %s", written, path, output_format)
+    return written
@@ -5,56 +5,378 @@ This module utilizes Pandas to manage the calculation history, providing
 functionality to load, save, filter, and analyze calculation records.
 """
 import os
+import csv
+import atexit
+import uuid
 import logging
+import threading
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from calculator.calculation import Calculation
+from calculator.calculation_store import CalculationStore
+from calculator.history_archive import HistoryArchive
+from calculator.history_dtypes import (COLUMNS, Scales, concat_frames, decode_frame,
+                                       encode_frame, parse_timestamps, to_decimals)
+from calculator.history_query import QueryResult, run_query
+from calculator.history_rollup import RollupStore
+from calculator.history_snapshot import (Snapshot, read_snapshot, source_signature,
+                                         write_snapshot)
+from calculator.jobs import checkpoint
+
+def _record_key(record: Dict[str, str]) -> Tuple[str, ...]:
+    """Return a text record as a hashable tuple of its columns."""
+    return tuple(record[column] for column in COLUMNS)
 
 class HistoryManager:
-    """Manages calculation history using Pandas DataFrame for efficient storage and analysis."""
+    """Manages calculation history using Pandas DataFrame for efficient storage and analysis.
+
+    Records are held once, in a CalculationStore in compact dtypes (see
+    calculator.history_dtypes), which Calculations also reads; every method
+    that hands records out returns them as text columns.
+
+    With autosave_interval set, the manager runs in write-behind mode: new
+    records are queued and a background thread appends them to the history
+    file in groups, every autosave_interval seconds or as soon as
+    autosave_batch records are pending. At most that much work can be lost
+    in a crash, and calculations never wait for the disk. New records are
+    appended to an existing history file even before it is loaded, but the
+    file is only rewritten once this manager has loaded or written it, so
+    its rows are never rewritten away unseen.
 
-    def __init__(self, history_file: str = "calculation_history.csv"):
-        """Initialize the history manager with the specified history file."""
+    Whenever the records match the history file (after a save, or on exit
+    once write-behind records are flushed) a binary snapshot of them and of
+    the rollups is written beside the file, and load_history restores it
+    instead of parsing the CSV while the file is unchanged.
+    """
+
+    def __init__(self, history_file: str = "calculation_history.csv",
+                 archive: Optional[HistoryArchive] = None,
+                 rollups: Optional[RollupStore] = None,
+                 autosave_interval: Optional[float] = None,
+                 autosave_batch: int = 100,
+                 store: Optional[CalculationStore] = None):
+        """Initialize the history manager with the specified history file and optional archive."""
         self.history_file = history_file
-        self.df = pd.DataFrame(columns=['timestamp', 'value1', 'value2', 'operation', 'result'])
+        self.archive = archive
+        self.rollups = rollups if rollups is not None else RollupStore.from_env()
+        self.rollup_file = history_file + ".rollup.json"
+        self.snapshot_file = history_file + ".snapshot"
+        self.store = store if store is not None else CalculationStore()
         self.logger = logging.getLogger(__name__)
+        # Bumped on every change so readers can cache derived views (e.g. formatted pages);
+        # token tells managers apart in those caches, unlike id() which is reused
+        self.token = uuid.uuid4().hex
+        self.version = 0
+        # Write-behind state: _lock guards the queue, _write_lock the file
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._pending: List[Dict[str, str]] = []
+        self._rewrite = False
+        # True while the history file, once the queue is flushed, holds exactly the records
+        self._in_sync = False
+        # True once the history file was loaded or written by this manager
+        self._file_known = False
+        self._unloaded_warned = False
+        # Records appended to the history file before it was loaded
+        self._appended_unseen: set = set()
+        self.autosave_interval = autosave_interval
+        self.autosave_batch = autosave_batch
+        self._wake = threading.Event()
+        self._stopping = False
+        self._writer = None
+        if autosave_interval is not None:
+            self._writer = threading.Thread(target=self._autosave_loop,
+                                            name="history-autosave", daemon=True)
+            self._writer.start()
+            # Unregistered by close(), so closed managers are not kept alive until exit
+            atexit.register(self.close)
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """The history records in their compact in-memory dtypes."""
+        return self.store.snapshot()[0]
+
+    @property
+    def scales(self) -> Scales:
+        """The scale of each numeric column of df (None for columns kept as text)."""
+        return self.store.snapshot()[1]
 
-    def add_calculation(self, calculation: Calculation) -> None:
-        """Add a calculation to the history DataFrame."""
+    @df.setter
+    def df(self, frame: pd.DataFrame) -> None:
+        """Replace the history with records given as text (or already typed) columns."""
+        self._replace(*encode_frame(frame))
+
+    def _replace(self, frame: pd.DataFrame, scales: Scales, rewrite: bool = True) -> None:
+        """Swap in new records; in write-behind mode the next flush rewrites the file."""
+        with self._lock:
+            self.store.replace(frame, scales)
+            self._rewrite = rewrite
+            # In write-behind mode the next flush rewrites the file to match
+            self._in_sync = not rewrite or self._writer is not None
+
+    def __len__(self) -> int:
+        """Return the number of history records."""
+        return len(self.store)
+
+    def memory_usage(self) -> int:
+        """Estimate the bytes held in memory by the records and rollups."""
+        return self.store.memory_usage() + self.rollups.memory_usage()
+
+    def has_unsaved_changes(self) -> bool:
+        """Whether the history holds changes that are not in the history file yet."""
+        with self._lock:
+            return not self._in_sync
+
+    def add_calculation(self, calculation: Calculation, result: Optional[Decimal] = None) -> None:
+        """Add a calculation to the history, computing its result unless it is given."""
         try:
             new_record = {
                 'timestamp': datetime.now().isoformat(),
                 'value1': str(calculation.value1),
                 'value2': str(calculation.value2),
                 'operation': calculation.operation.__name__,
-                'result': str(calculation.perform())
+                'result': str(result if result is not None else calculation.perform())
             }
-            self.df = pd.concat([self.df, pd.DataFrame([new_record])], ignore_index=True)
+            with self._lock:
+                self.store.append(new_record)
+                if self._writer is not None:
+                    self._pending.append(new_record)
+                    if len(self._pending) >= self.autosave_batch:
+                        self._wake.set()
+                else:
+                    self._in_sync = False
+                self.rollups.add(new_record['timestamp'], new_record['operation'],
+                                 new_record['result'])
+            self.version += 1
             self.logger.info("Added calculation to history: %s(%s, %s)",
                              calculation.operation.__name__, calculation.value1, calculation.value2)
         except Exception as e:
             self.logger.error("Failed to add calculation to history: %s", e)
             raise
 
+    def insert_records(self, frame: pd.DataFrame, scales: Scales) -> int:
+        """Insert encoded records among the existing ones in timestamp order.
+
+        The sort is stable, so existing records keep their order and come
+        before inserted records with the same timestamp. Returns the number
+        of records inserted.
+        """
+        if len(frame) == 0:
+            return 0
+        with self._lock:
+            combined, combined_scales = concat_frames([self.store.snapshot(), (frame, scales)])
+            stamps = combined['timestamp']
+            if not pd.api.types.is_datetime64_any_dtype(stamps):
+                stamps = parse_timestamps(stamps)
+            order = np.argsort(stamps.to_numpy(), kind='stable')
+            self._replace(combined.take(order).reset_index(drop=True), combined_scales)
+            self.rollups.extend([decode_frame(frame, scales)])
+        self.version += 1
+        self.logger.info("Inserted %d history records", len(frame))
+        return len(frame)
+
     def save_history(self) -> bool:
-        """Save the calculation history to a CSV file."""
+        """Save the calculation history to a CSV file, rolling old records into the archive."""
         try:
-            self.df.to_csv(self.history_file, index=False)
-            self.logger.info("Saved %d history records to %s", len(self.df), self.history_file)
+            with self._write_lock:
+                if self.archive is not None:
+                    self.roll_history()
+                with self._lock:
+                    snapshot = self._take_snapshot()
+                    # The full rewrite covers everything queued for write-behind
+                    pending, rewrite = self._pending, self._rewrite
+                    self._pending, self._rewrite = [], False
+                    self._in_sync = True
+                try:
+                    self._write_csv(self.history_file, snapshot.frame, snapshot.scales)
+                    self._file_known = True
+                    self._appended_unseen.clear()
+                except BaseException:
+                    # Also on JobCancelled: the old file is still in place, so it
+                    # still lacks what was queued for it
+                    with self._lock:
+                        self._pending = pending + self._pending
+                        self._rewrite = self._rewrite or rewrite
+                        self._in_sync = False
+                    raise
+                self.rollups.save(self.rollup_file, self._rollup_source(len(snapshot.frame)))
+                self._write_snapshot(snapshot)
+            self.logger.info("Saved %d history records to %s", len(snapshot.frame),
+                             self.history_file)
             return True
         except (IOError, pd.errors.EmptyDataError) as e:
+            with self._lock:
+                self._in_sync = False
             self.logger.error("Failed to save history: %s", e)
             return False
 
-    def load_history(self) -> bool:
-        """Load calculation history from the CSV file."""
+    def _rollup_source(self, records: int) -> List[int]:
+        """Return the signature persisted rollups are checked against: file size, mtime, records."""
+        return [*source_signature(self.history_file), records]
+
+    def _take_snapshot(self) -> Snapshot:
+        """Capture the records and rollups together; the caller holds _lock."""
+        frame, scales = self.store.snapshot()
+        return Snapshot(frame, scales, self.rollups.copy_tables())
+
+    def _write_snapshot(self, snapshot: Snapshot) -> bool:
+        """Write a warm-restart snapshot of records that match the history file."""
         try:
+            write_snapshot(self.snapshot_file, self.history_file, snapshot)
+            return True
+        except OSError as e:
+            self.logger.warning("Failed to write history snapshot: %s", e)
+            return False
+
+    def save_snapshot(self) -> bool:
+        """Flush write-behind records, then snapshot the history for a warm restart.
+
+        Skipped (returning False) when the history has changes the file does
+        not hold, since the snapshot must describe the file it is checked against.
+        """
+        with self._write_lock:
+            self.flush()
+            with self._lock:
+                if self.has_unsaved_changes() or self._pending or self._rewrite:
+                    self.logger.info("History has unsaved changes; no snapshot written")
+                    return False
+                snapshot = self._take_snapshot()
+            return self._write_snapshot(snapshot)
+
+    @staticmethod
+    def _write_csv(path: str, frame: pd.DataFrame, scales: Scales,
+                   chunksize: int = 10000) -> None:
+        """Write records as text to a CSV file, decoding one chunk at a time.
+
+        The file is written beside the target and renamed over it, so a crash
+        mid-write leaves the previous file intact.
+        """
+        temporary = path + ".tmp"
+        try:
+            with open(temporary, 'w', newline='', encoding='utf-8') as stream:
+                stream.write(','.join(COLUMNS) + '\n')
+                for start in range(0, len(frame), chunksize):
+                    checkpoint(start, len(frame))
+                    chunk = decode_frame(frame.iloc[start:start + chunksize], scales)
+                    chunk.to_csv(stream, index=False, header=False)
+                stream.flush()
+                os.fsync(stream.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def _append_csv(self, records: List[Dict[str, str]]) -> None:
+        """Append text records to the history file as one group commit."""
+        new_file = not os.path.exists(self.history_file)
+        with open(self.history_file, 'a', newline='', encoding='utf-8') as stream:
+            writer = csv.writer(stream, lineterminator='\n')
+            if new_file:
+                writer.writerow(COLUMNS)
+            writer.writerows([record[column] for column in COLUMNS] for record in records)
+            stream.flush()
+            os.fsync(stream.fileno())
+
+    def flush(self) -> int:
+        """Write the records queued by write-behind mode; return how many were written.
+
+        Does nothing unless autosave is enabled. Appends the queued records,
+        or rewrites the whole file if records were deleted or replaced since
+        the last write.
+        """
+        if self._writer is None:
+            return 0
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                rewrite, self._rewrite = self._rewrite, False
+                frame, scales = self.store.snapshot()
+            if not pending and not rewrite:
+                return 0
+            # Appending to a file that was never loaded is safe; rewriting it is not
+            unseen = not self._file_known and os.path.exists(self.history_file)
+            if unseen and rewrite:
+                with self._lock:
+                    self._pending = pending + self._pending
+                    self._rewrite = True
+                if not self._unloaded_warned:
+                    self._unloaded_warned = True
+                    self.logger.warning("History file %s was not loaded; autosave holds back "
+                                        "the rewrite until a history load or save",
+                                        self.history_file)
+                return 0
+            try:
+                if rewrite:
+                    self._write_csv(self.history_file, frame, scales)
+                else:
+                    self._append_csv(pending)
+                if unseen:
+                    self._appended_unseen.update(_record_key(record) for record in pending)
+                else:
+                    self._file_known = True
+            except BaseException:
+                with self._lock:
+                    self._pending = pending + self._pending
+                    self._rewrite = self._rewrite or rewrite
+                raise
+        self.logger.debug("Autosaved %d history records%s", len(pending),
+                          " (full rewrite)" if rewrite else "")
+        return len(pending)
+
+    def _autosave_loop(self) -> None:
+        """Background writer: flush every autosave_interval seconds or when woken early."""
+        while not self._stopping:
+            self._wake.wait(self.autosave_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                self.logger.error("Autosave failed, will retry: %s", e)
+
+    def close(self) -> None:
+        """Stop the autosave thread after writing everything still queued."""
+        if self._writer is None:
+            return
+        atexit.unregister(self.close)
+        self._stopping = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+
+    def load_history(self, chunksize: int = 10000) -> bool:
+        """Load calculation history from its snapshot, or from the CSV file if that changed."""
+        try:
+            # Queued records go to the file first so the load includes them
+            self.flush()
             if os.path.exists(self.history_file):
-                self.df = pd.read_csv(self.history_file)
-                self.logger.info("Loaded %d history "
-                "records from %s", len(self.df), self.history_file)
+                snapshot = read_snapshot(self.snapshot_file, self.history_file)
+                if snapshot is not None:
+                    frame, scales = snapshot.frame, snapshot.scales
+                else:
+                    frame, scales = self._read_csv(chunksize)
+                with self._lock:
+                    held = self._unwritten() if self._writer is not None and \
+                        not self._file_known else None
+                    # The records now match the file, so there is nothing to rewrite
+                    self._replace(frame, scales, rewrite=False)
+                    self._file_known = True
+                    self._appended_unseen.clear()
+                    if (snapshot is None or not self.rollups.restore(snapshot.rollups)) and \
+                       not self.rollups.load(self.rollup_file, self._rollup_source(len(frame))):
+                        self.rollups.rebuild(self.iter_chunks())
+                    if held is not None and len(held):
+                        # They join the loaded records, queued for the next append
+                        self._replace(*concat_frames([(frame, scales), encode_frame(held)]),
+                                      rewrite=False)
+                        self._pending = held.to_dict('records')
+                        self.rollups.extend([held])
+                    self.version += 1
+                self.logger.info("Loaded %d history records from %s", len(frame),
+                                 self.snapshot_file if snapshot is not None else self.history_file)
                 return True
             self.logger.warning("History file %s not found", self.history_file)
             return False
@@ -62,19 +384,57 @@ class HistoryManager:
             self.logger.error("Failed to load history: %s", e)
             return False
 
+    def _unwritten(self) -> pd.DataFrame:
+        """Return the records made before the history file was loaded that it still lacks.
+
+        The caller holds _lock. Records already appended to the file come
+        back with the load; edits made since to those cannot reach the file.
+        """
+        records = decode_frame(*self.store.snapshot())
+        if not self._appended_unseen:
+            return records
+        if self._rewrite:
+            self.logger.warning("Edits made before history file %s was loaded do not apply to "
+                                "the %d records already appended to it", self.history_file,
+                                len(self._appended_unseen))
+        keep = [_record_key(record) not in self._appended_unseen
+                for record in records.to_dict('records')]
+        return records[keep].reset_index(drop=True)
+
+    def _read_csv(self, chunksize: int) -> Tuple[pd.DataFrame, Scales]:
+        """Parse the history file into encoded records."""
+        # Read every column as text so stored results keep their exact digits,
+        # and encode chunk by chunk so the whole file is never held as strings
+        reader = pd.read_csv(self.history_file, dtype=str, chunksize=chunksize)
+        parts = []
+        for chunk in reader:
+            parts.append(encode_frame(chunk))
+            checkpoint(sum(len(part[0]) for part in parts))
+        return concat_frames(parts) if parts else encode_frame(pd.DataFrame(columns=COLUMNS))
+
     def clear_history(self) -> None:
         """Clear all history records from the DataFrame."""
-        record_count = len(self.df)
-        self.df = pd.DataFrame(columns=['timestamp', 'value1', 'value2', 'operation', 'result'])
+        with self._lock:
+            record_count = len(self)
+            self.df = pd.DataFrame(columns=COLUMNS)
+            self.rollups.clear()
+            self.version += 1
         self.logger.info("Cleared %d history records", record_count)
 
     def delete_record(self, index: int) -> bool:
         """Delete a specific record by index."""
         try:
-            if 0 <= index < len(self.df):
-                self.df = self.df.drop(index).reset_index(drop=True)
-                self.logger.info("Deleted record at index %d", index)
-                return True
+            # One critical section, so calculations added meanwhile are not replaced away
+            with self._lock:
+                frame, scales = self.store.snapshot()
+                if 0 <= index < len(frame):
+                    record = decode_frame(frame.iloc[index:index + 1], scales).iloc[0]
+                    self.rollups.remove(record['timestamp'], record['operation'],
+                                        record['result'])
+                    self._replace(frame.drop(index).reset_index(drop=True), scales)
+                    self.version += 1
+                    self.logger.info("Deleted record at index %d", index)
+                    return True
             self.logger.warning("Invalid index %d for deletion", index)
             return False
         except KeyError as e:
@@ -82,42 +442,149 @@ class HistoryManager:
             return False
 
     def get_history(self) -> pd.DataFrame:
-        """Get the entire history DataFrame."""
-        return self.df
+        """Get the entire history as a DataFrame of text columns."""
+        return decode_frame(*self.store.snapshot())
+
+    def get_window(self, start: int, stop: int) -> pd.DataFrame:
+        """Get the records in positions [start, stop) without decoding the rest of the history."""
+        return decode_frame(*self.store.window(start, stop))
+
+    def iter_chunks(self, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """Iterate over the history in windows of at most chunksize records."""
+        # One snapshot for the whole iteration, so appends meanwhile cannot shift windows
+        frame, scales = self.store.snapshot()
+        for start in range(0, len(frame), chunksize):
+            yield decode_frame(frame.iloc[start:start + chunksize], scales)
+
+    def iter_encoded(self, chunksize: int = 10000) -> Iterator[Tuple[pd.DataFrame, Scales]]:
+        """Iterate over the history in its compact dtypes, in windows of at most chunksize."""
+        frame, scales = self.store.snapshot()
+        for start in range(0, len(frame), chunksize):
+            yield frame.iloc[start:start + chunksize], scales
 
     def filter_by_operation(self, operation: str) -> pd.DataFrame:
         """Filter history by operation type."""
         try:
-            filtered = self.df[self.df['operation'] == operation]
+            frame, scales = self.store.snapshot()
+            filtered = decode_frame(frame[frame['operation'] == operation], scales)
             self.logger.info("Filtered %d records with operation '%s'", len(filtered), operation)
             return filtered
         except KeyError as e:
             self.logger.error("Failed to filter by operation: %s", e)
             return pd.DataFrame()
 
+    def query(self, text: str) -> QueryResult:
+        """Get the records matching a history query (see calculator.history_query).
+
+        The result is a lazy view of the current snapshot; records are only
+        decoded when a window of it is read. Raises QueryError for bad queries.
+        """
+        frame, scales = self.store.snapshot()
+        result = run_query(text, frame, scales)
+        self.logger.info("Query '%s' matched %d records", text, len(result))
+        return result
+
+    def roll_history(self, now: Optional[datetime] = None) -> int:
+        """Move records from before the current time bucket into the archive.
+
+        Cold segments are compressed and the retention policy is applied
+        afterwards. Returns the number of records moved out of the live history.
+        """
+        if self.archive is None:
+            return 0
+        now = now or datetime.now()
+        moved = 0
+        with self._lock:
+            frame, scales = self.store.snapshot()
+            if len(frame):
+                cutoff = self.archive.bucket_start(now)
+                old = self._timestamps(frame) < cutoff
+                moved = int(old.sum())
+                if moved:
+                    archived = decode_frame(frame[old], scales)
+                    self.archive.write(archived)
+                    self._replace(frame[~old].reset_index(drop=True), scales)
+                    # Rollups cover the live history, as a rebuild from it would
+                    self.rollups.discard([archived])
+                    self.version += 1
+        self.archive.compress_cold(now)
+        self.archive.apply_retention(now)
+        self.logger.info("Rolled %d history records into the archive", moved)
+        return moved
+
+    def query_range(self, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> pd.DataFrame:
+        """Get records with start <= timestamp < end from the archive and the live history."""
+        frames = list(self.archive.read_range(start, end)) if self.archive is not None else []
+        live, scales = self.store.snapshot()
+        if len(live) and (start is not None or end is not None):
+            stamps = self._timestamps(live)
+            mask = pd.Series(True, index=live.index)
+            if start is not None:
+                mask &= stamps >= start
+            if end is not None:
+                mask &= stamps < end
+            live = live[mask]
+        if len(live) or not frames:
+            frames.append(decode_frame(live, scales))
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _timestamps(frame: pd.DataFrame) -> pd.Series:
+        """Return the timestamp column as datetime64, parsing it if it was kept as text."""
+        stamps = frame['timestamp']
+        if pd.api.types.is_datetime64_any_dtype(stamps):
+            return stamps
+        return parse_timestamps(stamps)
+
+    def get_rollup(self, granularity: str, operation: Optional[str] = None) -> pd.DataFrame:
+        """Get per-bucket counts and result sums from the materialized rollups."""
+        return self.rollups.query(granularity, operation)
+
     def get_statistics(self) -> Dict[str, Any]:
         """Calculate statistics from the history."""
-        if len(self.df) == 0:
+        frame, scales = self.store.snapshot()
+        if len(frame) == 0:
             return {"status": "empty", "message": "No history data available"}
 
+        counts = frame['operation'].value_counts()
+        stamps = frame['timestamp']
+        first, last = stamps.min(), stamps.max()
         stats = {
-            "total_calculations": len(self.df),
-            "operations_count": self.df['operation'].value_counts().to_dict(),
-            "first_calculation": self.df['timestamp'].min(),
-            "last_calculation": self.df['timestamp'].max(),
+            "total_calculations": len(frame),
+            "operations_count": counts[counts > 0].to_dict(),
+            "first_calculation": first.isoformat() if isinstance(first, pd.Timestamp) else first,
+            "last_calculation": last.isoformat() if isinstance(last, pd.Timestamp) else last,
             "average_results": {}
         }
 
         # Calculate average results with specific exception handling
         try:
-            self.df['numeric_result'] = self.df['result'].apply(Decimal)
-            avg_by_op = self.df.groupby('operation')['numeric_result'].mean()
-            stats["average_results"] = {op: str(avg) for op, avg in avg_by_op.items()}
-        except (ValueError, TypeError):
+            numeric_result = to_decimals(frame, scales, 'result')
+            sums = numeric_result.groupby(frame['operation'], observed=True).sum()
+            stats["average_results"] = {op: str(total / counts[op]) for op, total in sums.items()}
+        except (ValueError, TypeError, ArithmeticError):
             stats["average_results"] = "Unable to calculate"
 
         self.logger.info("Generated history statistics")
         return stats
 
+def create_history_manager():
+    """Create the history manager for the backend selected by HISTORY_BACKEND (csv or sqlite)."""
+    backend = os.getenv("HISTORY_BACKEND", "csv").lower()
+    interval = os.getenv("HISTORY_AUTOSAVE_INTERVAL")
+    archive = HistoryArchive.from_env()
+    if backend == "sqlite":
+        # Imported here so the CSV backend does not depend on sqlite3
+        from calculator.sqlite_history import SQLiteHistoryManager  # pylint: disable=import-outside-toplevel
+        return SQLiteHistoryManager(os.getenv("HISTORY_DB", "calculation_history.db"),
+                                    batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "100")),
+                                    archive=archive)
+    if backend != "csv":
+        logging.getLogger(__name__).warning("Unknown history backend %s, using csv", backend)
+    return HistoryManager(archive=archive,
+                          autosave_interval=float(interval) if interval else None,
+                          autosave_batch=int(os.getenv("HISTORY_AUTOSAVE_BATCH", "100")))
+
 # Create a singleton instance for global use
-history_manager = HistoryManager()
+history_manager = create_history_manager()
@@ -0,0 +1,184 @@
+"""
+History Merge Module
+
+Merges history files, for example from several machines, into the live
+history. Each file is streamed in chunks, and every record is reduced to a
+64-bit hash of its timestamp, operands, operation and result. The hash is
+computed from the compact columns, with numbers reduced to coefficient and
+exponent without trailing zeros, so '1.50' matches '1.5' and nothing has to
+be formatted back to text. Records whose hash is already in the index built
+from the current history, or from earlier files, are skipped; the rest are
+inserted in timestamp order. Time is linear in the number of records read,
+and memory beyond the new records themselves is the hash index, one integer
+per record.
+
+Two different records with the same hash would be treated as duplicates;
+for a million records the chance of that is about one in 40 million.
+"""
+import time
+import hashlib
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from calculator.history_dtypes import (COLUMNS, NUMERIC_COLUMNS, Scales, concat_frames,
+                                       encode_frame, parse_timestamps, text_column)
+from calculator.jobs import checkpoint
+
+MERGE_CHUNK_SIZE = 10000
+# Exponent marking a key that is the hash of text rather than a number or time
+TEXT_KEY = np.iinfo(np.int64).min
+
+logger = logging.getLogger(__name__)
+
+class MergeReport(NamedTuple):
+    """Outcome of merging history files."""
+    files: int
+    read: int
+    added: int
+    duplicates: int
+    failures: List[Tuple[str, str]]
+    seconds: float
+
+def _text_hash(text) -> int:
+    """Return a stable signed 64-bit hash of a value's text."""
+    digest = hashlib.blake2b(str(text).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+def _number_key(text) -> Tuple[int, int]:
+    """Return (coefficient, exponent) of a number kept as text, or its text hash."""
+    try:
+        sign, digits, exponent = Decimal(text).as_tuple()
+    except (InvalidOperation, TypeError, ValueError):
+        return _text_hash(text), TEXT_KEY
+    if isinstance(exponent, int):  # not NaN or infinity
+        coefficient = int(''.join(map(str, digits)))
+        while coefficient and coefficient % 10 == 0:
+            coefficient //= 10
+            exponent += 1
+        if -2 ** 63 <= coefficient < 2 ** 63:
+            return (-coefficient if sign else coefficient), (exponent if coefficient else 0)
+    return _text_hash(text), TEXT_KEY
+
+def _decimal_keys(values: pd.Series, scale: Optional[int],
+                  texts: Optional[pd.Series] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the coefficients and exponents of a numeric column without trailing zeros.
+
+    texts is the column's companion of values kept as text, if it has one.
+    """
+    if scale is None:
+        keys = [_number_key(text) for text in values]
+        return (np.fromiter((key[0] for key in keys), np.int64, len(keys)),
+                np.fromiter((key[1] for key in keys), np.int64, len(keys)))
+    coefficient = values.to_numpy(dtype=np.int64).copy()
+    exponent = np.full(len(coefficient), -scale, dtype=np.int64)
+    strip = (coefficient % 10 == 0) & (coefficient != 0)
+    while strip.any():
+        coefficient[strip] //= 10
+        exponent[strip] += 1
+        strip = (coefficient % 10 == 0) & (coefficient != 0)
+    exponent[coefficient == 0] = 0
+    if texts is not None:
+        for row in np.flatnonzero(texts.notna().to_numpy()).tolist():
+            coefficient[row], exponent[row] = _number_key(texts.iloc[row])
+    return coefficient, exponent
+
+def _timestamp_keys(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Return microseconds since the epoch, or the text hash of unparsable timestamps."""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        # Timestamps with offsets are keyed by their text, like unparsable ones
+        parsed = parse_timestamps(values, utc=False)
+        keys, kinds = _timestamp_keys(parsed.fillna(pd.Timestamp(0)))
+        unparsed = parsed.isna().to_numpy()
+        keys[unparsed] = [_text_hash(text) for text in values[unparsed]]
+        kinds[unparsed] = TEXT_KEY
+        return keys, kinds
+    stamps = values.to_numpy(dtype='datetime64[us]').view(np.int64).copy()
+    return stamps, np.zeros(len(stamps), dtype=np.int64)
+
+def record_hashes(frame: pd.DataFrame, scales: Scales) -> np.ndarray:
+    """Hash compact history records on all of their columns."""
+    keys = {}
+    keys['timestamp'], keys['timestamp_kind'] = _timestamp_keys(frame['timestamp'])
+    for column in NUMERIC_COLUMNS:
+        keys[column], keys[column + '_exponent'] = _decimal_keys(
+            frame[column], scales[column], frame.get(text_column(column)))
+    operations = frame['operation']
+    if isinstance(operations.dtype, pd.CategoricalDtype):
+        names = pd.util.hash_array(np.asarray(operations.cat.categories, dtype=object))
+        keys['operation'] = names[operations.cat.codes.to_numpy()]
+    else:
+        keys['operation'] = pd.util.hash_array(operations.to_numpy(dtype=object))
+    return pd.util.hash_pandas_object(pd.DataFrame(keys), index=False).to_numpy()
+
+class HashIndex:
+    """Content hashes of the records already in the history."""
+
+    def __init__(self):
+        """Start with an empty index."""
+        self._hashes: Set[int] = set()
+
+    def __len__(self) -> int:
+        """Return the number of distinct records indexed."""
+        return len(self._hashes)
+
+    def add_chunks(self, chunks: Iterable[Tuple[pd.DataFrame, Scales]]) -> None:
+        """Index chunks of compact history records."""
+        for frame, scales in chunks:
+            self._hashes.update(record_hashes(frame, scales).tolist())
+
+    def update(self, hashes: Set[int]) -> None:
+        """Index hashes collected by unseen()."""
+        self._hashes |= hashes
+
+    def unseen(self, hashes: np.ndarray, seen: Set[int]) -> np.ndarray:
+        """Mask the hashes in neither the index nor seen, adding those to seen."""
+        known = self._hashes
+        mask = np.zeros(len(hashes), dtype=bool)
+        for position, value in enumerate(hashes.tolist()):
+            if value not in known and value not in seen:
+                seen.add(value)
+                mask[position] = True
+        return mask
+
+def merge_history(manager, paths: Iterable[str],
+                  chunksize: int = MERGE_CHUNK_SIZE) -> MergeReport:
+    """Merge the records of history CSV files that the manager does not hold yet.
+
+    A file that cannot be read is reported in failures and contributes no
+    records; the other files are still merged.
+    """
+    started = time.perf_counter()
+    index = HashIndex()
+    index.add_chunks(manager.iter_encoded(chunksize))
+    parts, failures = [], []
+    files = read = duplicates = 0
+    for path in paths:
+        # A file's records only join the index once the whole file has been read
+        file_parts, seen, file_read = [], set(), 0
+        try:
+            for chunk in pd.read_csv(path, dtype=str, chunksize=chunksize):
+                missing = [column for column in COLUMNS if column not in chunk.columns]
+                if missing:
+                    raise ValueError(f"missing columns: {', '.join(missing)}")
+                frame, scales = encode_frame(chunk[COLUMNS])
+                new = index.unseen(record_hashes(frame, scales), seen)
+                if new.any():
+                    file_parts.append((frame[new], scales))
+                file_read += len(chunk)
+                checkpoint(read + file_read)
+        except (OSError, ValueError) as e:
+            logger.warning("Skipped history file %s: %s", path, e)
+            failures.append((path, str(e)))
+            continue
+        index.update(seen)
+        parts.extend(file_parts)
+        files += 1
+        read += file_read
+        duplicates += file_read - len(seen)
+    added = manager.insert_records(*concat_frames(parts)) if parts else 0
+    report = MergeReport(files, read, added, duplicates, failures, time.perf_counter() - started)
+    logger.info("Merged %d new history records from %d files (%d duplicates)",
+                added, files, duplicates)
+    return report
@@ -0,0 +1,436 @@
+"""
+History Query Module
+
+A small filter language over the history, for example
+
+    op = division and result > 100 and ts >= 2025-03-01
+
+Comparisons (=, !=, <, <=, >, >=) between a field and a literal combine with
+and, or, not and parentheses. The fields are op (operation), v1 (value1),
+v2 (value2), result and ts (timestamp). A query string is parsed once into a
+plan and compiled into vectorized mask functions over the compact columns of
+calculator.history_dtypes; compiled queries are cached per string.
+
+Operation tests compare categorical codes. Timestamp bounds that every match
+must satisfy are answered with a binary search when the timestamps are in
+order, as they are when records are appended, so only the rows inside the
+time range are scanned. Results are lazy views of the snapshot they were
+computed on: only record positions are kept, and records are decoded when
+a window of them is read.
+
+For stores that hold the records as text in SQL (calculator.sqlite_history),
+sql_prefilter turns the operation tests and timestamp bounds every match must
+satisfy into a WHERE clause, so only candidate rows are read and encoded and
+the numeric comparisons run on those alone.
+"""
+import re
+import weakref
+import operator
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from calculator.history_dtypes import Scales, decode_frame, parse_timestamps, text_column
+
+QUERY_CACHE_SIZE = 256
+
+FIELDS = {
+    'op': 'operation', 'operation': 'operation',
+    'v1': 'value1', 'value1': 'value1',
+    'v2': 'value2', 'value2': 'value2',
+    'result': 'result',
+    'ts': 'timestamp', 'timestamp': 'timestamp',
+}
+COMPARISONS = {
+    '=': operator.eq, '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+_TOKEN = re.compile(r"""\s*(?:(?P<punct>[()])|(?P<cmp>==|!=|<=|>=|=|<|>)
+                        |(?P<quoted>"[^"]*"|'[^']*')|(?P<word>[^\s()=!<>"']+))""", re.VERBOSE)
+
+Mask = np.ndarray
+Rows = Union[slice, np.ndarray]
+
+class QueryError(ValueError):
+    """A query string that cannot be parsed or compiled."""
+
+class Compare(NamedTuple):
+    """field <op> literal, with the literal already converted for the field."""
+    field: str
+    op: str
+    value: object
+
+class And(NamedTuple):
+    """All terms hold."""
+    terms: Tuple
+
+class Or(NamedTuple):
+    """Any term holds."""
+    terms: Tuple
+
+class Not(NamedTuple):
+    """The term does not hold."""
+    term: object
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    """Split a query into (kind, text) tokens."""
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise QueryError(f"Unexpected character '{text[position:].lstrip()[0]}' in query")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        tokens.append(('word', value[1:-1]) if kind == 'quoted' else (kind, value))
+    return tokens
+
+def _literal(field: str, op: str, text: str):
+    """Convert a literal to the type its field is compared in."""
+    if field == 'operation':
+        if op not in ('=', '==', '!='):
+            raise QueryError("op can only be compared with = or !=")
+        return text
+    if field == 'timestamp':
+        try:
+            return np.datetime64(pd.Timestamp(text).to_datetime64(), 'us')
+        except ValueError as e:
+            raise QueryError(f"Invalid timestamp '{text}'") from e
+    try:
+        value = Decimal(text)
+    except InvalidOperation as e:
+        raise QueryError(f"Invalid number '{text}' for {field}") from e
+    if not value.is_finite():
+        raise QueryError(f"Invalid number '{text}' for {field}")
+    return value
+
+class _Parser:
+    """Recursive descent parser: or_expr := and_expr ('or' and_expr)*, and so on."""
+
+    def __init__(self, text: str):
+        """Tokenize the query."""
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        """Return the next token without consuming it."""
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _keyword(self, word: str) -> bool:
+        """Consume the keyword if it is next."""
+        token = self._peek()
+        if token is not None and token[0] == 'word' and token[1].lower() == word:
+            self.position += 1
+            return True
+        return False
+
+    def _next(self, what: str) -> Tuple[str, str]:
+        """Consume the next token, which must exist."""
+        token = self._peek()
+        if token is None:
+            raise QueryError(f"Query ended where {what} was expected")
+        self.position += 1
+        return token
+
+    def parse(self):
+        """Parse the whole query."""
+        if not self.tokens:
+            raise QueryError("Empty query")
+        plan = self._or()
+        if self._peek() is not None:
+            raise QueryError(f"Unexpected '{self._peek()[1]}' in query")
+        return plan
+
+    def _or(self):
+        """Parse terms joined by 'or'."""
+        terms = [self._and()]
+        while self._keyword('or'):
+            terms.append(self._and())
+        return terms[0] if len(terms) == 1 else Or(tuple(terms))
+
+    def _and(self):
+        """Parse terms joined by 'and'."""
+        terms = [self._not()]
+        while self._keyword('and'):
+            terms.append(self._not())
+        return terms[0] if len(terms) == 1 else And(tuple(terms))
+
+    def _not(self):
+        """Parse a negation, a parenthesized query or a comparison."""
+        if self._keyword('not'):
+            return Not(self._not())
+        if self._peek() == ('punct', '('):
+            self.position += 1
+            plan = self._or()
+            if self._next("')'") != ('punct', ')'):
+                raise QueryError("Missing ')' in query")
+            return plan
+        return self._compare()
+
+    def _compare(self):
+        """Parse field, comparison and literal."""
+        kind, name = self._next("a field")
+        field = FIELDS.get(name.lower()) if kind == 'word' else None
+        if field is None:
+            raise QueryError(f"Unknown field '{name}'. Use one of: op, v1, v2, result, ts")
+        kind, op = self._next("a comparison")
+        if kind != 'cmp':
+            raise QueryError(f"Expected a comparison after '{name}', found '{op}'")
+        kind, text = self._next("a value")
+        if kind != 'word':
+            raise QueryError(f"Expected a value after '{name} {op}', found '{text}'")
+        return Compare(field, op, _literal(field, op, text))
+
+def parse_query(text: str):
+    """Parse a query string into its plan (a tree of Compare, And, Or and Not)."""
+    return _Parser(text).parse()
+
+class _Columns:
+    """Column arrays of one frame, converted for comparison once per evaluation."""
+
+    def __init__(self, frame: pd.DataFrame, scales: Scales):
+        """Wrap a frame (typically a slice of a snapshot)."""
+        self.frame = frame
+        self.scales = scales
+        self._cache: Dict[str, object] = {}
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return len(self.frame)
+
+    def get(self, field: str):
+        """Return the values of a field as a numpy array."""
+        if field not in self._cache:
+            values = self.frame[field]
+            if field == 'timestamp' and not pd.api.types.is_datetime64_any_dtype(values):
+                values = parse_timestamps(values)
+            self._cache[field] = values.to_numpy()
+        return self._cache[field]
+
+def _compare_scaled(values: np.ndarray, op: str, literal: Decimal, scale: int) -> Mask:
+    """Compare int64 values that stand for value / 10**scale with an exact literal."""
+    bound = literal.scaleb(scale)
+    floor, ceiling = int(bound.to_integral_value('ROUND_FLOOR')), \
+        int(bound.to_integral_value('ROUND_CEILING'))
+    if op in ('=', '==', '!='):
+        if floor != ceiling:
+            # No scaled integer equals a literal with more digits than the column
+            return np.full(len(values), op == '!=')
+        target = floor
+    else:
+        # For integers x: x > c <=> x > floor(c), x >= c <=> x >= ceil(c), and so on
+        target = floor if op in ('>', '<=') else ceiling
+    info = np.iinfo(np.int64)
+    if target > info.max or target < info.min:
+        above = target > info.max
+        answer = {'=': False, '==': False, '!=': True,
+                  '<': above, '<=': above, '>': not above, '>=': not above}[op]
+        return np.full(len(values), answer)
+    return COMPARISONS[op](values, np.int64(target))
+
+def _compare_text(values: np.ndarray, op: str, literal: Decimal) -> Mask:
+    """Compare a column kept as text, treating unparsable values as not matching."""
+    compare = COMPARISONS[op]
+
+    def test(text) -> bool:
+        try:
+            number = Decimal(text)
+        except (InvalidOperation, TypeError):
+            return op == '!='
+        return op == '!=' if number.is_nan() else compare(number, literal)
+    return np.fromiter((test(text) for text in values), dtype=bool, count=len(values))
+
+def _compile(plan) -> Callable[[_Columns], Mask]:
+    """Compile a plan into a function from columns to a boolean mask."""
+    if isinstance(plan, And):
+        parts = [_compile(term) for term in plan.terms]
+        return lambda columns: np.logical_and.reduce([part(columns) for part in parts])
+    if isinstance(plan, Or):
+        parts = [_compile(term) for term in plan.terms]
+        return lambda columns: np.logical_or.reduce([part(columns) for part in parts])
+    if isinstance(plan, Not):
+        part = _compile(plan.term)
+        return lambda columns: ~part(columns)
+    field, op, value = plan
+    compare = COMPARISONS[op]
+    if field == 'operation':
+        def operation_mask(columns: _Columns) -> Mask:
+            values = columns.frame['operation']
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                categories = values.cat.categories
+                code = categories.get_loc(value) if value in categories else -2
+                return compare(values.cat.codes.to_numpy(), code)
+            return compare(values.to_numpy(dtype=object), value)
+        return operation_mask
+    if field == 'timestamp':
+        # NaT (unparsable text timestamps) compares False, as the text fallback does
+        return lambda columns: compare(columns.get('timestamp'), value)
+
+    def number_mask(columns: _Columns) -> Mask:
+        scale = columns.scales.get(field)
+        if scale is None:
+            return _compare_text(columns.get(field), op, value)
+        mask = _compare_scaled(columns.get(field), op, value, scale)
+        texts = columns.frame.get(text_column(field))
+        if texts is not None:
+            kept = texts.notna().to_numpy()
+            if kept.any():
+                mask[kept] = _compare_text(texts.to_numpy(dtype=object)[kept], op, value)
+        return mask
+    return number_mask
+
+def _time_bounds(plan) -> Tuple[list, object]:
+    """Split the timestamp bounds every match must satisfy from the rest of the plan."""
+    terms = plan.terms if isinstance(plan, And) else (plan,)
+    bounds, rest = [], []
+    for term in terms:
+        if isinstance(term, Compare) and term.field == 'timestamp' and term.op != '!=':
+            bounds.append(term)
+        else:
+            rest.append(term)
+    residual = None if not rest else rest[0] if len(rest) == 1 else And(tuple(rest))
+    return bounds, residual
+
+def sql_prefilter(plan) -> Tuple[str, list, object]:
+    """Split a plan into a SQL WHERE clause on the TEXT history columns and the rest.
+
+    Operation tests are answered exactly in SQL. Timestamp bounds are widened
+    to whole seconds, since ISO timestamps sort as text only to the second,
+    and are kept in the residual plan as well. Returns the clause (empty, or
+    starting with ' WHERE'), its parameters and the residual plan, or None
+    when the clause alone decides the matches.
+    """
+    terms = plan.terms if isinstance(plan, And) else (plan,)
+    clauses, params, rest = [], [], []
+    for term in terms:
+        if isinstance(term, Compare) and term.field == 'operation':
+            clauses.append("operation != ?" if term.op == '!=' else "operation = ?")
+            params.append(term.value)
+            continue
+        if isinstance(term, Compare) and term.field == 'timestamp' and term.op != '!=':
+            second = term.value.astype('datetime64[s]')
+            if term.op in ('>', '>=', '=', '=='):
+                clauses.append("timestamp >= ?")
+                params.append(str(second))
+            if term.op in ('<', '<=', '=', '=='):
+                clauses.append("timestamp < ?")
+                params.append(str(second + 1))
+        rest.append(term)
+    residual = None if not rest else rest[0] if len(rest) == 1 else And(tuple(rest))
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params, residual
+
+_sorted_frame: Tuple[Optional[weakref.ref], bool] = (None, False)
+
+def _timestamps_sorted(frame: pd.DataFrame) -> bool:
+    """Whether a frame's datetime64 timestamps are ascending, remembered per frame."""
+    global _sorted_frame  # pylint: disable=global-statement
+    reference, answer = _sorted_frame
+    if reference is not None and reference() is frame:
+        return answer
+    stamps = frame['timestamp']
+    answer = pd.api.types.is_datetime64_any_dtype(stamps) and \
+        bool(stamps.is_monotonic_increasing) and not stamps.hasnans
+    _sorted_frame = (weakref.ref(frame), answer)
+    return answer
+
+class QueryResult:
+    """Lazy view of the records matching a query in one history snapshot."""
+
+    def __init__(self, frame: pd.DataFrame, scales: Scales, rows: Rows):
+        """Keep the snapshot and the positions of the matching rows."""
+        self.frame = frame
+        self.scales = scales
+        self.rows = rows
+
+    def __len__(self) -> int:
+        """Return the number of matching records."""
+        if isinstance(self.rows, slice):
+            return self.rows.stop - self.rows.start
+        return len(self.rows)
+
+    def positions(self) -> np.ndarray:
+        """Return the positions of the matching records in the snapshot."""
+        if isinstance(self.rows, slice):
+            return np.arange(self.rows.start, self.rows.stop)
+        return self.rows
+
+    def window(self, start: int, stop: int) -> pd.DataFrame:
+        """Decode matches [start, stop) as text columns, indexed by record id."""
+        start, stop = max(0, start), min(len(self), stop)
+        if isinstance(self.rows, slice):
+            base = self.rows.start
+            part = self.frame.iloc[base + start:base + max(start, stop)]
+        else:
+            part = self.frame.take(self.rows[start:max(start, stop)])
+        return decode_frame(part, self.scales)
+
+    def iter_chunks(self, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """Decode the matches in windows of at most chunksize records."""
+        for start in range(0, len(self), chunksize):
+            yield self.window(start, start + chunksize)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Decode every match."""
+        return self.window(0, len(self))
+
+class Query:
+    """A compiled query, reusable across snapshots."""
+
+    def __init__(self, text: str):
+        """Parse and compile the query."""
+        self.text = text
+        self.plan = parse_query(text)
+        self._mask = _compile(self.plan)
+        self.bounds, residual = _time_bounds(self.plan)
+        self._residual = _compile(residual) if residual is not None else None
+        self.sql_where, self.sql_params, residual = sql_prefilter(self.plan)
+        self._sql_residual = _compile(residual) if residual is not None else None
+
+    def _row_range(self, frame: pd.DataFrame) -> Optional[Tuple[int, int]]:
+        """Narrow ordered timestamps to the bounds with a binary search, if possible."""
+        if not self.bounds or not _timestamps_sorted(frame):
+            return None
+        stamps = frame['timestamp'].to_numpy()
+        start, stop = 0, len(stamps)
+        for _, op, value in self.bounds:
+            if op in ('>', '>='):
+                start = max(start, int(np.searchsorted(stamps, value,
+                                                       'right' if op == '>' else 'left')))
+            if op in ('<', '<='):
+                stop = min(stop, int(np.searchsorted(stamps, value,
+                                                     'left' if op == '<' else 'right')))
+            if op in ('=', '=='):
+                start = max(start, int(np.searchsorted(stamps, value, 'left')))
+                stop = min(stop, int(np.searchsorted(stamps, value, 'right')))
+        return start, max(start, stop)
+
+    def run(self, frame: pd.DataFrame, scales: Scales) -> QueryResult:
+        """Evaluate the query on a snapshot of compact records."""
+        row_range = self._row_range(frame)
+        if row_range is None:
+            mask = self._mask(_Columns(frame, scales))
+            return QueryResult(frame, scales, np.flatnonzero(mask))
+        start, stop = row_range
+        if self._residual is None:
+            return QueryResult(frame, scales, slice(start, stop))
+        mask = self._residual(_Columns(frame.iloc[start:stop], scales))
+        return QueryResult(frame, scales, np.flatnonzero(mask) + start)
+
+    def run_prefiltered(self, frame: pd.DataFrame, scales: Scales) -> QueryResult:
+        """Evaluate the query on the rows selected by its SQL prefilter (sql_where)."""
+        if self._sql_residual is None:
+            return QueryResult(frame, scales, slice(0, len(frame)))
+        mask = self._sql_residual(_Columns(frame, scales))
+        return QueryResult(frame, scales, np.flatnonzero(mask))
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def compile_query(text: str) -> Query:
+    """Return the compiled form of a query string, compiling it on first use."""
+    return Query(text)
+
+def run_query(text: str, frame: pd.DataFrame, scales: Scales) -> QueryResult:
+    """Evaluate a query string on a snapshot of compact records."""
+    return compile_query(text).run(frame, scales)
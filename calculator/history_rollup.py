@@ -0,0 +1,209 @@
+"""
+History Rollup Module
+
+Maintains materialized per-bucket counts and result sums for each operation
+at configurable time granularities. The tables are updated as records are
+added and deleted, so reading them costs time proportional to the number of
+buckets rather than the number of history records. They cover the live
+history only: records rolled into the archive leave the rollups with it.
+
+Persisted tables carry a signature of the history they summarize (the size
+and modification time of a CSV history file, or a record count), and are
+only loaded while the history still has that signature. A store is safe to
+update and read from several threads.
+"""
+import os
+import json
+import logging
+import threading
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Sequence
+import pandas as pd
+
+# Length of the ISO timestamp prefix that identifies a bucket, e.g.
+# '2025-03-16T01:18' for the minute bucket of '2025-03-16T01:18:16.508049'
+GRANULARITIES = {
+    "minute": 16,
+    "hour": 13,
+    "day": 10,
+    "month": 7,
+}
+DEFAULT_GRANULARITIES = ("minute", "hour")
+ROLLUP_FORMAT_VERSION = 2
+# Approximate memory of one bucket: its dict entry, key, [count, Decimal sum] list
+BUCKET_BYTES = 250
+
+Tables = Dict[str, Dict[str, Dict[str, list]]]
+
+def tables_to_json(tables: Tables) -> dict:
+    """Return rollup tables as JSON-ready data, with the sums as exact decimal text."""
+    return {name: {op: {bucket: [count, str(total)]
+                        for bucket, (count, total) in buckets.items()}
+                   for op, buckets in table.items()}
+            for name, table in tables.items()}
+
+def tables_from_json(data: dict) -> Tables:
+    """Return rollup tables from the data of tables_to_json."""
+    return {name: {op: {bucket: [count, Decimal(total)]
+                        for bucket, (count, total) in buckets.items()}
+                   for op, buckets in table.items()}
+            for name, table in data.items()}
+
+class RollupStore:
+    """Per-granularity tables of {operation: {bucket: [count, result_sum]}}."""
+
+    def __init__(self, granularities: Sequence[str] = DEFAULT_GRANULARITIES):
+        """Initialize empty rollup tables for the given granularities."""
+        unknown = [name for name in granularities if name not in GRANULARITIES]
+        if unknown:
+            raise ValueError(f"Unknown rollup granularity: {', '.join(unknown)}")
+        self.granularities = tuple(granularities)
+        self.tables: Tables = {}
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self.clear()
+
+    @classmethod
+    def from_env(cls) -> "RollupStore":
+        """Create a rollup store with granularities from HISTORY_ROLLUPS (comma separated)."""
+        names = os.getenv("HISTORY_ROLLUPS", ",".join(DEFAULT_GRANULARITIES))
+        return cls([name.strip().lower() for name in names.split(",") if name.strip()])
+
+    def clear(self) -> None:
+        """Empty every rollup table."""
+        with self._lock:
+            self.tables = {name: {} for name in self.granularities}
+
+    @staticmethod
+    def _to_decimal(result) -> Decimal:
+        """Convert a stored result to Decimal, counting unparsable results as zero."""
+        try:
+            return Decimal(str(result))
+        except InvalidOperation:
+            return Decimal(0)
+
+    def _apply(self, timestamp: str, operation: str, result, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) one record from every table."""
+        value = self._to_decimal(result)
+        with self._lock:
+            for name in self.granularities:
+                buckets = self.tables[name].setdefault(operation, {})
+                bucket = timestamp[:GRANULARITIES[name]]
+                entry = buckets.setdefault(bucket, [0, Decimal(0)])
+                entry[0] += sign
+                entry[1] += sign * value
+                if entry[0] <= 0:
+                    del buckets[bucket]
+                    if not buckets:
+                        del self.tables[name][operation]
+
+    def add(self, timestamp: str, operation: str, result) -> None:
+        """Account for a newly appended record."""
+        self._apply(str(timestamp), str(operation), result, 1)
+
+    def remove(self, timestamp: str, operation: str, result) -> None:
+        """Account for a deleted record."""
+        self._apply(str(timestamp), str(operation), result, -1)
+
+    def rebuild(self, chunks: Iterable[pd.DataFrame]) -> None:
+        """Recompute every table from history chunks, one groupby per chunk and granularity."""
+        with self._lock:
+            self.clear()
+            self.extend(chunks)
+        self.logger.info("Rebuilt history rollups")
+
+    def extend(self, chunks: Iterable[pd.DataFrame]) -> None:
+        """Account for chunks of newly inserted records."""
+        self._accumulate(chunks, 1)
+
+    def discard(self, chunks: Iterable[pd.DataFrame]) -> None:
+        """Account for chunks of records removed from the history, e.g. archived ones."""
+        self._accumulate(chunks, -1)
+
+    def _accumulate(self, chunks: Iterable[pd.DataFrame], sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) chunks of records, one groupby per granularity."""
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            stamps = chunk['timestamp'].astype(str)
+            values = chunk['result'].map(self._to_decimal)
+            operations = chunk['operation'].astype(str)
+            for name in self.granularities:
+                keys = stamps.str.slice(0, GRANULARITIES[name])
+                totals = [(operation, bucket, len(group), sum(group, Decimal(0)))
+                          for (operation, bucket), group
+                          in values.groupby([operations, keys], sort=False)]
+                with self._lock:
+                    for operation, bucket, count, total in totals:
+                        buckets = self.tables[name].setdefault(operation, {})
+                        entry = buckets.setdefault(bucket, [0, Decimal(0)])
+                        entry[0] += sign * count
+                        entry[1] += sign * total
+                        if entry[0] <= 0:
+                            del buckets[bucket]
+                            if not buckets:
+                                del self.tables[name][operation]
+
+    def query(self, granularity: str, operation: Optional[str] = None) -> pd.DataFrame:
+        """Return the buckets of a granularity (optionally one operation) in time order."""
+        if granularity not in self.tables:
+            raise ValueError(f"No rollup maintained for granularity '{granularity}'. "
+                             f"Available: {', '.join(self.granularities)}")
+        with self._lock:
+            table = self.tables[granularity]
+            operations = [operation] if operation is not None else sorted(table)
+            rows: List[tuple] = [(bucket, op, count, str(total))
+                                 for op in operations
+                                 for bucket, (count, total) in table.get(op, {}).items()]
+        rows.sort()
+        return pd.DataFrame(rows, columns=['bucket', 'operation', 'count', 'sum'])
+
+    def save(self, path: str, source: Sequence[int]) -> None:
+        """Persist the tables next to the history they summarize, with its signature."""
+        with self._lock:
+            tables = tables_to_json(self.tables)
+        payload = {
+            "version": ROLLUP_FORMAT_VERSION,
+            "source": list(source),
+            "tables": tables,
+        }
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle)
+
+    def memory_usage(self) -> int:
+        """Estimate the bytes held by the tables."""
+        with self._lock:
+            buckets = sum(len(buckets) for table in self.tables.values()
+                          for buckets in table.values())
+        return buckets * BUCKET_BYTES
+
+    def copy_tables(self) -> Tables:
+        """Return a copy of the tables that later updates do not change."""
+        with self._lock:
+            return {name: {op: {bucket: list(entry) for bucket, entry in buckets.items()}
+                           for op, buckets in table.items()}
+                    for name, table in self.tables.items()}
+
+    def restore(self, tables: Tables) -> bool:
+        """Adopt tables kept in a history snapshot; return False if they cover other granularities."""
+        if set(tables) != set(self.granularities):
+            return False
+        with self._lock:
+            self.tables = tables
+        return True
+
+    def load(self, path: str, source: Sequence[int]) -> bool:
+        """Load persisted tables; return False if missing or stale so the caller rebuilds."""
+        try:
+            with open(path, encoding="utf-8") as handle:
+                payload = json.load(handle)
+        except (OSError, ValueError):
+            return False
+        if payload.get("version") != ROLLUP_FORMAT_VERSION or \
+           payload.get("source") != list(source) or \
+           set(payload.get("tables", {})) != set(self.granularities):
+            return False
+        tables = tables_from_json(payload["tables"])
+        with self._lock:
+            self.tables = tables
+        return True
@@ -0,0 +1,171 @@
+"""
+History Sessions Module
+
+Gives every session (for example each user of a hosted calculator) its own
+history partition: a HistoryManager with its own records, rollups and
+indexes, stored as <session>.csv in HISTORY_SESSION_DIR. Calculations and
+history commands made inside history_session(session_id) go to that
+partition, so a session's queries only touch its own records. Outside a
+session everything goes to the process-wide history_manager as before.
+
+The active session is kept in a context variable, so each thread (and
+asyncio task) can be in a different session. Resident sessions are kept in
+least recently used order; when their estimated memory exceeds
+HISTORY_SESSION_MEMORY_MB, idle ones are saved to disk and dropped, and are
+loaded back from their warm-restart snapshot the next time they are used.
+"""
+import os
+import re
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+from calculator import history_manager as history_module
+from calculator.history_manager import HistoryManager
+
+DEFAULT_SESSION_DIR = "sessions"
+DEFAULT_MEMORY_BUDGET_MB = 256
+_SESSION_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.@-]{0,127}$')
+
+_active: ContextVar[Optional[HistoryManager]] = ContextVar('history_session', default=None)
+
+def current_history():
+    """Return the active session's history, or the process-wide history outside sessions."""
+    manager = _active.get()
+    # Looked up on each call, so the process-wide manager can be swapped (as tests do)
+    return manager if manager is not None else history_module.history_manager
+
+class SessionHistories:
+    """Per-session history managers, evicted to disk least recently used first."""
+
+    def __init__(self, directory: str = DEFAULT_SESSION_DIR,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET_MB * 2 ** 20):
+        """Start with no resident sessions."""
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._sessions: "OrderedDict[str, HistoryManager]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        # Memory estimate per session, with the history version it was taken at,
+        # and their running total, so a release only re-measures its own session
+        self._sizes: Dict[str, Tuple[int, int]] = {}
+        self._total = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionHistories":
+        """Create the registry from HISTORY_SESSION_DIR and HISTORY_SESSION_MEMORY_MB."""
+        budget = float(os.getenv("HISTORY_SESSION_MEMORY_MB", str(DEFAULT_MEMORY_BUDGET_MB)))
+        return cls(os.getenv("HISTORY_SESSION_DIR", DEFAULT_SESSION_DIR), int(budget * 2 ** 20))
+
+    def path(self, session_id: str) -> str:
+        """Return the history file of a session."""
+        if not _SESSION_ID.match(session_id):
+            raise ValueError(f"Invalid session id '{session_id}': use letters, digits and _.@-")
+        return os.path.join(self.directory, f"{session_id}.csv")
+
+    def acquire(self, session_id: str) -> HistoryManager:
+        """Return a session's history, loading it if needed, and keep it resident until release."""
+        with self._lock:
+            manager = self._sessions.get(session_id)
+            if manager is None:
+                manager = HistoryManager(self.path(session_id))
+                if os.path.exists(manager.history_file):
+                    manager.load_history()
+                self._sessions[session_id] = manager
+                self.logger.info("Opened history session %s (%d records)",
+                                 session_id, len(manager))
+            self._sessions.move_to_end(session_id)
+            self._pins[session_id] = self._pins.get(session_id, 0) + 1
+            return manager
+
+    def release(self, session_id: str) -> None:
+        """Mark one use of a session finished, then evict idle sessions over the budget."""
+        with self._lock:
+            self._pins[session_id] -= 1
+            if not self._pins[session_id]:
+                del self._pins[session_id]
+            self._measure(session_id)
+            self.evict()
+
+    def _measure(self, session_id: str) -> int:
+        """Return a session's memory estimate, recomputing it only if the session changed."""
+        manager = self._sessions[session_id]
+        version, size = self._sizes.get(session_id, (None, 0))
+        if version != manager.version:
+            measured = manager.memory_usage()
+            self._total += measured - size
+            self._sizes[session_id] = (manager.version, measured)
+            size = measured
+        return size
+
+    def memory_usage(self) -> int:
+        """Estimate the bytes held by resident sessions."""
+        with self._lock:
+            for session_id in self._sessions:
+                self._measure(session_id)
+            return self._total
+
+    def evict(self) -> int:
+        """Save and drop idle sessions, oldest first, until within the budget; return the count."""
+        evicted = 0
+        with self._lock:
+            for session_id in list(self._sessions):
+                if self._total <= self.memory_budget:
+                    break
+                if session_id in self._pins:
+                    continue  # in use; never drop records someone is still adding to
+                if self._unload(session_id):
+                    evicted += 1
+        return evicted
+
+    def _unload(self, session_id: str) -> bool:
+        """Write a session to disk and drop it from memory; return False if saving failed."""
+        manager = self._sessions[session_id]
+        if manager.has_unsaved_changes():
+            os.makedirs(self.directory, exist_ok=True)
+            if not manager.save_history():
+                self.logger.error("Could not save history session %s; keeping it in memory",
+                                  session_id)
+                return False
+        del self._sessions[session_id]
+        self._total -= self._sizes.pop(session_id, (None, 0))[1]
+        self.logger.info("Evicted history session %s (%d records)", session_id, len(manager))
+        return True
+
+    def resident(self) -> Dict[str, HistoryManager]:
+        """Return the sessions currently in memory, least recently used first."""
+        with self._lock:
+            return dict(self._sessions)
+
+    def resident_records(self) -> int:
+        """Return the number of records held by resident sessions."""
+        with self._lock:
+            return sum(len(manager) for manager in self._sessions.values())
+
+    def save_all(self) -> None:
+        """Save every resident session with unsaved changes, keeping them resident."""
+        with self._lock:
+            for manager in self._sessions.values():
+                if manager.has_unsaved_changes():
+                    os.makedirs(self.directory, exist_ok=True)
+                    manager.save_history()
+
+session_histories = SessionHistories.from_env()
+atexit.register(session_histories.save_all)
+
+@contextmanager
+def history_session(session_id: str,
+                    registry: Optional[SessionHistories] = None) -> Iterator[HistoryManager]:
+    """Route calculations and history commands in the block to a session's own history."""
+    registry = registry if registry is not None else session_histories
+    manager = registry.acquire(session_id)
+    token = _active.set(manager)
+    try:
+        yield manager
+    finally:
+        _active.reset(token)
+        registry.release(session_id)
@@ -0,0 +1,185 @@
+"""
+History Snapshot Module
+
+Writes and reads binary snapshots of the in-memory history: the records in
+their compact dtypes together with the rollup tables derived from them. A
+snapshot records the size and modification time of the history file it was
+taken from, and is only used while that file is unchanged, so it can never
+serve stale records. Loading one reads numpy arrays with no text parsing,
+which turns a restart from re-reading the CSV into a few milliseconds of work.
+
+Snapshots are numpy .npz archives read with allow_pickle=False: plain
+arrays per column (categorical codes plus categories, text as one UTF-8
+buffer with offsets, including the companion columns of exact numbers) and
+the rollups as JSON. Text is rebuilt with one decode and split of each
+buffer rather than row by row. Nothing in a snapshot is executed, so a
+snapshot planted beside a history file can at worst be rejected, never
+run code.
+"""
+import os
+import json
+import logging
+import zipfile
+from typing import Dict, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+from calculator.history_dtypes import (NUMERIC_COLUMNS, Scales, exponent_column,
+                                       stored_columns, text_column)
+from calculator.history_rollup import Tables, tables_from_json, tables_to_json
+
+SNAPSHOT_FORMAT_VERSION = 5
+# Stored in place of the scale of a numeric column kept as text
+_TEXT_SCALE = -1
+# What reading a damaged snapshot or one in another layout can raise
+_UNREADABLE = (zipfile.BadZipFile, EOFError, KeyError, IndexError, AttributeError, TypeError,
+               ValueError, ArithmeticError)
+
+logger = logging.getLogger(__name__)
+
+class Snapshot(NamedTuple):
+    """The state a warm restart restores."""
+    frame: pd.DataFrame
+    scales: Scales
+    rollups: Tables
+
+def source_signature(source: str) -> Tuple[int, int]:
+    """Return the size and modification time in nanoseconds of the source file."""
+    stat = os.stat(source)
+    return stat.st_size, stat.st_mtime_ns
+
+def _pack_text(arrays: Dict[str, np.ndarray], name: str, values: pd.Series) -> None:
+    """Store a text column as one UTF-8 buffer, end offsets and a missing-value mask."""
+    missing = values.isna().to_numpy()
+    texts = values.astype(object).where(~missing, '').astype(str).tolist()
+    joined = '\0'.join(texts).encode('utf-8')
+    buffer = np.frombuffer(joined, dtype=np.uint8)
+    separators = np.flatnonzero(buffer == 0)
+    if len(separators) == max(len(texts) - 1, 0):
+        # The separators are the only NUL bytes: each text ends where one was
+        ends = np.append(separators - np.arange(len(separators)), len(buffer) - len(separators))
+        buffer = buffer[buffer != 0]
+    else:
+        encoded = [text.encode('utf-8') for text in texts]
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        ends = np.cumsum([len(text) for text in encoded])
+    arrays[name + '.text'] = buffer
+    arrays[name + '.ends'] = np.asarray(ends[:len(texts)], dtype=np.int64)
+    arrays[name + '.missing'] = missing
+
+def _unpack_text(archive, name: str) -> pd.Series:
+    """Read a text column written by _pack_text."""
+    buffer = archive[name + '.text']
+    ends = archive[name + '.ends']
+    if not len(ends):
+        return pd.Series([], dtype=object, name=name)
+    if (buffer != 0).all():
+        # Mark where each text ends with a NUL and split the decoded buffer there at once
+        values = np.insert(buffer, ends[:-1], 0).tobytes().decode('utf-8').split('\0')
+    else:
+        text, starts = buffer.tobytes(), [0] + ends[:-1].tolist()
+        values = [text[start:end].decode('utf-8') for start, end in zip(starts, ends.tolist())]
+    values = np.array(values, dtype=object)
+    values[archive[name + '.missing']] = np.nan
+    return pd.Series(values, dtype=object, name=name)
+
+def _pack_categorical(arrays: Dict[str, np.ndarray], name: str, values: pd.Series) -> None:
+    """Store a categorical column as its codes and its categories as text."""
+    arrays[name + '.codes'] = values.cat.codes.to_numpy()
+    _pack_text(arrays, name + '.categories', pd.Series(values.cat.categories, dtype=object))
+
+def _unpack_categorical(archive, name: str) -> pd.Categorical:
+    """Read a categorical column written by _pack_categorical."""
+    categories = _unpack_text(archive, name + '.categories').astype(str)
+    return pd.Categorical.from_codes(archive[name + '.codes'], categories)
+
+def _to_arrays(snapshot: Snapshot, signature: Tuple[int, int]) -> Dict[str, np.ndarray]:
+    """Return the snapshot as plain arrays."""
+    frame, scales = snapshot.frame, snapshot.scales
+    arrays = {
+        'header': np.array([SNAPSHOT_FORMAT_VERSION, *signature, len(frame)], dtype=np.int64),
+        'scales': np.array([_TEXT_SCALE if scales[column] is None else scales[column]
+                            for column in NUMERIC_COLUMNS], dtype=np.int64),
+        'rollups': np.frombuffer(json.dumps(tables_to_json(snapshot.rollups)).encode('utf-8'),
+                                 dtype=np.uint8),
+    }
+    stamps = frame['timestamp']
+    if pd.api.types.is_datetime64_any_dtype(stamps):
+        arrays['timestamp'] = stamps.to_numpy(dtype='datetime64[us]')
+    else:
+        _pack_text(arrays, 'timestamp', stamps)
+    for column in NUMERIC_COLUMNS:
+        if scales[column] is None:
+            _pack_text(arrays, column, frame[column])
+        else:
+            arrays[column] = frame[column].to_numpy(dtype=np.int64)
+        if exponent_column(column) in frame:
+            arrays[column + '.exponent'] = frame[exponent_column(column)].to_numpy(dtype=np.int8)
+        if text_column(column) in frame:
+            _pack_categorical(arrays, column + '.kept', frame[text_column(column)])
+    _pack_categorical(arrays, 'operation', frame['operation'])
+    return arrays
+
+def _from_arrays(archive) -> Snapshot:
+    """Rebuild a snapshot from the arrays of _to_arrays."""
+    stored = archive['scales'].tolist()
+    scales = {column: (None if scale == _TEXT_SCALE else scale)
+              for column, scale in zip(NUMERIC_COLUMNS, stored)}
+    columns = {}
+    if 'timestamp' in archive.files:
+        columns['timestamp'] = pd.Series(archive['timestamp'])
+    else:
+        columns['timestamp'] = _unpack_text(archive, 'timestamp')
+    for column in NUMERIC_COLUMNS:
+        columns[column] = (_unpack_text(archive, column) if scales[column] is None
+                           else pd.Series(archive[column]))
+        if column + '.exponent' in archive.files:
+            columns[exponent_column(column)] = pd.Series(archive[column + '.exponent'])
+        if column + '.kept.codes' in archive.files:
+            columns[text_column(column)] = pd.Series(_unpack_categorical(archive,
+                                                                         column + '.kept'))
+    columns['operation'] = _unpack_categorical(archive, 'operation')
+    rollups = tables_from_json(json.loads(archive['rollups'].tobytes().decode('utf-8')))
+    frame = pd.DataFrame({name: columns[name] for name in stored_columns(columns)})
+    return Snapshot(frame, scales, rollups)
+
+def write_snapshot(path: str, source: str, snapshot: Snapshot) -> None:
+    """Write a snapshot of the state loaded from (or saved to) source.
+
+    Written beside the target and renamed over it, like the history file.
+    """
+    arrays = _to_arrays(snapshot, source_signature(source))
+    temporary = path + ".tmp"
+    try:
+        with open(temporary, 'wb') as stream:
+            np.savez(stream, **arrays)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    logger.info("Wrote history snapshot of %d records to %s", len(snapshot.frame), path)
+
+def read_snapshot(path: str, source: str) -> Optional[Snapshot]:
+    """Read a snapshot; return None if it is missing, damaged or older than source."""
+    try:
+        signature = source_signature(source)
+        with np.load(path, allow_pickle=False) as archive:
+            version, size, mtime, records = archive['header'].tolist()
+            if version != SNAPSHOT_FORMAT_VERSION:
+                logger.info("Ignoring history snapshot %s in an unknown format", path)
+                return None
+            if (size, mtime) != signature:
+                logger.info("Ignoring history snapshot %s: %s has changed since", path, source)
+                return None
+            snapshot = _from_arrays(archive)
+    except FileNotFoundError:
+        return None
+    except (OSError, *_UNREADABLE) as e:
+        logger.warning("Ignoring unreadable history snapshot %s: %s", path, e)
+        return None
+    if len(snapshot.frame) != records:
+        logger.warning("Ignoring unreadable history snapshot %s: record count mismatch", path)
+        return None
+    return snapshot
@@ -0,0 +1,207 @@
+"""
+History Statistics Module
+
+Computes descriptive statistics of calculation results chunk by chunk, so
+histories that do not fit in memory (or live on disk) can be summarized in
+a single pass. Results are parsed straight to float64 arrays, never to a
+Decimal column.
+
+- RunningStats keeps count, mean, M2 (Welford), min and max and merges
+  chunk summaries with Chan's parallel update.
+- QuantileSketch is a mergeable log-bucketed sketch (as in DDSketch): every
+  quantile it reports is within a fixed relative error of the exact one.
+"""
+import math
+from typing import Dict, Iterable, Sequence
+import numpy as np
+import pandas as pd
+from calculator.history_archive import archived_and_live_chunks
+from calculator.jobs import checkpoint
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+class RunningStats:
+    """Streaming count, mean, variance, min and max."""
+
+    def __init__(self):
+        """Start with an empty summary."""
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: np.ndarray) -> None:
+        """Fold a chunk of values into the summary."""
+        if len(values) == 0:
+            return
+        chunk = RunningStats()
+        chunk.count = len(values)
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        self.merge(chunk)
+
+    def merge(self, other: "RunningStats") -> None:
+        """Combine another summary into this one (Chan et al.)."""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (n - 1 denominator)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self) -> float:
+        """Sample standard deviation."""
+        return math.sqrt(self.variance)
+
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded relative error.
+
+    Values are counted in logarithmic buckets [gamma**(i-1), gamma**i) of
+    their magnitude, so the bucket midpoint is within relative_accuracy of
+    any value in the bucket. Memory grows with the logarithm of the value
+    range, not with the number of values.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """Create an empty sketch with the given relative accuracy."""
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    @staticmethod
+    def _add_counts(store: Dict[int, int], keys: np.ndarray, counts: np.ndarray) -> None:
+        """Add bucket counts into a store."""
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values: np.ndarray) -> None:
+        """Add a chunk of finite values to the sketch."""
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        magnitudes = np.abs(values)
+        nonzero = magnitudes > 0
+        self.zero_count += int((~nonzero).sum())
+        keys = np.ceil(np.log(magnitudes[nonzero]) / self._log_gamma).astype(np.int64)
+        signs = values[nonzero] > 0
+        for store, selected in ((self.positive, keys[signs]), (self.negative, keys[~signs])):
+            if len(selected):
+                self._add_counts(store, *np.unique(selected, return_counts=True))
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Combine another sketch with the same accuracy into this one."""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for store, other_store in ((self.positive, other.positive),
+                                   (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def _bucket_value(self, key: int) -> float:
+        """Representative magnitude of a bucket, within relative_accuracy of its contents."""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        """Return the q-quantile (0 <= q <= 1), or nan for an empty sketch."""
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive))
+
+class OperationStatistics:
+    """Running statistics and a quantile sketch for one operation."""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """Start with empty statistics."""
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def update(self, values: np.ndarray) -> None:
+        """Fold a chunk of values in."""
+        self.stats.update(values)
+        self.sketch.update(values)
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, float]:
+        """Return the statistics as a plain dict."""
+        summary = {
+            "count": self.stats.count,
+            "min": self.stats.min,
+            "max": self.stats.max,
+            "mean": self.stats.mean,
+            "variance": self.stats.variance,
+            "stddev": self.stats.stddev,
+        }
+        for q in quantiles:
+            summary[f"p{q * 100:g}"] = self.sketch.quantile(q)
+        return summary
+
+def compute_statistics(chunks: Iterable[pd.DataFrame],
+                       quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                       relative_accuracy: float = 0.01) -> Dict[str, Dict[str, float]]:
+    """Summarize results per operation over a stream of history chunks.
+
+    Results that do not parse as finite numbers are skipped. Returns
+    {operation: summary}, with the summary over all operations under 'all'.
+    """
+    per_operation: Dict[str, OperationStatistics] = {}
+    overall = OperationStatistics(relative_accuracy)
+    scanned = 0
+    for chunk in chunks:
+        scanned += len(chunk)
+        checkpoint(scanned)
+        if len(chunk) == 0:
+            continue
+        values = pd.to_numeric(chunk['result'], errors='coerce').to_numpy(dtype=np.float64)
+        finite = np.isfinite(values)
+        operations = chunk['operation'].astype(str).to_numpy()[finite]
+        values = values[finite]
+        overall.update(values)
+        for operation in np.unique(operations):
+            statistics = per_operation.setdefault(str(operation),
+                                                  OperationStatistics(relative_accuracy))
+            statistics.update(values[operations == operation])
+    result = {operation: statistics.summary(quantiles)
+              for operation, statistics in sorted(per_operation.items())}
+    if per_operation:
+        result["all"] = overall.summary(quantiles)
+    return result
+
+def iter_csv_chunks(path: str, chunksize: int = 100000) -> Iterable[pd.DataFrame]:
+    """Stream the operation and result columns of a history CSV from disk."""
+    return pd.read_csv(path, usecols=['operation', 'result'], dtype=str,
+                       chunksize=chunksize, compression='infer')
+
+def history_statistics(manager, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                       chunksize: int = 100000) -> Dict[str, Dict[str, float]]:
+    """Summarize a history manager's records, including any archived on disk."""
+    return compute_statistics(archived_and_live_chunks(manager, chunksize=chunksize), quantiles)
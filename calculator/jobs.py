@@ -0,0 +1,255 @@
+"""
+Background Jobs Module
+
+Runs heavy commands on a small pool of worker threads so the REPL prompt
+stays responsive; further commands, heavy or not, can be entered while a
+job runs, and heavy ones queue for a free worker. Whatever a job prints is
+collected and shown, with its run time, when the job finishes.
+
+Python threads cannot be interrupted, so cancellation and timeouts are
+cooperative: long loops (the history scans and the extended-precision
+arithmetic) call checkpoint(), which records progress and raises
+JobCancelled once the job has been cancelled or has run past its timeout.
+A job is reported as stopped straight away, but its thread only stops at
+its next checkpoint; meanwhile a new worker takes its place, so stopped
+jobs never shrink the pool, and whatever the job still prints is
+discarded. A calculation stopped this way is not recorded in the history.
+
+Once a job's end has been reported it is dropped from JobRunner.jobs, so
+a long session does not keep every finished job and its output.
+"""
+import io
+import sys
+import time
+import queue
+import logging
+import itertools
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ACTIVE_STATES = ('queued', 'running')
+
+_local = threading.local()
+logger = logging.getLogger(__name__)
+
+class JobCancelled(BaseException):
+    """Raised at a checkpoint inside a job that was cancelled or timed out.
+
+    A BaseException, like KeyboardInterrupt, so the broad exception handlers
+    of command implementations do not swallow it.
+    """
+
+def current_job() -> Optional["Job"]:
+    """Return the job running on this thread, or None outside jobs."""
+    return getattr(_local, 'job', None)
+
+def checkpoint(done: Optional[int] = None, total: Optional[int] = None) -> None:
+    """Record the current job's progress and stop it if it was cancelled.
+
+    Does nothing outside a job, so library code can call it unconditionally.
+    """
+    job = current_job()
+    if job is None:
+        return
+    if done is not None:
+        job.progress = (done, total)
+    if job.cancel_event.is_set():
+        raise JobCancelled(job.status)
+
+class Job:
+    """One command submitted to the worker pool."""
+
+    def __init__(self, job_id: int, description: str, timeout: Optional[float]):
+        """Create a queued job."""
+        self.id = job_id
+        self.description = description
+        self.timeout = timeout
+        self.status = 'queued'
+        self.progress: Optional[Tuple[int, Optional[int]]] = None
+        self.output = io.StringIO()
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds the job has been running (0 while queued)."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def describe_progress(self) -> str:
+        """Progress as 'done/total (percent)', 'done' or ''."""
+        if self.progress is None:
+            return ''
+        done, total = self.progress
+        if total:
+            return f"{done}/{total} ({100 * done / total:.0f}%)"
+        return str(done)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the job has finished, been cancelled or timed out."""
+        return self.done_event.wait(timeout)
+
+class _JobOutput(io.TextIOBase):
+    """Stand-in for sys.stdout that sends what job threads print to their job.
+
+    Installed while any JobRunner has submitted jobs and not been shut down;
+    the stream it replaced is put back when the last one shuts down.
+    """
+
+    _lock = threading.Lock()
+    _users = 0
+
+    @classmethod
+    def install(cls):
+        """Install the stand-in if needed and return the real output stream."""
+        with cls._lock:
+            if not isinstance(sys.stdout, cls):
+                sys.stdout = cls(sys.stdout)
+            cls._users += 1
+            return sys.stdout.stream
+
+    @classmethod
+    def uninstall(cls) -> None:
+        """Drop one use of the stand-in, restoring the real stream after the last."""
+        with cls._lock:
+            cls._users = max(cls._users - 1, 0)
+            if not cls._users and isinstance(sys.stdout, cls):
+                sys.stdout = sys.stdout.stream
+
+    def __init__(self, stream):
+        """Wrap the real output stream."""
+        super().__init__()
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        """Write to the current job's output, or to the wrapped stream."""
+        job = current_job()
+        return (job.output if job is not None else self.stream).write(text)
+
+    def flush(self) -> None:
+        """Flush the wrapped stream."""
+        self.stream.flush()
+
+class JobRunner:
+    """A queue of commands served by daemon worker threads."""
+
+    def __init__(self, workers: int = 2, default_timeout: Optional[float] = None):
+        """Start the worker threads."""
+        self.default_timeout = default_timeout
+        # Queued and running jobs by id; each is removed when its end is reported
+        self.jobs: Dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        # The real console, once submit has routed job output away from it
+        self._console = None
+        self._worker_ids = itertools.count(1)
+        for _ in range(workers):
+            self._start_worker()
+
+    def _start_worker(self) -> None:
+        """Start one worker thread."""
+        # Daemon threads, so a job stuck in uninterruptible work cannot block exit
+        threading.Thread(target=self._work, name=f"command-job-{next(self._worker_ids)}",
+                         daemon=True).start()
+
+    def submit(self, description: str, function: Callable[..., Any], *args,
+               timeout: Optional[float] = None) -> Job:
+        """Queue function(*args) as a job and return it."""
+        with self._lock:
+            if self._console is None:
+                self._console = _JobOutput.install()
+        job = Job(next(self._ids), description,
+                  timeout if timeout is not None else self.default_timeout)
+        with self._lock:
+            self.jobs[job.id] = job
+        self._queue.put((job, function, args))
+        logger.info("Queued job %d: %s", job.id, description)
+        return job
+
+    def _work(self) -> None:
+        """Worker thread: run queued jobs one at a time."""
+        while True:
+            job, function, args = self._queue.get()
+            if self._run(job, function, args):
+                return  # a replacement took over while this job was being stopped
+
+    def _run(self, job: Job, function: Callable[..., Any], args: tuple) -> bool:
+        """Run one job with its timeout and output capture; return True if it was stopped."""
+        with self._lock:
+            if job.status != 'queued':
+                return False  # cancelled while waiting for a worker
+            job.status = 'running'
+            job.started = time.monotonic()
+        timer = None
+        if job.timeout:
+            timer = threading.Timer(job.timeout, self._stop, (job, 'timed out'))
+            timer.daemon = True
+            timer.start()
+        _local.job = job
+        status = 'done'
+        try:
+            function(*args)
+        except JobCancelled:
+            status = 'cancelled'
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Unexpected error: {e}")
+            status = 'failed'
+        finally:
+            _local.job = None
+            if timer is not None:
+                timer.cancel()
+        with self._lock:
+            if job.status != 'running':
+                return True  # already reported as cancelled or timed out
+            job.status = status
+            job.finished = time.monotonic()
+        self._notify(job, f"finished in {job.elapsed:.2f}s", job.output.getvalue())
+        return False
+
+    def _stop(self, job: Job, status: str) -> bool:
+        """Mark an active job cancelled or timed out and tell its checkpoints to stop."""
+        with self._lock:
+            if job.status not in ACTIVE_STATES:
+                return False
+            running = job.status == 'running'
+            job.status = status
+            job.finished = time.monotonic()
+            job.cancel_event.set()
+        if running:
+            # The job's worker is busy until its next checkpoint; keep the pool at full size
+            self._start_worker()
+        self._notify(job, f"{status} after {job.elapsed:.2f}s")
+        return True
+
+    def _notify(self, job: Job, message: str, output: str = '') -> None:
+        """Report a finished job on the console, with anything it printed, and forget it."""
+        with self._lock:
+            self.jobs.pop(job.id, None)
+        logger.info("Job %d (%s) %s", job.id, job.description, message)
+        console = self._console if self._console is not None else sys.stdout
+        console.write(f"\n[job {job.id}] {job.description}: {message}\n{output}")
+        console.flush()
+        job.done_event.set()
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job; return False if there is no such active job."""
+        job = self.jobs.get(job_id)
+        return job is not None and self._stop(job, 'cancelled')
+
+    def active(self) -> List[Job]:
+        """Return the queued and running jobs."""
+        with self._lock:
+            return [job for job in self.jobs.values() if job.status in ACTIVE_STATES]
+
+    def shutdown(self) -> None:
+        """Cancel every active job and stop routing job output."""
+        for job in self.active():
+            self._stop(job, 'cancelled')
+        with self._lock:
+            if self._console is not None:
+                _JobOutput.uninstall()
+                self._console = None
@@ -1,5 +1,8 @@
 '''Advanced Calculator'''
-from decimal import Decimal
+import math
+from decimal import Decimal, getcontext, localcontext
+from functools import lru_cache
+from calculator.jobs import checkpoint, current_job
 def addition(value1:Decimal, value2:Decimal)-> Decimal:
     """adding two numbers"""
     return value1 + value2
@@ -17,3 +20,179 @@ def division(value1:Decimal, value2:Decimal)-> Decimal:
     if value2 == 0:
         raise ValueError("Cannot divide by zero")
     return value1 / value2
+
+# Largest root degree a fractional exponent is evaluated through with Newton iteration;
+# the seed's accuracy has to beat 1/degree for the iteration to converge
+MAX_RATIONAL_ROOT_DEGREE = 1000
+
+def _integer_power(base: Decimal, exponent: int) -> Decimal:
+    """base ** exponent by repeated squaring, with guard digits against rounding drift"""
+    if exponent == 0:
+        return Decimal(1)
+    if base == 0 and exponent < 0:
+        raise ValueError("Cannot raise zero to a negative power")
+    with localcontext() as ctx:
+        # about 2*log2(n) roundings happen, so a few extra digits keep the result exact to prec
+        ctx.prec += len(str(abs(exponent))) + 2
+        result = Decimal(1)
+        square = +base
+        remaining = abs(exponent)
+        while remaining:
+            checkpoint()
+            if remaining & 1:
+                result *= square
+            remaining >>= 1
+            if remaining:
+                square *= square
+        if exponent < 0:
+            result = 1 / result
+    return +result
+
+def power(value1:Decimal, value2:Decimal)-> Decimal:
+    """raising the first number to the power of the second"""
+    value1, value2 = Decimal(value1), Decimal(value2)
+    numerator, denominator = value2.as_integer_ratio()
+    if denominator == 1:
+        return _integer_power(value1, numerator)
+    if value1 < 0:
+        raise ValueError("Cannot raise a negative number to a fractional power")
+    if value1 == 0:
+        return _integer_power(value1, numerator)
+    if denominator <= MAX_RATIONAL_ROOT_DEGREE:
+        return _rational_power(value1, numerator, denominator)
+    return value1 ** value2
+
+def _nth_root(value: Decimal, degree: int) -> Decimal:
+    """positive degree-th root of a positive number by Newton iteration with precision doubling"""
+    target = getcontext().prec + 5
+    with localcontext() as ctx:
+        # Seed with ~15 correct digits, then let each Newton step double the precision
+        ctx.prec = 20
+        estimate = (value.ln() / degree).exp()
+        steps = []
+        prec = target
+        while prec > 15:
+            steps.append(prec)
+            prec = prec // 2 + 1
+        for prec in reversed(steps):
+            checkpoint()
+            ctx.prec = prec + 3
+            estimate = ((degree - 1) * estimate
+                        + value / _integer_power(estimate, degree - 1)) / degree
+        ctx.prec = target
+        estimate = ((degree - 1) * estimate + value / _integer_power(estimate, degree - 1)) / degree
+    result = (+estimate).normalize()
+    # Drop the trailing zeros Newton leaves on exact roots (3.000... -> 3) without going to 1E+2
+    if result.as_tuple().exponent > 0 and result.adjusted() < getcontext().prec:
+        result = result.quantize(Decimal(1))
+    return result
+
+def _rational_power(value: Decimal, numerator: int, denominator: int) -> Decimal:
+    """positive value ** (numerator / denominator) as an integer power of a Newton root"""
+    with localcontext() as ctx:
+        # Raising to the numerator multiplies the root's relative error by about numerator
+        ctx.prec += len(str(abs(numerator))) + 3
+        result = _integer_power(root(value, Decimal(denominator)), numerator)
+    return +result
+
+def root(value1:Decimal, value2:Decimal)-> Decimal:
+    """taking the second-number-th root of the first number"""
+    value1, value2 = Decimal(value1), Decimal(value2)
+    if value2 == 0:
+        raise ValueError("Cannot take the zeroth root")
+    numerator, denominator = value2.as_integer_ratio()
+    if denominator != 1:
+        # The (n/d)-th root is value1 ** (d/n)
+        if value1 < 0:
+            raise ValueError("Cannot take a fractional root of a negative number")
+        if value1 == 0:
+            return power(value1, Decimal(denominator) / numerator)
+        if abs(numerator) <= MAX_RATIONAL_ROOT_DEGREE:
+            return _rational_power(value1, denominator if numerator > 0 else -denominator,
+                                   abs(numerator))
+        with localcontext() as ctx:
+            ctx.prec += 5
+            exponent = 1 / value2
+        return value1 ** exponent
+    degree = numerator
+    if degree < 0:
+        with localcontext() as ctx:
+            ctx.prec += 5
+            result = 1 / root(value1, Decimal(-degree))
+        return +result
+    if value1 == 0:
+        return Decimal(0)
+    if value1 < 0:
+        if degree % 2 == 0:
+            raise ValueError("Cannot take an even root of a negative number")
+        return -root(-value1, value2)
+    if degree == 1:
+        return +value1
+    if degree == 2:
+        return value1.sqrt()
+    return _nth_root(value1, degree)
+
+# Most digits of the integer quotient a remainder is computed through; the working
+# precision is raised to match, so this bounds the time and memory of one modulo
+MAX_MODULO_QUOTIENT_DIGITS = 1000000
+
+def modulo(value1:Decimal, value2:Decimal)-> Decimal:
+    """remainder of dividing two numbers (sign of the first), throwing error if divided by 0"""
+    value1, value2 = Decimal(value1), Decimal(value2)
+    if value2 == 0:
+        raise ValueError("Cannot divide by zero")
+    if value1.is_finite() and value2.is_finite() and value1 != 0 and \
+            value1.adjusted() - value2.adjusted() > MAX_MODULO_QUOTIENT_DIGITS:
+        raise ValueError(f"Modulo quotient would have more than {MAX_MODULO_QUOTIENT_DIGITS} "
+                         "digits")
+    with localcontext() as ctx:
+        # The remainder is exact as long as the integer quotient fits in the precision
+        ctx.prec = max(ctx.prec, value1.adjusted() - value2.adjusted() + 2,
+                       len(value1.as_tuple().digits), len(value2.as_tuple().digits))
+        result = value1 % value2
+    return +result
+
+# Numbers multiplied per step of a factorial computed in a background job
+FACTORIAL_CHUNK = 4096
+# Largest factorial operand accepted: 50000! has about 213,000 digits and takes a second
+MAX_FACTORIAL_OPERAND = 50000
+
+@lru_cache(maxsize=32)
+def _factorial_int(number: int) -> int:
+    """exact factorial; math.factorial multiplies split halves recursively (binary splitting)"""
+    if current_job() is None or number < FACTORIAL_CHUNK:
+        return math.factorial(number)
+    # In a job, a product tree of chunks (about half as fast as math.factorial)
+    # reaches a checkpoint between steps, so cancelling or a timeout can stop it
+    products = []
+    for start in range(1, number + 1, FACTORIAL_CHUNK):
+        checkpoint(start, number)
+        products.append(math.prod(range(start, min(start + FACTORIAL_CHUNK, number + 1))))
+    while len(products) > 1:
+        checkpoint()
+        products = [math.prod(products[i:i + 2]) for i in range(0, len(products), 2)]
+    return products[0]
+
+def factorial(value1:Decimal, value2:Decimal=None)-> Decimal: # pylint: disable=unused-argument
+    """factorial of the first number; the second is ignored so it fits the two-operand interface"""
+    value1 = Decimal(value1)
+    if value1 < 0 or value1 != value1.to_integral_value():
+        raise ValueError("Factorial is only defined for non-negative integers")
+    if value1 > MAX_FACTORIAL_OPERAND:
+        raise ValueError(f"Factorial is limited to operands up to {MAX_FACTORIAL_OPERAND}")
+    number = int(value1)
+    if number > 1 and math.lgamma(number + 1) / math.log(10) > getcontext().Emax:
+        raise ValueError("Factorial result is too large")
+    return +Decimal(_factorial_int(number))
+
+# Operations by the name recorded in history (the function's __name__)
+OPERATIONS = {
+    'addition': addition,
+    'subtraction': subtraction,
+    'multiplication': multiplication,
+    'division': division,
+    'power': power,
+    'root': root,
+    'modulo': modulo,
+    'factorial': factorial,
+}
@@ -4,16 +4,22 @@ AdditionCommand Module
 This module implements the addition operation command for the calculator application."""
 # pylint: disable=too-few-public-methods
 from decimal import Decimal, InvalidOperation
-from calculator.commands.command import Command
+from typing import Optional
+from calculator.commands.command import Command, finite_decimal
 from calculator import Calculator
 
 class AdditionCommand(Command):
     """Handles user input for addition and performs the operation."""
-    def execute(self):
+    arguments = (finite_decimal, finite_decimal)
+    aliases = ('add', '+')
 
+    def execute(self, value1: Optional[Decimal] = None, value2: Optional[Decimal] = None):
+        """Add two numbers, prompting for any that were not given inline."""
         try:
-            value1 = Decimal(input("Enter first number: "))
-            value2 = Decimal(input("Enter second number: "))
+            if value1 is None:
+                value1 = Decimal(input("Enter first number: "))
+            if value2 is None:
+                value2 = Decimal(input("Enter second number: "))
             result = Calculator.add_numbers(value1, value2)
         # Display the result
             print(f"Result: {result}")
@@ -4,16 +4,22 @@ DivisionCommand Module
 This module implements the division operation command for the calculator application."""
 # pylint: disable=too-few-public-methods
 from decimal import Decimal, InvalidOperation
-from calculator.commands.command import Command
+from typing import Optional
+from calculator.commands.command import Command, finite_decimal
 from calculator import Calculator
 
 class DivisionCommand(Command):
     """division class"""
-    def execute(self):
+    arguments = (finite_decimal, finite_decimal)
+    aliases = ('divide', 'div', '/')
+
+    def execute(self, value1: Optional[Decimal] = None, value2: Optional[Decimal] = None):
         """Handles user input for division and performs the operation."""
         try:
-            value1 = Decimal(input("Enter first number: "))
-            value2 = Decimal(input("Enter second number: "))
+            if value1 is None:
+                value1 = Decimal(input("Enter first number: "))
+            if value2 is None:
+                value2 = Decimal(input("Enter second number: "))
             if value2 == 0:
                 print("Error: Division by zero is not allowed.")
                 return
@@ -0,0 +1,34 @@
+"""
+FactorialCommand Module
+
+This module implements the factorial operation command for the calculator application."""
+# pylint: disable=too-few-public-methods
+from decimal import Decimal, InvalidOperation, localcontext
+from typing import Optional
+from calculator.commands.command import Command, finite_decimal
+from calculator import Calculator
+
+class FactorialCommand(Command):
+    """Handles user input for factorial and performs the operation."""
+    arguments = (finite_decimal, int)
+    aliases = ('fact', '!')
+    heavy = True
+
+    def is_heavy(self, *args):
+        """Run on the worker pool unless the operand still has to be prompted for."""
+        return len(args) >= 1
+
+    def execute(self, value: Optional[Decimal] = None, precision: Optional[int] = None):
+        """Compute a factorial, optionally at the given precision in digits."""
+        try:
+            if value is None:
+                value = Decimal(input("Enter a non-negative integer: "))
+            with localcontext() as ctx:
+                if precision is not None:
+                    ctx.prec = precision
+                result = Calculator.factorial_number(value)
+            print(f"Result: {result}")
+        except InvalidOperation:  # Catches Decimal conversion errors
+            print("Invalid input! Please enter valid numbers.")
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Unexpected error: {e}")
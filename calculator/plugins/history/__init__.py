@@ -4,13 +4,38 @@ History Command Module
 This module implements commands for managing calculation history using Pandas.
 """
 # pylint: disable=too-few-public-methods
-import pandas as pd
+from collections import OrderedDict
+from datetime import datetime
 from tabulate import tabulate
 from calculator.commands.command import Command
-from calculator.history_manager import history_manager
+from calculator.history_audit import replay_history, verify_history
+from calculator.history_export import export_history
+from calculator.history_merge import merge_history
+from calculator.history_query import QueryError
+from calculator.history_sessions import current_history
+from calculator.history_stats import history_statistics
+
+DEFAULT_PAGE_SIZE = 10
+PAGE_CACHE_SIZE = 32
+MAX_LISTED_MISMATCHES = 20
+# Subcommands that scan or write the whole history; they run on the worker pool
+HEAVY_SUBCOMMANDS = ('save', 'load', 'merge', 'stats', 'archive', 'range', 'verify', 'replay',
+                     'export', 'query')
 
 class HistoryCommand(Command):
     """Handles history-related commands with CSV integration."""
+    heavy = True
+
+    def __init__(self):
+        """Initialize the paging cursor and the formatted page cache for this session."""
+        self.page = 1
+        self.page_size = DEFAULT_PAGE_SIZE
+        self._page_cache = OrderedDict()
+
+    def is_heavy(self, *args):
+        """Only subcommands that scan or write the whole history run on the worker pool."""
+        return bool(args) and args[0].lower() in HEAVY_SUBCOMMANDS
+
     def execute(self, *args):
         """Handle different history commands including CSV operations."""
         if not args:
@@ -19,53 +44,226 @@ class HistoryCommand(Command):
 
         subcommand = args[0].lower()
         if subcommand == 'save':
-            history_manager.save_history()
-            print("History saved to CSV.")
+            self._save_history()
         elif subcommand == 'load':
-            history_manager.load_history()
-            print("History loaded from CSV.")
+            self._load_history()
+        elif subcommand == 'merge' and len(args) > 1:
+            self._merge_history(args[1:])
         elif subcommand == 'show':
-            history_manager.display_history()
+            self._show_history()
+        elif subcommand == 'clear':
+            self._clear_history()
+        elif subcommand == 'delete' and len(args) > 1:
+            self._delete_record(args[1])
+        elif subcommand == 'filter' and len(args) > 1:
+            self._filter_history(args[1])
+        elif subcommand == 'query' and len(args) > 1:
+            self._query_history(' '.join(args[1:]))
+        elif subcommand == 'stats' and '--full' in args[1:]:
+            self._show_full_statistics()
+        elif subcommand == 'stats':
+            self._show_statistics()
+        elif subcommand == 'page' and len(args) > 1:
+            self._show_page_command(*args[1:3])
+        elif subcommand == 'next':
+            self._show_page(self.page + 1, self.page_size)
+        elif subcommand == 'prev':
+            self._show_page(self.page - 1, self.page_size)
+        elif subcommand == 'archive':
+            self._archive_history()
+        elif subcommand == 'range' and len(args) > 1:
+            self._show_range(*args[1:3])
+        elif subcommand == 'verify':
+            self._verify_history(*args[1:2])
+        elif subcommand == 'replay':
+            self._replay_history(*args[1:2])
+        elif subcommand == 'rollup' and len(args) > 1:
+            self._show_rollup(*args[1:3])
+        elif subcommand == 'export' and len(args) > 1:
+            self._export_history(*args[1:])
+        elif subcommand == 'help':
+            self._show_help()
         else:
             print("Unknown history command. Use 'history help' for available options.")
 
 
     def _show_history(self):
         """Display the calculation history in a tabular format."""
-        df = history_manager.get_history()
-        if len(df) == 0:
+        manager = current_history()
+        total = len(manager)
+        if total == 0:
+            print("No calculation history available.")
+            return
+        # Only slice out the rows that will be displayed
+        if total > DEFAULT_PAGE_SIZE:
+            print(f"Showing the most recent {DEFAULT_PAGE_SIZE} of {total} records:")
+        display_df = manager.get_window(total - DEFAULT_PAGE_SIZE, total)
+        print(self._format_records(display_df))
+
+    def _show_page_command(self, page_str, size_str=None):
+        """Parse the arguments of 'history page <n> [size]' and show that page."""
+        try:
+            page = int(page_str)
+            size = int(size_str) if size_str is not None else self.page_size
+        except ValueError:
+            print("Invalid page. Usage: history page <n> [size]")
+            return
+        if page < 1 or size < 1:
+            print("Page number and page size must be positive.")
+            return
+        self._show_page(page, size)
+
+    def _show_page(self, page, size):
+        """Display one page of history; page 1 holds the most recent records."""
+        manager = current_history()
+        total = len(manager)
+        if total == 0:
             print("No calculation history available.")
             return
-        # Format the DataFrame for display
-        display_df = df.copy()
-        if len(display_df) > 10:
-            print(f"Showing the most recent 10 of {len(display_df)} records:")
-            display_df = display_df.tail(10)
-        # Add an index column for reference
-        display_df = display_df.reset_index()
+        page_count = -(-total // size)
+        if not 1 <= page <= page_count:
+            print(f"No such page {page}; history has {page_count} page(s) of {size} records.")
+            return
+        self.page, self.page_size = page, size
+
+        key = (manager.token, manager.version, page, size)
+        output = self._page_cache.get(key)
+        if output is None:
+            stop = total - (page - 1) * size
+            window = manager.get_window(stop - size, stop)
+            output = (f"Page {page} of {page_count} ({total} records):\n"
+                      f"{self._format_records(window)}")
+            self._page_cache[key] = output
+            if len(self._page_cache) > PAGE_CACHE_SIZE:
+                self._page_cache.popitem(last=False)
+        else:
+            self._page_cache.move_to_end(key)
+        print(output)
+
+    @staticmethod
+    def _format_records(window):
+        """Format a slice of history records as a table with an id column."""
+        # reset_index only copies the rows in the slice
+        display_df = window.reset_index()
         display_df.rename(columns={'index': 'id'}, inplace=True)
-        # Print using tabulate for nice formatting
-        print(tabulate(display_df, headers='keys', tablefmt='simple', showindex=False))
+        return tabulate(display_df, headers='keys', tablefmt='simple', showindex=False)
+
+    def _archive_history(self):
+        """Roll old records into the compressed time-segmented archive."""
+        manager = current_history()
+        if manager.archive is None:
+            print("History archiving is disabled. Set HISTORY_ARCHIVE_DIR to enable it.")
+            return
+        moved = manager.roll_history()
+        print(f"Archived {moved} records; archive uses "
+              f"{manager.archive.disk_usage()} bytes on disk.")
+
+    def _show_range(self, start_str, end_str=None):
+        """Show records between two ISO dates, reading only the overlapping archive segments."""
+        try:
+            start = datetime.fromisoformat(start_str)
+            end = datetime.fromisoformat(end_str) if end_str is not None else None
+        except ValueError:
+            print("Invalid date. Usage: history range <start> [end] (ISO format, e.g. 2025-03-01)")
+            return
+        records = current_history().query_range(start, end)
+        if len(records) == 0:
+            print("No records found in that time range.")
+            return
+        print(f"Found {len(records)} records:")
+        print(self._format_records(records))
+
+    def _verify_history(self, workers_str=None):
+        """Re-execute every stored record and list the ones whose result does not match."""
+        try:
+            workers = int(workers_str) if workers_str is not None else None
+        except ValueError:
+            print("Invalid worker count. Usage: history verify [workers]")
+            return
+        report = verify_history(current_history(), workers=workers)
+        print(f"Verified {report.checked} records in {report.seconds:.2f}s: "
+              f"{len(report.mismatches)} mismatches.")
+        for mismatch in report.mismatches[:MAX_LISTED_MISMATCHES]:
+            print(f"  id {mismatch.record_id}: {mismatch.operation}({mismatch.value1}, "
+                  f"{mismatch.value2}) stored {mismatch.stored}, recomputed {mismatch.recomputed}")
+        if len(report.mismatches) > MAX_LISTED_MISMATCHES:
+            print(f"  ... and {len(report.mismatches) - MAX_LISTED_MISMATCHES} more")
+
+    def _replay_history(self, count_str=None):
+        """Replay the stored history through the Calculator and report the throughput."""
+        try:
+            limit = int(count_str) if count_str is not None else None
+        except ValueError:
+            print("Invalid count. Usage: history replay [count]")
+            return
+        report = replay_history(current_history(), limit=limit)
+        print(f"Replayed {report.replayed} calculations in {report.seconds:.2f}s "
+              f"({report.per_second:.0f}/s, {report.errors} errors).")
+
+    def _show_rollup(self, granularity, operation=None):
+        """Show per-bucket counts and result sums from the materialized rollups."""
+        try:
+            rollup = current_history().get_rollup(granularity.lower(), operation)
+        except ValueError as e:
+            print(e)
+            return
+        if len(rollup) == 0:
+            print("No rollup data available.")
+            return
+        print(tabulate(rollup, headers='keys', tablefmt='simple', showindex=False))
+
+    def _export_history(self, path, *options):
+        """Stream history to a CSV or JSON lines file, optionally filtered by operation and time."""
+        usage = "Usage: history export <path> [--format csv|jsonl] [--op X] [--since T]"
+        if len(options) % 2:
+            print(usage)
+            return
+        settings = dict(zip(options[::2], options[1::2]))
+        if not set(settings) <= {'--format', '--op', '--since'}:
+            print(usage)
+            return
+        default_format = 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+        output_format = settings.get('--format', default_format).lower()
+        try:
+            since = datetime.fromisoformat(settings['--since']) if '--since' in settings else None
+        except ValueError:
+            print("Invalid date. Use ISO format, e.g. 2025-03-01 or 2025-03-01T12:00")
+            return
+        try:
+            count = export_history(current_history(), path, output_format,
+                                   operation=settings.get('--op'), since=since)
+        except (ValueError, OSError) as e:
+            print(f"Export failed: {e}")
+            return
+        print(f"Exported {count} records to {path}.")
 
     def _save_history(self):
         """Save the calculation history to a file."""
-        if history_manager.save_history():
+        if current_history().save_history():
             print("History saved successfully.")
         else:
             print("Failed to save history.")
 
     def _load_history(self):
         """Load the calculation history from a file."""
-        if history_manager.load_history():
+        if current_history().load_history():
             print("History loaded successfully.")
         else:
             print("No history file found or error loading history.")
 
+    def _merge_history(self, paths):
+        """Merge history files into the current history, skipping records already present."""
+        report = merge_history(current_history(), paths)
+        for path, error in report.failures:
+            print(f"Failed to merge {path}: {error}")
+        print(f"Merged {report.added} new records from {report.files} file(s); "
+              f"skipped {report.duplicates} duplicates.")
+
     def _clear_history(self):
         """Clear all calculation history."""
         confirm = input("Are you sure you want to clear all history? (y/n): ")
         if confirm.lower() == 'y':
-            history_manager.clear_history()
+            current_history().clear_history()
             print("History cleared.")
         else:
             print("Operation cancelled.")
@@ -74,37 +272,44 @@ class HistoryCommand(Command):
         """Delete a specific record by index."""
         try:
             index = int(index_str)
-            if history_manager.delete_record(index):
+            if current_history().delete_record(index):
                 print(f"Record {index} deleted.")
             else:
                 print(f"Failed to delete record {index}.")
         except ValueError:
             print("Invalid index. Please provide a valid number.")
-def display_history(self):
-    """Display the calculation history in a tabular format."""
-    if self.df.empty:
-        print("No calculation history available.")
-        return
-    
-    print("\nCalculation History:")
-    print(tabulate(self.df.tail(10), headers='keys', tablefmt='psql', showindex=False))
 
     def _filter_history(self, operation):
         """Filter history by operation type."""
-        filtered_df = history_manager.filter_by_operation(operation)
+        filtered_df = current_history().filter_by_operation(operation)
         if len(filtered_df) == 0:
             print(f"No records found for operation '{operation}'.")
             return
         print(f"Found {len(filtered_df)} records for operation '{operation}':")
-        # Add an index column for reference
-        display_df = filtered_df.reset_index()
-        display_df.rename(columns={'index': 'id'}, inplace=True)
-        # Print using tabulate for nice formatting
-        print(tabulate(display_df, headers='keys', tablefmt='simple', showindex=False))
+        print(self._format_records(filtered_df))
+
+    def _query_history(self, text):
+        """Show the most recent records matching a query such as 'op = division and result > 100'."""
+        if len(text) > 1 and text[0] == text[-1] and text[0] in '"\'':
+            text = text[1:-1]
+        try:
+            matches = current_history().query(text)
+        except QueryError as e:
+            print(f"Invalid query: {e}")
+            return
+        total = len(matches)
+        if total == 0:
+            print("No records match the query.")
+            return
+        if total > DEFAULT_PAGE_SIZE:
+            print(f"Found {total} records; showing the most recent {DEFAULT_PAGE_SIZE}:")
+        else:
+            print(f"Found {total} records:")
+        print(self._format_records(matches.window(total - DEFAULT_PAGE_SIZE, total)))
 
     def _show_statistics(self):
         """Show statistics about the calculation history."""
-        stats = history_manager.get_statistics()
+        stats = current_history().get_statistics()
         if stats.get("status") == "empty":
             print("No history data available for statistics.")
             return
@@ -120,14 +325,38 @@ def display_history(self):
             for op, avg in stats['average_results'].items():
                 print(f"  {op}: {avg}")
 
+    def _show_full_statistics(self):
+        """Show streaming descriptive statistics and quantiles of results per operation."""
+        stats = history_statistics(current_history())
+        if not stats:
+            print("No history data available for statistics.")
+            return
+        rows = [{'operation': operation, **summary} for operation, summary in stats.items()]
+        print("\nResult statistics by operation (quantiles within 1% relative error):")
+        print(tabulate(rows, headers='keys', tablefmt='simple', floatfmt='.6g'))
+
     def _show_help(self):
         """Show help information for history commands."""
         print("\nHistory Command Help:")
         print("  history               - Show the most recent calculation history")
         print("  history save          - Save history to a file")
         print("  history load          - Load history from a file")
+        print("  history merge <file...> - Add the records of other history files, without duplicates")
         print("  history clear         - Clear all history records")
         print("  history delete <id>   - Delete a specific record by ID")
         print("  history filter <op>   - Filter history by operation type")
+        print("  history query <expr>  - Find records, e.g. op = division and result > 100"
+              " and ts >= 2025-03-01")
         print("  history stats         - Show statistics about the calculation history")
+        print("  history stats --full  - Show min/max/mean/stddev and p50/p95/p99 per operation")
+        print("  history page <n> [size] - Show page n (page 1 is the most recent)")
+        print("  history next          - Show the next (older) page")
+        print("  history prev          - Show the previous (newer) page")
+        print("  history archive       - Move old records into the compressed archive")
+        print("  history range <start> [end] - Show records in a time range")
+        print("  history verify [workers] - Re-check stored results against the operations")
+        print("  history replay [count] - Replay stored history through the calculator")
+        print("  history rollup <granularity> [op] - Show per-bucket counts and sums")
+        print("  history export <path> [--format csv|jsonl] [--op X] [--since T]"
+              " - Stream records to a file")
         print("  history help          - Show this help information\n")
@@ -13,13 +13,18 @@ class MenuCommand(Command):
         """Display the calculator menu"""
         logger.debug("Displaying menu")
         print("\nCalculator Menu:")
-        print("1. Add (add)")
-        print("2. Subtract (subtract)")
-        print("3. Multiply (multiply)")
-        print("4. Divide (divide)")
-        print("5. History (history)")
-        print("6. Help (help)")
-        print("7. Exit (exit)\n")
+        print("1. Add (add [a b])")
+        print("2. Subtract (subtract [a b])")
+        print("3. Multiply (multiply [a b])")
+        print("4. Divide (divide [a b])")
+        print("5. Power (power [base exponent [precision]])")
+        print("6. Root (root [number degree [precision]])")
+        print("7. Modulo (modulo [a b [precision]])")
+        print("8. Factorial (factorial [n [precision]])")
+        print("9. History (history)")
+        print("10. Help (help)")
+        print("11. Exit (exit)")
+        print("Numbers can be given inline (e.g. 'add 3 4') or entered when prompted.\n")
 
         # Additional info for history command if args contain 'history'
         if args and args[0] == 'history':
@@ -27,9 +32,20 @@ class MenuCommand(Command):
             print("  history               - Show recent calculations")
             print("  history save          - Save history to file")
             print("  history load          - Load history from file")
+            print("  history merge <file...> - Merge other history files")
             print("  history clear         - Clear all history")
             print("  history delete <id>   - Delete specific record")
             print("  history filter <op>   - Filter by operation type")
+            print("  history query <expr>  - Find records matching a query")
             print("  history stats         - Show history statistics")
+            print("  history stats --full  - Show result distribution statistics")
+            print("  history page <n> [size] - Show a page of history")
+            print("  history next / prev   - Page to older / newer records")
+            print("  history archive       - Archive old records")
+            print("  history range <start> [end] - Show records in a time range")
+            print("  history verify [workers] - Verify stored results")
+            print("  history replay [count] - Replay history as a load test")
+            print("  history rollup <granularity> [op] - Show time-bucketed rollups")
+            print("  history export <path> [options] - Stream records to CSV or JSON lines")
             print("  history help          - Show history help\n")
             logger.debug("Displayed history submenu")
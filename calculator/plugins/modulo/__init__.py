@@ -0,0 +1,39 @@
+"""
+ModuloCommand Module
+
+This module implements the modulo operation command for the calculator application."""
+# pylint: disable=too-few-public-methods
+from decimal import Decimal, InvalidOperation, localcontext
+from typing import Optional
+from calculator.commands.command import Command, finite_decimal
+from calculator import Calculator
+
+class ModuloCommand(Command):
+    """Handles user input for modulo and performs the operation."""
+    arguments = (finite_decimal, finite_decimal, int)
+    aliases = ('mod', '%')
+    heavy = True
+
+    def is_heavy(self, *args):
+        """Run on the worker pool unless an operand still has to be prompted for."""
+        return len(args) >= 2
+
+    def execute(self,
+                value1: Optional[Decimal] = None,
+                value2: Optional[Decimal] = None,
+                precision: Optional[int] = None):
+        """Compute the remainder of a division, optionally at the given precision in digits."""
+        try:
+            if value1 is None:
+                value1 = Decimal(input("Enter first number: "))
+            if value2 is None:
+                value2 = Decimal(input("Enter second number: "))
+            with localcontext() as ctx:
+                if precision is not None:
+                    ctx.prec = precision
+                result = Calculator.modulo_numbers(value1, value2)
+            print(f"Result: {result}")
+        except InvalidOperation:  # Catches Decimal conversion errors
+            print("Invalid input! Please enter valid numbers.")
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Unexpected error: {e}")
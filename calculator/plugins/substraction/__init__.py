@@ -5,17 +5,22 @@ This module implements the subtraction operation command for the calculator appl
 """
 # pylint: disable=too-few-public-methods
 from decimal import Decimal, InvalidOperation
-from calculator.commands.command import Command
+from typing import Optional
+from calculator.commands.command import Command, finite_decimal
 from calculator import Calculator
 
 class SubtractionCommand(Command):
     """Handles user input for subtraction and performs the operation."""
+    arguments = (finite_decimal, finite_decimal)
+    aliases = ('subtract', 'sub', '-')
 
-    def execute(self):
-        """Executes the subtraction command by taking user input and performing the operation."""
+    def execute(self, value1: Optional[Decimal] = None, value2: Optional[Decimal] = None):
+        """Executes the subtraction command, prompting for any operand not given inline."""
         try:
-            value1 = Decimal(input("Enter first number: "))
-            value2 = Decimal(input("Enter second number: "))
+            if value1 is None:
+                value1 = Decimal(input("Enter first number: "))
+            if value2 is None:
+                value2 = Decimal(input("Enter second number: "))
             result = Calculator.subtract_numbers(value1, value2)
             print(f"Result: {result}")
         except InvalidOperation:  # Catches Decimal conversion errors
@@ -0,0 +1,358 @@
+"""
+SQLite History Module
+
+Provides a SQLite-backed implementation of the HistoryManager interface for
+histories that are large or queried often. Records are buffered and inserted
+in batches with a single commit per batch, the database runs in WAL mode with
+indexes on operation and timestamp, and statistics are aggregated in SQL
+(result sums with an exact Decimal aggregate, like the CSV backend).
+"""
+import os
+import sqlite3
+import uuid
+import logging
+import threading
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import pandas as pd
+from calculator.calculation import Calculation
+from calculator.history_archive import HistoryArchive
+from calculator.history_dtypes import COLUMNS, Scales, decode_frame, encode_frame
+from calculator.history_query import QueryResult, compile_query
+from calculator.history_rollup import RollupStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    value1 TEXT NOT NULL,
+    value2 TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_operation ON history (operation);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp);
+"""
+
+SELECT_COLUMNS = f"SELECT id, {', '.join(COLUMNS)} FROM history"
+INSERT_RECORD = f"INSERT INTO history ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?)"
+
+class DecimalSum:
+    """SQLite aggregate summing numbers stored as TEXT exactly, as Decimal."""
+
+    def __init__(self):
+        """Start the sum at zero."""
+        self.total = Decimal(0)
+
+    def step(self, value) -> None:
+        """Add one value."""
+        self.total += Decimal(value)
+
+    def finalize(self) -> str:
+        """Return the sum as decimal text."""
+        return str(self.total)
+
+class SQLiteHistoryManager:
+    """Manages calculation history in a SQLite database.
+
+    Record ids are the database row ids; they are used as the DataFrame index
+    of every returned frame, so the ids shown by the history command can be
+    passed straight back to delete_record.
+    """
+
+    def __init__(self, database: str = "calculation_history.db", batch_size: int = 100,
+                 archive: Optional[HistoryArchive] = None,
+                 rollups: Optional[RollupStore] = None):
+        """Open (or create) the history database."""
+        self.history_file = database
+        self.batch_size = batch_size
+        self.archive = archive
+        self.rollups = rollups if rollups is not None else RollupStore.from_env()
+        self.rollup_file = database + ".rollup.json"
+        self.logger = logging.getLogger(__name__)
+        self.token = uuid.uuid4().hex
+        self.version = 0
+        self._pending: List[Tuple[str, str, str, str, str]] = []
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(database, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.create_aggregate("decimal_sum", 1, DecimalSum)
+        self._conn.executescript(SCHEMA)
+        self._count = self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+        if self._count and not self.rollups.load(self.rollup_file, [self._count]):
+            self.rollups.rebuild(self.iter_chunks())
+
+    def __len__(self) -> int:
+        """Return the number of history records, including ones not yet flushed."""
+        return self._count
+
+    def add_calculation(self, calculation: Calculation, result: Optional[Decimal] = None) -> None:
+        """Queue a calculation for insertion, writing the batch once it is full."""
+        try:
+            if result is None:
+                result = calculation.perform()
+            record = (datetime.now().isoformat(), str(calculation.value1), str(calculation.value2),
+                      calculation.operation.__name__, str(result))
+            with self._lock:
+                self._pending.append(record)
+                self.rollups.add(record[0], record[3], record[4])
+                self._count += 1
+                self.version += 1
+                if len(self._pending) >= self.batch_size:
+                    self.flush()
+            self.logger.info("Added calculation to history: %s(%s, %s)",
+                             calculation.operation.__name__, calculation.value1, calculation.value2)
+        except Exception as e:
+            self.logger.error("Failed to add calculation to history: %s", e)
+            raise
+
+    def flush(self) -> int:
+        """Insert all pending records in one transaction; return how many were written."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            # Dropped only once committed, so a failed insert keeps them for the next flush
+            with self._conn:
+                self._conn.executemany(INSERT_RECORD, self._pending)
+            written, self._pending = len(self._pending), []
+            self.logger.debug("Committed %d history records", written)
+            return written
+
+    def _query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        """Run a SELECT returning history columns, indexed by record id."""
+        with self._lock:
+            self.flush()
+            frame = pd.read_sql_query(sql, self._conn, params=params, index_col='id')
+        # Record ids are integers, even when no record matched
+        frame.index = frame.index.astype('int64')
+        frame.index.name = None
+        return frame
+
+    def save_history(self) -> bool:
+        """Commit pending records, rolling old records into the archive if one is configured."""
+        try:
+            if self.archive is not None:
+                self.roll_history()
+            self.flush()
+            self.rollups.save(self.rollup_file, [len(self)])
+            self.logger.info("Saved %d history records to %s", len(self), self.history_file)
+            return True
+        except sqlite3.Error as e:
+            self.logger.error("Failed to save history: %s", e)
+            return False
+
+    def iter_encoded(self, chunksize: int = 10000) -> Iterator[Tuple[pd.DataFrame, Scales]]:
+        """Iterate over the history in compact dtypes, in windows of at most chunksize."""
+        for chunk in self.iter_chunks(chunksize):
+            yield encode_frame(chunk)
+
+    def insert_records(self, frame: pd.DataFrame, scales: Scales) -> int:
+        """Insert encoded records in one transaction, in timestamp order.
+
+        Existing records keep their ids, so inserted ones follow them; time
+        range queries use the timestamp index regardless.
+        """
+        records = decode_frame(frame, scales).sort_values('timestamp', kind='stable')
+        rows = list(records[COLUMNS].itertuples(index=False, name=None))
+        with self._lock:
+            self.flush()
+            with self._conn:
+                self._conn.executemany(INSERT_RECORD, rows)
+            self._count += len(rows)
+            self.rollups.extend([records])
+            self.version += 1
+        self.logger.info("Inserted %d history records", len(rows))
+        return len(rows)
+
+    def save_snapshot(self) -> bool:
+        """Commit pending records; the indexed database needs no separate snapshot."""
+        self.flush()
+        return False
+
+    def load_history(self) -> bool:
+        """Refresh the record count from the database file."""
+        try:
+            if os.path.exists(self.history_file):
+                with self._lock:
+                    self.flush()
+                    self._count = self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+                    if not self.rollups.load(self.rollup_file, [self._count]):
+                        self.rollups.rebuild(self.iter_chunks())
+                    self.version += 1
+                self.logger.info("Loaded %d history records from %s", len(self), self.history_file)
+                return True
+            self.logger.warning("History file %s not found", self.history_file)
+            return False
+        except sqlite3.Error as e:
+            self.logger.error("Failed to load history: %s", e)
+            return False
+
+    def clear_history(self) -> None:
+        """Delete all history records."""
+        with self._lock:
+            record_count = len(self)
+            self._pending = []
+            with self._conn:
+                self._conn.execute("DELETE FROM history")
+            self.rollups.clear()
+            self._count = 0
+            self.version += 1
+        self.logger.info("Cleared %d history records", record_count)
+
+    def delete_record(self, index: int) -> bool:
+        """Delete a specific record by its record id."""
+        try:
+            with self._lock:
+                self.flush()
+                record = self._conn.execute(
+                    "SELECT timestamp, operation, result FROM history WHERE id = ?",
+                    (index,)).fetchone()
+                if record is not None:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM history WHERE id = ?", (index,))
+                    self.rollups.remove(*record)
+                    self._count -= 1
+                    self.version += 1
+                    self.logger.info("Deleted record at index %d", index)
+                    return True
+            self.logger.warning("Invalid index %d for deletion", index)
+            return False
+        except sqlite3.Error as e:
+            self.logger.error("Failed to delete record: %s", e)
+            return False
+
+    def get_history(self) -> pd.DataFrame:
+        """Get the entire history as a DataFrame."""
+        return self._query(f"{SELECT_COLUMNS} ORDER BY id")
+
+    def get_window(self, start: int, stop: int) -> pd.DataFrame:
+        """Get the records in positions [start, stop) in insertion order.
+
+        While record ids have no gaps, positions map straight to an id range on
+        the primary key. After deletes the window is counted from whichever end
+        of the table is nearer, so recent pages stay cheap.
+        """
+        with self._lock:
+            self.flush()
+            start, stop = max(0, start), min(self._count, stop)
+            if stop <= start:
+                return self._query(f"{SELECT_COLUMNS} WHERE 0")
+            first, last = self._conn.execute("SELECT MIN(id), MAX(id) FROM history").fetchone()
+            if last - first + 1 == self._count:
+                return self._query(f"{SELECT_COLUMNS} WHERE id >= ? AND id < ? ORDER BY id",
+                                   (first + start, first + stop))
+            if start <= self._count - stop:
+                return self._query(f"{SELECT_COLUMNS} ORDER BY id LIMIT ? OFFSET ?",
+                                   (stop - start, start))
+            window = self._query(f"{SELECT_COLUMNS} ORDER BY id DESC LIMIT ? OFFSET ?",
+                                 (stop - start, self._count - stop))
+            return window.iloc[::-1]
+
+    def iter_chunks(self, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """Iterate over the history in chunks, seeking by record id rather than offset."""
+        last_id = 0
+        while True:
+            chunk = self._query(f"{SELECT_COLUMNS} WHERE id > ? ORDER BY id LIMIT ?",
+                                (last_id, chunksize))
+            if len(chunk) == 0:
+                return
+            yield chunk
+            last_id = int(chunk.index[-1])
+
+    def filter_by_operation(self, operation: str) -> pd.DataFrame:
+        """Filter history by operation type using the operation index."""
+        try:
+            filtered = self._query(f"{SELECT_COLUMNS} WHERE operation = ? ORDER BY id",
+                                   (operation,))
+            self.logger.info("Filtered %d records with operation '%s'", len(filtered), operation)
+            return filtered
+        except sqlite3.Error as e:
+            self.logger.error("Failed to filter by operation: %s", e)
+            return pd.DataFrame()
+
+    def query(self, text: str) -> QueryResult:
+        """Get the records matching a history query (see calculator.history_query).
+
+        Operation tests and timestamp bounds are answered in SQL on the
+        indexed columns; only the rows they select are encoded, for the
+        exact numeric comparisons. Raises QueryError for bad queries.
+        """
+        query = compile_query(text)
+        candidates = self._query(f"{SELECT_COLUMNS}{query.sql_where} ORDER BY id",
+                                 tuple(query.sql_params))
+        result = query.run_prefiltered(*encode_frame(candidates))
+        self.logger.info("Query '%s' matched %d records", text, len(result))
+        return result
+
+    def roll_history(self, now: Optional[datetime] = None) -> int:
+        """Move records from before the current time bucket into the archive."""
+        if self.archive is None:
+            return 0
+        now = now or datetime.now()
+        cutoff = self.archive.bucket_start(now).isoformat()
+        old = self._query(f"{SELECT_COLUMNS} WHERE timestamp < ? ORDER BY id", (cutoff,))
+        if len(old):
+            self.archive.write(old)
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM history WHERE timestamp < ?", (cutoff,))
+                self._count -= len(old)
+                # Rollups cover the live history, as a rebuild from it would
+                self.rollups.discard([old])
+                self.version += 1
+        self.archive.compress_cold(now)
+        self.archive.apply_retention(now)
+        self.logger.info("Rolled %d history records into the archive", len(old))
+        return len(old)
+
+    def query_range(self, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> pd.DataFrame:
+        """Get records with start <= timestamp < end from the archive and the database."""
+        frames = list(self.archive.read_range(start, end)) if self.archive is not None else []
+        # ISO timestamps sort lexicographically, so the range uses the timestamp index
+        live = self._query(f"{SELECT_COLUMNS} WHERE timestamp >= ? AND timestamp < ? ORDER BY id",
+                           (start.isoformat() if start else "", end.isoformat() if end else "~"))
+        if len(live) or not frames:
+            frames.append(live)
+        return pd.concat(frames, ignore_index=True)
+
+    def get_rollup(self, granularity: str, operation: Optional[str] = None) -> pd.DataFrame:
+        """Get per-bucket counts and result sums from the materialized rollups."""
+        return self.rollups.query(granularity, operation)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Calculate statistics from the history with SQL-side aggregation."""
+        with self._lock:
+            self.flush()
+            total, first, last = self._conn.execute(
+                "SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM history").fetchone()
+            if total == 0:
+                return {"status": "empty", "message": "No history data available"}
+            counts = self._conn.execute(
+                "SELECT operation, COUNT(*) FROM history "
+                "GROUP BY operation ORDER BY COUNT(*) DESC").fetchall()
+            try:
+                sums = dict(self._conn.execute(
+                    "SELECT operation, decimal_sum(result) FROM history "
+                    "GROUP BY operation").fetchall())
+                averages = {op: str(Decimal(sums[op]) / count) for op, count in counts}
+            except sqlite3.OperationalError:
+                # A stored result that is not a number
+                averages = "Unable to calculate"
+
+        stats = {
+            "total_calculations": total,
+            "operations_count": dict(counts),
+            "first_calculation": first,
+            "last_calculation": last,
+            "average_results": averages,
+        }
+        self.logger.info("Generated history statistics")
+        return stats
+
+    def close(self) -> None:
+        """Flush pending records and close the database connection."""
+        with self._lock:
+            self.flush()
+            self._conn.close()
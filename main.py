@@ -1,42 +1,166 @@
 """My calculator3"""
 import sys
+import csv
+import json
+import time
+import argparse
 from decimal import Decimal, InvalidOperation
+from itertools import islice
 from calculator import Calculator
+from calculator.operation import OPERATIONS
+from calculator.history_sessions import current_history
+
+BATCH_CHUNK_SIZE = 1000
+BATCH_COLUMNS = ['value1', 'value2', 'operation', 'result', 'error']
 
 def calculate_and_print(value1_str, value2_str, operation_key):
     """Perform calculation and print result"""
-    operation_lookup = {
-        'addition': Calculator.add_numbers,
-        'subtraction': Calculator.subtract_numbers,
-        'multiplication': Calculator.multiply_numbers,
-        'division': Calculator.divide_numbers
-    }
-
     try:
         value1 = Decimal(value1_str)
         value2 = Decimal(value2_str)
-        if operation_key not in operation_lookup:
+        if operation_key not in OPERATIONS:
             print(f"Unknown operation: {operation_key}")
             return
 
         try:
-            result = operation_lookup[operation_key](value1, value2)
+            result = Calculator.execute_operation(value1, value2, OPERATIONS[operation_key])
             print(f"The result of {value1_str} {operation_key} {value2_str} is equal to {result}")
-        except ValueError as e:
+        except (ValueError, ArithmeticError) as e:
             print(f"An error occurred: {str(e)}")
 
     except InvalidOperation:
         print(f"Invalid number input: {value1_str} or {value2_str} is not a valid number.")
 
-def main():
+def read_batch_rows(stream):
+    """Yield (value1, value2, operation) string triples from a CSV stream.
+
+    A header row naming the value1, value2 and operation columns is optional;
+    without one the first three columns are used in that order.
+    """
+    reader = csv.reader(stream)
+    positions = (0, 1, 2)
+    for line_number, row in enumerate(reader, start=1):
+        if not row or not any(field.strip() for field in row):
+            continue
+        fields = [field.strip() for field in row]
+        if line_number == 1 and {'value1', 'value2', 'operation'} <= set(fields):
+            positions = tuple(fields.index(name) for name in ('value1', 'value2', 'operation'))
+            continue
+        yield tuple(fields[i] if i < len(fields) else '' for i in positions)
+
+def calculate_row(value1_str, value2_str, operation_key, record=False):
+    """Calculate one batch row, returning (result, error) with exactly one of them set."""
+    operation = OPERATIONS.get(operation_key)
+    if operation is None:
+        return None, f"Unknown operation: {operation_key}"
+    try:
+        value1 = Decimal(value1_str)
+        value2 = Decimal(value2_str)
+    except InvalidOperation:
+        return None, f"Invalid number input: {value1_str} or {value2_str} is not a valid number."
+    try:
+        return Calculator.execute_operation(value1, value2, operation, record=record), None
+    except (ValueError, ArithmeticError) as e:
+        return None, f"An error occurred: {e}"
+
+def run_batch(input_stream, output_stream, output_format='csv',
+              chunk_size=BATCH_CHUNK_SIZE, record=False):
+    """Stream rows from input_stream through the Calculator and write results incrementally.
+
+    Rows are processed and written chunk by chunk, so memory use does not depend
+    on the input size. Returns a summary dict with row, error and throughput counts.
+    """
+    started = time.perf_counter()
+    rows = read_batch_rows(input_stream)
+    writer = None
+    if output_format == 'csv':
+        writer = csv.writer(output_stream)
+        writer.writerow(BATCH_COLUMNS)
+    processed = errors = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        for value1_str, value2_str, operation_key in chunk:
+            result, error = calculate_row(value1_str, value2_str, operation_key, record)
+            errors += error is not None
+            result_str = str(result) if result is not None else ''
+            if writer is not None:
+                writer.writerow([value1_str, value2_str, operation_key, result_str, error or ''])
+            else:
+                output_stream.write(json.dumps({
+                    'value1': value1_str, 'value2': value2_str, 'operation': operation_key,
+                    'result': result_str if error is None else None, 'error': error}) + '\n')
+        processed += len(chunk)
+        output_stream.flush()
+    seconds = time.perf_counter() - started
+    return {
+        'rows': processed,
+        'errors': errors,
+        'seconds': seconds,
+        'rows_per_second': processed / seconds if seconds else 0.0,
+    }
+
+def _open_stream(path, mode):
+    """Open a file path, or stdin/stdout for '-'."""
+    if path == '-':
+        return sys.stdin if 'r' in mode else sys.stdout
+    return open(path, mode, newline='', encoding='utf-8')  # pylint: disable=consider-using-with
+
+def batch_main(args):
+    """Run batch mode from parsed command line arguments."""
+    output_format = args.format
+    if output_format is None:
+        output_format = 'jsonl' if args.output.endswith(('.jsonl', '.json')) else 'csv'
+    history = current_history() if args.record else None
+    if history is not None:
+        # Loaded first so saving adds the batch to the history instead of replacing it
+        history.load_history()
+    input_stream = _open_stream(args.batch, 'r')
+    output_stream = _open_stream(args.output, 'w')
+    try:
+        summary = run_batch(input_stream, output_stream, output_format,
+                            chunk_size=args.chunk_size, record=args.record)
+    finally:
+        for stream in (input_stream, output_stream):
+            if stream not in (sys.stdin, sys.stdout):
+                stream.close()
+        if history is not None:
+            history.save_history()
+    print(f"Processed {summary['rows']} rows ({summary['errors']} errors) in "
+          f"{summary['seconds']:.3f}s: {summary['rows_per_second']:.0f} rows/s",
+          file=sys.stderr)
+
+def main(argv=None):
     """main method calling"""
-    if len(sys.argv) != 4:
+    parser = argparse.ArgumentParser(
+        description="Calculate <number1> <operation> <number2>, or a whole CSV in batch mode.")
+    parser.add_argument('values', nargs='*', help="<number1> <number2> <operation>")
+    parser.add_argument('--batch', metavar='INPUT',
+                        help="CSV of value1,value2,operation rows ('-' for stdin)")
+    parser.add_argument('--output', default='-',
+                        help="output CSV or JSON lines file ('-' for stdout)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help="output format (default: from the output extension, else csv)")
+    parser.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE,
+                        help="rows processed between output flushes")
+    parser.add_argument('--record', action='store_true',
+                        help="also add batch calculations to the history")
+    args = parser.parse_args(argv)
+
+    if args.batch is not None:
+        batch_main(args)
+        return
+    if len(args.values) != 3:
         print("Usage: python calculator_main.py <number1> <number2> <operation>")
         sys.exit(1)
 
-    _, value1, value2, operation = sys.argv
+    value1, value2, operation = args.values
     calculate_and_print(value1, value2, operation)
 
 if __name__ == '__main__':
-    from calculator.commands import start
-    start()
+    if len(sys.argv) > 1:
+        main()
+    else:
+        from calculator.commands import start
+        start()
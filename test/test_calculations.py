@@ -0,0 +1,128 @@
+"""Test module for the shared calculation store and its views."""
+import threading
+from decimal import Decimal
+import pytest
+from calculator import Calculator
+from calculator.calculation import Calculation
+from calculator.calculation_store import TAIL_LIMIT, CalculationStore
+from calculator.calculations import Calculations
+from calculator.history_dtypes import decode_frame
+from calculator.history_manager import HistoryManager
+from calculator.operation import addition, division, subtraction
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path, monkeypatch):
+    """Route the shared history to a fresh manager for the test."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    monkeypatch.setattr("calculator.history_manager.history_manager", manager)
+    return manager
+
+def test_calculations_are_stored_once(manager):
+    """Calculator records each calculation once, visible through every view."""
+    Calculator.add_numbers(Decimal('2'), Decimal('3'))
+    Calculator.subtract_numbers(Decimal('9'), Decimal('4'))
+    assert Calculation.history is Calculations.history
+    assert len(manager) == len(Calculations.get_history()) == 2
+    assert Calculations.get_latest() == Calculation(Decimal('9'), Decimal('4'), subtraction)
+    assert list(Calculations.get_history()) == Calculations.get_history()[:]
+    assert Calculations.get_history()[0].perform() == Decimal('5')
+
+def test_failed_calculations_are_not_recorded(manager):
+    """A calculation that raises leaves the history untouched."""
+    with pytest.raises(ValueError):
+        Calculator.divide_numbers(Decimal('1'), Decimal('0'))
+    assert len(manager) == 0
+    assert Calculations.get_latest() is None
+
+def test_views_write_through_to_the_manager(manager):
+    """Appends and clears through a view reach the history manager."""
+    Calculation.history.extend([Calculation(Decimal('1'), Decimal('2'), addition),
+                                Calculation(Decimal('6'), Decimal('3'), division)])
+    assert list(manager.get_history()['result']) == ['3', '2']
+    assert Calculations.find_by_operation('division') == [
+        Calculation(Decimal('6'), Decimal('3'), division)]
+    with pytest.raises(IndexError):
+        Calculations.history[2]  # pylint: disable=pointless-statement
+    Calculation.clear_history()
+    assert len(manager) == 0 and len(Calculations.history) == 0
+
+def test_unknown_operations_keep_their_stored_result(manager):
+    """Records of custom or removed operations load with their stored result."""
+    manager.df = manager.get_history().reindex(range(1)).assign(
+        timestamp='2025-03-01T10:00:00', value1='3', value2='4', operation='hypot', result='5')
+    calculation = Calculations.get_latest()
+    assert calculation.operation.__name__ == 'hypot'
+    assert calculation.perform() == Decimal('5')
+    with pytest.raises(ValueError, match="Unknown operation: hypot"):
+        calculation.operation(Decimal('6'), Decimal('8'))
+
+def test_custom_operations_round_trip_through_history(manager):
+    """A calculation with an operation outside OPERATIONS reads back with its result."""
+    def average(value1, value2):
+        return (value1 + value2) / 2
+    Calculator.execute_operation(Decimal('3'), Decimal('6'), average)
+    calculation = Calculations.get_latest()
+    assert calculation == Calculation(Decimal('3'), Decimal('6'), average)
+    assert calculation.perform() == Decimal('4.5')
+
+def test_store_compacts_appends_in_batches():
+    """Appends are buffered and encoded in groups; snapshots are never mutated."""
+    store = CalculationStore()
+    record = {'timestamp': '2025-03-01T10:00:00', 'value1': '1', 'value2': '0.5',
+              'operation': 'addition', 'result': '1.5'}
+    store.append(record)
+    frame, scales = store.snapshot()
+    for _ in range(TAIL_LIMIT):
+        store.append(record)
+    assert len(frame) == 1 and scales['result'] == 1
+    assert len(store) == TAIL_LIMIT + 1
+    assert not store._tail  # pylint: disable=protected-access
+    assert len(store.snapshot()[0]) == TAIL_LIMIT + 1
+
+def test_delete_keeps_records_added_meanwhile(manager):
+    """A calculation added by another thread during a delete survives it."""
+    Calculator.add_numbers(Decimal('1'), Decimal('1'))
+    Calculator.add_numbers(Decimal('2'), Decimal('2'))
+    remove = manager.rollups.remove
+    adder = threading.Thread(target=Calculator.add_numbers, args=(Decimal('3'), Decimal('3')))
+
+    def remove_while_adding(*args):
+        adder.start()
+        adder.join(0.2)
+        remove(*args)
+    manager.rollups.remove = remove_while_adding
+    assert manager.delete_record(0)
+    adder.join(5)
+    assert list(manager.get_history()['result']) == ['4', '6']
+
+def test_windows_do_not_compact_the_tail():
+    """Windows over appended records leave the tail in place and match the snapshot."""
+    store = CalculationStore()
+    for number in range(5):
+        store.append({'timestamp': f'2025-03-01T10:00:0{number}', 'value1': str(number),
+                      'value2': '0.25', 'operation': 'addition', 'result': str(number + 0.25)})
+        if number == 2:
+            store.snapshot()
+    window, scales = store.window(1, 4)
+    assert len(store._tail) == 2  # pylint: disable=protected-access
+    assert list(window.index) == [1, 2, 3]
+    assert list(decode_frame(window, scales)['result']) == ['1.25', '2.25', '3.25']
+    assert decode_frame(*store.window(3, 10)).equals(decode_frame(*store.snapshot()).iloc[3:])
+    assert len(store.window(7, 9)[0]) == 0
+
+def test_store_chunks_grow_geometrically():
+    """Sealed chunks are merged by size, so there are few and windows span them."""
+    store = CalculationStore()
+    for number in range(TAIL_LIMIT * 11 + 3):
+        store.append({'timestamp': '2025-03-01T10:00:00', 'value1': str(number),
+                      'value2': '1', 'operation': 'addition', 'result': str(number + 1)})
+    sizes = [len(frame) for frame, _ in store._chunks]  # pylint: disable=protected-access
+    assert sizes == [TAIL_LIMIT * 8, TAIL_LIMIT * 2, TAIL_LIMIT]
+    start = TAIL_LIMIT * 8 - 2
+    window, scales = store.window(start, TAIL_LIMIT * 11 + 1)
+    assert list(window.index) == list(range(start, TAIL_LIMIT * 11 + 1))
+    assert decode_frame(window, scales)['value1'].tolist() == [
+        str(number) for number in range(start, TAIL_LIMIT * 11 + 1)]
+    assert decode_frame(*store.snapshot())['value1'].tolist() == [
+        str(number) for number in range(TAIL_LIMIT * 11 + 3)]
+    assert len(store._chunks) == 1  # pylint: disable=protected-access
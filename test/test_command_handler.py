@@ -0,0 +1,71 @@
+"""Test module for command dispatch and inline arguments."""
+from decimal import Decimal
+import pytest
+from calculator.commands.command_handler import CommandHandler
+
+@pytest.fixture(name="handler")
+def fixture_handler():
+    """Provide a command handler with all plugins loaded."""
+    return CommandHandler()
+
+@pytest.mark.parametrize("command_input, expected_output", [
+    ("add 3 4", "Result: 7"),
+    ("addition 3 4", "Result: 7"),
+    ("+ 1.5 2.25", "Result: 3.75"),
+    ("sub 10 4", "Result: 6"),
+    ("multiply 6 7", "Result: 42"),
+    ("div 9 3", "Result: 3"),
+    ("d 1 0", "Error: Division by zero is not allowed."),
+    ("ADD 1 1", "Result: 2"),
+    ("power 2 10", "Result: 1024"),
+    ("root 2 2 10", "Result: 1.414213562"),
+    ("mod 10 3", "Result: 1"),
+    ("factorial 10", "Result: 3628800"),
+    ("! 30 5", "Result: 2.6525E+32"),
+])
+def test_inline_operands(handler, command_input, expected_output, capsys):
+    """Arithmetic commands accept operands inline, by name, alias or unique prefix."""
+    handler.execute_command(command_input)
+    assert capsys.readouterr().out.strip() == expected_output
+
+def test_prompts_for_missing_operands(handler, monkeypatch, capsys):
+    """Operands that are not given inline are prompted for."""
+    answers = iter(["5"])
+    monkeypatch.setattr("builtins.input", lambda _: next(answers))
+    handler.execute_command("multiply 3")
+    assert capsys.readouterr().out.strip() == "Result: 15"
+
+def test_arguments_are_converted_once(handler, monkeypatch):
+    """Commands receive already converted Decimal operands."""
+    received = []
+    monkeypatch.setattr(handler.commands['addition'], "execute",
+                        lambda *args: received.extend(args))
+    handler.execute_command("add 1 2")
+    assert received == [Decimal('1'), Decimal('2')]
+    assert all(isinstance(value, Decimal) for value in received)
+
+@pytest.mark.parametrize("command_input, expected_output", [
+    ("add x 4",
+     "Invalid input! Argument 1 (value1) of 'addition' must be a finite number, not 'x'."),
+    ("power 2 3 1.5",
+     "Invalid input! Argument 3 (precision) of 'power' must be an integer, not '1.5'."),
+    ("power 2 NaN",
+     "Invalid input! Argument 2 (value2) of 'power' must be a finite number, not 'NaN'."),
+    ("div -Infinity 2",
+     "Invalid input! Argument 1 (value1) of 'division' must be a finite number, not '-Infinity'."),
+    ("add 1 2 3", "Too many arguments for 'addition': expected at most 2."),
+    ("m", "Unknown command: m"),
+    ("frobnicate", "Unknown command: frobnicate"),
+])
+def test_invalid_input(handler, command_input, expected_output, capsys):
+    """Bad operands, extra arguments and ambiguous or unknown names are reported."""
+    handler.execute_command(command_input)
+    assert capsys.readouterr().out.strip() == expected_output
+
+def test_dispatch_table_is_rebuilt_after_registration(handler):
+    """Registering a command invalidates prefixes that become ambiguous."""
+    assert handler.resolve("h") is None  # also a prefix of 'help'
+    assert handler.resolve("hi")[0] == "history"
+    handler.register_command("hist", handler.commands["menu"])
+    assert handler.resolve("hi") is None
+    assert handler.resolve("hist")[0] == "hist"
@@ -0,0 +1,76 @@
+"""Test module for history paging."""
+from decimal import Decimal
+import pytest
+from calculator.calculation import Calculation
+from calculator.history_manager import HistoryManager
+from calculator.operation import addition
+from calculator.plugins.history import HistoryCommand
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path, monkeypatch):
+    """Provide a history manager with 25 records wired into the history plugin."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    for i in range(25):
+        manager.add_calculation(Calculation(Decimal(i), Decimal('1'), addition))
+    monkeypatch.setattr("calculator.history_manager.history_manager", manager)
+    return manager
+
+def test_get_window_is_bounded(manager):
+    """Windows are clipped to the history bounds."""
+    assert len(manager.get_window(20, 40)) == 5
+    assert list(manager.get_window(-5, 2).index) == [0, 1]
+
+def test_page_one_is_most_recent(manager, capsys):
+    """Page 1 shows the newest records, with their ids."""
+    HistoryCommand().execute('page', '1')
+    out = capsys.readouterr().out
+    assert "Page 1 of 3 (25 records)" in out
+    ids = [line.split()[0] for line in out.splitlines()[3:]]
+    assert ids == [str(i) for i in range(15, 25)]
+
+def test_next_and_prev_move_the_cursor(manager, capsys):
+    """next goes to older pages and prev back to newer ones."""
+    command = HistoryCommand()
+    command.execute('page', '1', '10')
+    command.execute('next')
+    command.execute('next')
+    assert command.page == 3
+    out = capsys.readouterr().out
+    assert "Page 3 of 3" in out
+    command.execute('next')
+    assert "No such page 4" in capsys.readouterr().out
+    command.execute('prev')
+    assert command.page == 2
+
+def test_page_cache_invalidated_on_change(manager, capsys):
+    """Formatted pages are cached until the history changes."""
+    command = HistoryCommand()
+    command.execute('page', '1', '5')
+    command.execute('page', '1', '5')
+    assert len(command._page_cache) == 1  # pylint: disable=protected-access
+    manager.add_calculation(Calculation(Decimal('100'), Decimal('1'), addition))
+    capsys.readouterr()
+    command.execute('page', '1', '5')
+    assert "26 records" in capsys.readouterr().out
+
+def test_page_cache_is_per_manager(manager, tmp_path, monkeypatch, capsys):
+    """A page cached for one manager is never shown for another at the same version."""
+    command = HistoryCommand()
+    command.execute('page', '1', '5')
+    other = HistoryManager(str(tmp_path / "other.csv"))
+    for i in range(3):
+        other.add_calculation(Calculation(Decimal(i), Decimal('1'), addition))
+    other.version = manager.version
+    monkeypatch.setattr("calculator.history_manager.history_manager", other)
+    capsys.readouterr()
+    command.execute('page', '1', '5')
+    assert "3 records" in capsys.readouterr().out
+
+def test_invalid_page_arguments(manager, capsys):
+    """Non-numeric or non-positive page arguments are rejected."""
+    command = HistoryCommand()
+    command.execute('page', 'x')
+    command.execute('page', '0')
+    out = capsys.readouterr().out
+    assert "Invalid page" in out
+    assert "must be positive" in out
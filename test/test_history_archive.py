@@ -0,0 +1,108 @@
+"""Test module for the time-segmented history archive."""
+import os
+import shutil
+from datetime import datetime
+import pandas as pd
+import pytest
+from calculator.history_archive import HistoryArchive
+from calculator.history_manager import HistoryManager
+
+NOW = datetime(2025, 3, 10, 12, 0)
+
+def make_records(days):
+    """Build one addition record at noon for each given day of March 2025."""
+    return pd.DataFrame([{
+        'timestamp': datetime(2025, 3, day, 12, 0).isoformat(),
+        'value1': str(day), 'value2': '1', 'operation': 'addition', 'result': str(day + 1)
+    } for day in days])
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path):
+    """Provide a history manager with ten days of records and a gzip archive."""
+    archive = HistoryArchive(str(tmp_path / "archive"), compression="gzip", retention_days=5)
+    manager = HistoryManager(str(tmp_path / "history.csv"), archive=archive)
+    manager.df = make_records(range(1, 11))
+    return manager
+
+def test_roll_keeps_current_bucket_live(manager):
+    """Only records from the current day stay in the live history."""
+    assert manager.roll_history(NOW) == 9
+    assert list(manager.get_history()['value1']) == ['10']
+
+def test_cold_segments_are_compressed_and_expired(manager):
+    """Old segments are compressed and those past retention are removed."""
+    manager.roll_history(NOW)
+    segments = manager.archive.segments()
+    assert [segment.start.day for segment in segments] == [5, 6, 7, 8, 9]
+    assert all(segment.compressed for segment in segments)
+    assert all(segment.path.endswith(".csv.gz") for segment in segments)
+
+def test_range_query_reads_overlapping_segments(manager):
+    """Range queries combine archived and live records."""
+    manager.roll_history(NOW)
+    records = manager.query_range(datetime(2025, 3, 8), datetime(2025, 3, 11))
+    assert list(records['value1']) == ['8', '9', '10']
+    partial = manager.query_range(datetime(2025, 3, 7, 13, 0), datetime(2025, 3, 8, 13, 0))
+    assert list(partial['value1']) == ['8']
+
+def test_late_records_append_to_compressed_segment(tmp_path):
+    """Records for an already compressed bucket are readable after appending."""
+    archive = HistoryArchive(str(tmp_path), compression="lzma")
+    archive.write(make_records([1]))
+    archive.compress_cold(NOW)
+    archive.write(make_records([1]))
+    assert len(archive.segments()) == 1
+    assert sum(len(chunk) for chunk in archive.read_range()) == 2
+
+def test_failed_compression_keeps_the_plain_segment(tmp_path, monkeypatch):
+    """A compression that fails leaves the plain segment and no partial file behind."""
+    archive = HistoryArchive(str(tmp_path), compression="gzip")
+    archive.write(make_records([1, 2]))
+    def fail(*_args, **_kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr("calculator.history_archive.shutil.copyfileobj", fail)
+    with pytest.raises(OSError):
+        archive.compress_cold(NOW)
+    assert sorted(os.listdir(tmp_path)) == ["history-2025-03-01.csv", "history-2025-03-02.csv"]
+    monkeypatch.undo()
+    assert archive.compress_cold(NOW) == 2
+    assert [chunk['value1'].tolist() for chunk in archive.read_range()] == [['1'], ['2']]
+
+def test_interrupted_compression_is_finished(tmp_path):
+    """A plain segment left beside its compressed copy is removed, not compressed again."""
+    archive = HistoryArchive(str(tmp_path), compression="gzip")
+    archive.write(make_records([1]))
+    plain = archive.segments()[0].path
+    shutil.copyfile(plain, tmp_path / "kept.csv")
+    archive.compress_cold(NOW)
+    shutil.copyfile(tmp_path / "kept.csv", plain)
+    archive.write(make_records([1]))
+    assert archive.compress_cold(NOW) == 1
+    assert [segment.compressed for segment in archive.segments()] == [True]
+    assert sum(len(chunk) for chunk in archive.read_range()) == 2
+
+def test_segments_are_rolled_in_timestamp_order(tmp_path):
+    """Records written out of order land in their segments sorted by timestamp."""
+    archive = HistoryArchive(str(tmp_path), compression="gzip")
+    records = make_records([2, 1, 2, 1])
+    records['timestamp'] = ['2025-03-02T12:00:00', '2025-03-01T18:00:00',
+                            '2025-03-02T08:00:00', '2025-03-01T06:00:00']
+    records['value1'] = ['c', 'b', 'd', 'a']
+    archive.write(records)
+    assert [chunk['value1'].tolist() for chunk in archive.read_range()] == [['a', 'b'], ['d', 'c']]
+
+def test_invalid_configuration(tmp_path):
+    """Unknown buckets and compressions are rejected."""
+    with pytest.raises(ValueError):
+        HistoryArchive(str(tmp_path), bucket="weekly")
+    with pytest.raises(ValueError):
+        HistoryArchive(str(tmp_path), compression="zip")
+
+def test_rolled_records_leave_the_rollups(manager):
+    """After a roll the rollups match a rebuild from the live history."""
+    manager.rollups.rebuild(manager.iter_chunks())
+    manager.roll_history(NOW)
+    rolled = manager.get_rollup('hour')
+    manager.rollups.rebuild(manager.iter_chunks())
+    pd.testing.assert_frame_equal(rolled, manager.get_rollup('hour'))
+    assert rolled['count'].tolist() == [1]
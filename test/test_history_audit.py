@@ -0,0 +1,70 @@
+"""Test module for history verification and replay."""
+from decimal import Decimal, localcontext
+import pandas as pd
+import pytest
+from calculator.history_audit import replay_history, verify_history
+from calculator.history_manager import HistoryManager
+from calculator.operation import power, root
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path):
+    """Provide a history with one wrong result and one unknown operation."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.df = pd.DataFrame([
+        {'timestamp': '2025-03-01T10:00:00', 'value1': '4', 'value2': '6',
+         'operation': 'addition', 'result': '10'},
+        {'timestamp': '2025-03-01T10:01:00', 'value1': '7', 'value2': '2',
+         'operation': 'division', 'result': '3.5'},
+        {'timestamp': '2025-03-01T10:02:00', 'value1': '3', 'value2': '3',
+         'operation': 'multiplication', 'result': '10'},
+        {'timestamp': '2025-03-01T10:03:00', 'value1': '1', 'value2': '1',
+         'operation': 'modulus', 'result': '0'},
+    ])
+    return manager
+
+def test_verify_reports_mismatches_by_id(manager):
+    """Wrong results and unknown operations are reported with their record ids."""
+    report = verify_history(manager, workers=1)
+    assert report.checked == 4
+    assert [m.record_id for m in report.mismatches] == [2, 3]
+    assert report.mismatches[0].recomputed == '9'
+    assert "unknown operation" in report.mismatches[1].recomputed
+
+def test_verify_with_process_pool(manager):
+    """Chunks spread over a process pool give the same result."""
+    report = verify_history(manager, workers=2, chunk_size=1)
+    assert [m.record_id for m in report.mismatches] == [2, 3]
+
+def test_verify_survives_csv_round_trip(manager):
+    """Loaded history keeps exact result text, so long divisions still verify."""
+    records = manager.get_history()
+    records.loc[1, ['value1', 'value2', 'result']] = ['1', '3', str(Decimal(1) / Decimal(3))]
+    manager.df = records
+    manager.save_history()
+    manager.load_history()
+    assert [m.record_id for m in verify_history(manager, workers=1).mismatches] == [2, 3]
+
+def test_replay_pushes_history_through_calculator(manager, monkeypatch):
+    """Replay executes every known record and counts the failures."""
+    executed = []
+    monkeypatch.setattr("calculator.history_audit.Calculator.execute_operation",
+                        lambda v1, v2, op: executed.append((v1, v2, op.__name__)))
+    report = replay_history(manager)
+    assert report.replayed == 3 and report.errors == 1
+    assert executed[0] == (Decimal('4'), Decimal('6'), 'addition')
+
+def test_results_at_a_chosen_precision_verify(tmp_path):
+    """Power and root results made at a non-default precision are not mismatches."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    with localcontext() as ctx:
+        ctx.prec = 50
+        root_of_two = str(root(Decimal(2), Decimal(2)))
+    with localcontext() as ctx:
+        ctx.prec = 5
+        power_of_three = str(power(Decimal(3), Decimal('0.5')))
+    manager.df = pd.DataFrame({
+        'timestamp': ['2025-03-01T10:00:00'] * 3, 'value1': ['2', '3', '2'],
+        'value2': ['2', '0.5', '2'], 'operation': ['root', 'power', 'root'],
+        'result': [root_of_two, power_of_three, '1.5']})
+    report = verify_history(manager, workers=1)
+    assert [m.record_id for m in report.mismatches] == [2]
@@ -0,0 +1,141 @@
+"""Test module for write-behind history autosave."""
+import gc
+import time
+import weakref
+import threading
+from decimal import Decimal
+import pandas as pd
+import pytest
+from calculator.calculation import Calculation
+from calculator.history_manager import HistoryManager
+from calculator.operation import addition
+
+def add(manager, count):
+    """Add count addition records to the manager."""
+    for i in range(count):
+        manager.add_calculation(Calculation(Decimal(i), Decimal('0.5'), addition))
+
+def saved_values(manager):
+    """Return the value1 column of the history file, or [] if there is no file yet."""
+    try:
+        return list(pd.read_csv(manager.history_file, dtype=str)['value1'])
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return []
+
+def wait_for(condition, timeout=5.0):
+    """Poll until condition() is true or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path):
+    """Provide a write-behind manager that only flushes on batch size or explicitly."""
+    manager = HistoryManager(str(tmp_path / "history.csv"), autosave_interval=60,
+                             autosave_batch=5)
+    yield manager
+    manager.close()
+
+def test_batch_size_triggers_group_commit(manager):
+    """A full batch is written by the background thread without an explicit save."""
+    add(manager, 4)
+    time.sleep(0.05)
+    assert saved_values(manager) == []
+    add(manager, 1)
+    assert wait_for(lambda: len(saved_values(manager)) == 5)
+
+def test_interval_flushes_partial_batches(tmp_path):
+    """Records below the batch size are written within the interval."""
+    manager = HistoryManager(str(tmp_path / "history.csv"), autosave_interval=0.05,
+                             autosave_batch=100)
+    add(manager, 2)
+    assert wait_for(lambda: saved_values(manager) == ['0', '1'])
+    manager.close()
+
+def test_calculations_do_not_wait_for_the_disk(manager, monkeypatch):
+    """add_calculation returns while a slow group commit is in progress."""
+    original = manager._append_csv  # pylint: disable=protected-access
+    writing = threading.Event()
+
+    def slow_append(records):
+        writing.set()
+        time.sleep(0.5)
+        original(records)
+
+    monkeypatch.setattr(manager, "_append_csv", slow_append)
+    add(manager, 5)
+    assert writing.wait(5)
+    started = time.perf_counter()
+    add(manager, 4)
+    assert time.perf_counter() - started < 0.25
+    assert manager.flush() == 4
+    assert len(saved_values(manager)) == 9
+
+def test_deletes_rewrite_the_file(manager):
+    """Changes an append cannot express make the next flush rewrite the file."""
+    add(manager, 3)
+    manager.flush()
+    manager.delete_record(0)
+    add(manager, 1)
+    assert manager.flush() == 1
+    assert saved_values(manager) == ['1', '2', '0']
+    loaded = HistoryManager(manager.history_file)
+    loaded.load_history()
+    assert len(loaded) == 3
+
+def test_close_flushes_and_stops(manager):
+    """close writes everything still queued and stops the writer thread."""
+    add(manager, 2)
+    manager.close()
+    assert saved_values(manager) == ['0', '1']
+    assert not manager._writer.is_alive()  # pylint: disable=protected-access
+
+def test_flush_without_autosave_does_nothing(tmp_path):
+    """Without write-behind mode nothing is written until history save."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    add(manager, 2)
+    assert manager.flush() == 0
+    assert saved_values(manager) == []
+
+def test_unloaded_files_are_not_overwritten(manager):
+    """Autosave holds back rewrites until an existing history file has been loaded."""
+    earlier = HistoryManager(manager.history_file)
+    add(earlier, 2)
+    earlier.save_history()
+    add(manager, 4)
+    manager.delete_record(0)
+    assert manager.flush() == 0
+    assert saved_values(manager) == ['0', '1']
+    assert manager.load_history()
+    assert list(manager.get_history()['value1']) == ['0', '1', '1', '2', '3']
+    assert manager.flush() == 3
+    assert saved_values(manager) == ['0', '1', '1', '2', '3']
+
+def test_autosave_appends_to_unloaded_files(tmp_path):
+    """New records reach an existing history file that was never loaded, as in the REPL."""
+    earlier = HistoryManager(str(tmp_path / "history.csv"))
+    add(earlier, 2)
+    earlier.save_history()
+    manager = HistoryManager(earlier.history_file, autosave_interval=0.05, autosave_batch=100)
+    add(manager, 3)
+    assert wait_for(lambda: saved_values(manager) == ['0', '1', '0', '1', '2'])
+    add(manager, 1)
+    manager.close()
+    assert saved_values(manager) == ['0', '1', '0', '1', '2', '0']
+    reloaded = HistoryManager(earlier.history_file, autosave_interval=60)
+    add(reloaded, 1)
+    assert reloaded.flush() == 1
+    assert reloaded.load_history()
+    assert list(reloaded.get_history()['value1']) == ['0', '1', '0', '1', '2', '0', '0']
+    assert reloaded.flush() == 0
+    reloaded.close()
+
+def test_close_releases_the_exit_hook(tmp_path):
+    """A closed manager is no longer referenced by its exit hook."""
+    manager = HistoryManager(str(tmp_path / "history.csv"), autosave_interval=60)
+    manager.close()
+    reference = weakref.ref(manager)
+    del manager
+    gc.collect()
+    assert reference() is None
@@ -0,0 +1,141 @@
+"""Test module for the compact history dtypes."""
+from decimal import Decimal
+import pandas as pd
+import pytest
+from calculator.calculation import Calculation
+from calculator.history_dtypes import (concat_frames, decode_frame, encode_frame, memory_per_row,
+                                       text_column)
+from calculator.history_manager import HistoryManager
+from calculator.operation import addition, division
+
+def make_records(count):
+    """Build count text history records."""
+    return pd.DataFrame({
+        'timestamp': [f"2025-03-01T10:{i % 60:02d}:00.{i + 1:06d}" for i in range(count)],
+        'value1': [str(i) for i in range(count)],
+        'value2': [f"{i}.25" for i in range(count)],
+        'operation': ['addition', 'division'] * (count // 2),
+        'result': [f"{2 * i}.25" for i in range(count)],
+    })
+
+def assert_compact(frame, scales):
+    """Check the compact dtypes of a history frame."""
+    assert str(frame['operation'].dtype) == 'category'
+    assert pd.api.types.is_datetime64_any_dtype(frame['timestamp'])
+    assert str(frame['value1'].dtype) == 'int64' and scales['value1'] == 0
+    assert str(frame['value2'].dtype) == 'int64' and scales['value2'] == 2
+
+def test_round_trip_keeps_values():
+    """Encoding and decoding gives back the same records."""
+    records = make_records(4)
+    frame, scales = encode_frame(records)
+    assert_compact(frame, scales)
+    pd.testing.assert_frame_equal(decode_frame(frame, scales), records, check_dtype=False)
+
+def test_values_that_do_not_fit_keep_their_text():
+    """Values that do not fit int64 exactly keep their text, row by row."""
+    records = make_records(4)
+    records['result'] = ['1', str(Decimal(1) / Decimal(3)), '2.5', '-4']
+    frame, scales = encode_frame(records)
+    assert scales['result'] == 1 and str(frame['result'].dtype) == 'int64'
+    assert frame[text_column('result')].notna().tolist() == [False, True, False, False]
+    assert list(decode_frame(frame, scales)['result']) == list(records['result'])
+    records['result'] = [str(Decimal(i) / Decimal(7)) for i in range(1, 5)]
+    frame, scales = encode_frame(records)
+    assert scales['result'] is None and frame['result'].dtype == object
+
+def test_numbers_keep_their_written_form(tmp_path):
+    """Trailing zeros, exponents and negative zero decode to the text they were written as."""
+    written = ['1.50', '1E+3', '0.0', '-0', '7', '-2.500', '1e400', '2.25']
+    records = make_records(len(written))
+    records['result'] = written
+    parts = [encode_frame(records.iloc[:4]), encode_frame(records.iloc[4:])]
+    for frame, scales in [encode_frame(records), concat_frames(parts)]:
+        assert list(decode_frame(frame, scales)['result']) == written
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.insert_records(*encode_frame(records))
+    manager.save_history()
+    for _ in range(2):  # from the CSV, then from the snapshot
+        manager.load_history()
+        assert list(manager.get_history()['result']) == written
+
+def test_unusual_texts_round_trip():
+    """Texts the vectorized parser leaves to Decimal, or that just fit int64, decode as written."""
+    written = ['007', '+1', ' 1', '1.', '.5', '0.0000001', '1E-7', '1.0E-7', '-0.00', 'héllo',
+               '9223372036854775807', '-9223372036854775808', '12345678901234567890', 'NaN']
+    records = make_records(len(written))
+    records['value1'] = written
+    frame, scales = encode_frame(records)
+    assert scales['value1'] == 8
+    assert list(records['value1'][frame[text_column('value1')].isna()]) == ['0.0000001', '1.0E-7']
+    assert list(decode_frame(frame, scales)['value1']) == written
+    records['value1'] = written[-4:] * 3 + ['7', '-8']
+    frame, scales = encode_frame(records)
+    assert scales['value1'] == 0
+    assert list(records['value1'][frame[text_column('value1')].isna()]) == [
+        '9223372036854775807'] * 3 + ['7', '-8']
+    assert list(decode_frame(frame, scales)['value1']) == list(records['value1'])
+
+def test_concat_aligns_scales_and_categories():
+    """Appending rescales columns and merges operation categories."""
+    first = encode_frame(pd.DataFrame({'timestamp': ['2025-03-01T10:00:00'], 'value1': ['1'],
+                                       'value2': ['2'], 'operation': ['power'],
+                                       'result': ['1']}))
+    frame, scales = concat_frames([first, encode_frame(make_records(2))])
+    assert_compact(frame, scales)
+    assert list(frame['value2']) == [200, 25, 125]
+    assert set(frame['operation'].cat.categories) == {'power', 'addition', 'division'}
+    overflow = encode_frame(make_records(2).assign(value2=['9223372036854775807', '1']))
+    frame, scales = concat_frames([first, overflow, encode_frame(make_records(2))])
+    assert scales['value2'] == 2
+    assert frame[text_column('value2')].notna().tolist() == [False, True, False, False, False]
+    assert list(decode_frame(frame, scales)['value2']) == \
+        ['2', '9223372036854775807', '1', '0.25', '1.25']
+
+def test_manager_uses_compact_dtypes(tmp_path):
+    """Added and loaded records are both stored compactly."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.add_calculation(Calculation(Decimal('1'), Decimal('0.25'), addition))
+    manager.add_calculation(Calculation(Decimal('3'), Decimal('1.50'), addition))
+    assert_compact(manager.df, manager.scales)
+    manager.save_history()
+    loaded = HistoryManager(manager.history_file)
+    loaded.load_history(chunksize=1)
+    assert_compact(loaded.df, loaded.scales)
+    assert list(loaded.get_history()['value2']) == ['0.25', '1.50']
+    assert loaded.get_statistics()['average_results'] == {'addition': '2.875'}
+
+def test_division_results_stay_exact(tmp_path):
+    """Long division results survive the text fallback and a CSV round trip."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.add_calculation(Calculation(Decimal('1'), Decimal('3'), division))
+    manager.save_history()
+    manager.load_history()
+    assert manager.get_history()['result'][0] == str(Decimal(1) / Decimal(3))
+
+@pytest.mark.parametrize("stamps", [
+    ['2025-01-01T00:00:00+00:00', '2025-01-01T01:00:00+00:00'],
+    ['2025-01-01T00:00:00+00:00', '2025-01-01T03:00:00+02:00'],
+    ['2025-01-01T00:00:00', '2025-01-01T01:00:00Z'],
+])
+def test_timestamps_with_offsets_load(tmp_path, stamps):
+    """Timestamps written with UTC offsets, alone or mixed, load and keep their text."""
+    records = make_records(2)
+    records['timestamp'] = stamps
+    records.to_csv(tmp_path / "history.csv", index=False)
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    assert manager.load_history()
+    assert list(manager.get_history()['timestamp']) == stamps
+    assert manager.get_statistics()['total_calculations'] == 2
+    assert len(manager.query("timestamp >= 2025-01-01T00:30:00")) == 1
+
+def test_memory_per_row(record_property):
+    """Compact frames take a fraction of the memory of text ones."""
+    records = make_records(10000)
+    frame, _ = encode_frame(records)
+    text_bytes, compact_bytes = memory_per_row(records), memory_per_row(frame)
+    record_property("text_bytes_per_row", text_bytes)
+    record_property("compact_bytes_per_row", compact_bytes)
+    assert compact_bytes <= 40
+    assert compact_bytes < text_bytes / 4
+    assert memory_per_row(frame.iloc[:0]) == pytest.approx(0)
@@ -0,0 +1,76 @@
+"""Test module for streaming history export."""
+import json
+import tracemalloc
+from datetime import datetime
+import pandas as pd
+import pytest
+from calculator.history_archive import HistoryArchive
+from calculator.history_export import export_history
+from calculator.history_manager import HistoryManager
+from calculator.plugins.history import HistoryCommand
+
+def make_records(days):
+    """Build one addition and one division record per day of March 2025."""
+    rows = []
+    for day in days:
+        rows.append({'timestamp': f"2025-03-{day:02d}T12:00:00", 'value1': str(day),
+                     'value2': '2', 'operation': 'addition', 'result': str(day + 2)})
+        rows.append({'timestamp': f"2025-03-{day:02d}T13:00:00", 'value1': str(day),
+                     'value2': '2', 'operation': 'division', 'result': str(day / 2)})
+    return pd.DataFrame(rows)
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path, monkeypatch):
+    """Provide a manager with archived and live records, wired into the history plugin."""
+    archive = HistoryArchive(str(tmp_path / "archive"), bucket="daily")
+    manager = HistoryManager(str(tmp_path / "history.csv"), archive=archive)
+    manager.df = make_records(range(1, 11))
+    manager.roll_history(datetime(2025, 3, 10, 18))
+    monkeypatch.setattr("calculator.history_manager.history_manager", manager)
+    return manager
+
+def test_export_csv_includes_archive_and_live(manager, tmp_path):
+    """A CSV export holds every archived and live record and can be read back."""
+    path = tmp_path / "export.csv"
+    assert export_history(manager, str(path), chunksize=3) == 20
+    exported = pd.read_csv(path, dtype=str)
+    assert list(exported.columns) == ['timestamp', 'value1', 'value2', 'operation', 'result']
+    assert list(exported['value1'])[-2:] == ['10', '10']
+
+def test_export_jsonl_with_filters(manager, tmp_path):
+    """Operation and since filters are applied while streaming."""
+    path = tmp_path / "export.jsonl"
+    count = export_history(manager, str(path), 'jsonl', operation='division',
+                           since=datetime(2025, 3, 8), chunksize=2)
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert count == len(records) == 3
+    assert [record['value1'] for record in records] == ['8', '9', '10']
+    assert {record['operation'] for record in records} == {'division'}
+
+def test_export_rejects_unknown_format(manager, tmp_path):
+    """Unknown formats are refused before anything is written."""
+    with pytest.raises(ValueError, match="Unknown export format"):
+        export_history(manager, str(tmp_path / "export.xml"), 'xml')
+    assert not (tmp_path / "export.xml").exists()
+
+def test_export_command(manager, tmp_path, capsys):
+    """history export infers the format from the extension and parses the options."""
+    path = tmp_path / "out.json"
+    HistoryCommand().execute('export', str(path), '--op', 'addition', '--since', '2025-03-09')
+    assert capsys.readouterr().out.strip() == f"Exported 2 records to {path}."
+    assert json.loads(path.read_text().splitlines()[0])['result'] == '11'
+    HistoryCommand().execute('export', str(path), '--since')
+    assert capsys.readouterr().out.startswith("Usage: history export")
+    HistoryCommand().execute('export', str(path), '--since', 'yesterday')
+    assert capsys.readouterr().out.startswith("Invalid date.")
+
+def test_export_memory_is_flat(tmp_path):
+    """Peak memory during export depends on the chunk size, not the history size."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.df = make_records(list(range(1, 29)) * 200)
+    tracemalloc.start()
+    export_history(manager, str(tmp_path / "export.csv"), chunksize=500)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    text_size = manager.get_history().memory_usage(deep=True).sum()
+    assert peak < text_size / 4
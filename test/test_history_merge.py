@@ -0,0 +1,97 @@
+"""Test module for merging history files with hash-based deduplication."""
+import pandas as pd
+import pytest
+from calculator.history_dtypes import encode_frame, text_column
+from calculator.history_manager import HistoryManager
+from calculator.history_merge import merge_history, record_hashes
+from calculator.plugins.history import HistoryCommand
+
+def write_history(path, rows):
+    """Write (timestamp, value1, value2, operation, result) rows as a history CSV."""
+    pd.DataFrame(rows, columns=['timestamp', 'value1', 'value2', 'operation', 'result']) \
+        .to_csv(path, index=False)
+    return str(path)
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path):
+    """Provide a manager holding two records made in this session."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.df = pd.DataFrame({
+        'timestamp': ['2025-03-01T10:00:00', '2025-03-03T10:00:00'],
+        'value1': ['1', '3'], 'value2': ['2', '4'],
+        'operation': ['addition', 'multiplication'], 'result': ['3', '12'],
+    })
+    return manager
+
+def test_merge_adds_new_records_in_timestamp_order(manager, tmp_path):
+    """Records from several files are deduplicated and interleaved by timestamp."""
+    first = write_history(tmp_path / "a.csv", [
+        ('2025-03-01T10:00:00', '1', '2', 'addition', '3'),
+        ('2025-03-02T10:00:00', '5', '2', 'division', '2.5'),
+    ])
+    second = write_history(tmp_path / "b.csv", [
+        ('2025-03-02T10:00:00', '5', '2', 'division', '2.5'),
+        ('2025-03-04T10:00:00', '2', '3', 'power', '8'),
+        ('2025-02-28T10:00:00', '9', '1', 'subtraction', '8'),
+    ])
+    report = merge_history(manager, [first, second])
+    assert (report.files, report.read, report.added, report.duplicates) == (2, 5, 3, 2)
+    history = manager.get_history()
+    assert list(history['operation']) == ['subtraction', 'addition', 'division',
+                                          'multiplication', 'power']
+    assert manager.get_rollup('hour', 'division')['count'].tolist() == [1]
+
+def test_equal_values_written_differently_are_duplicates(manager, tmp_path):
+    """Hashes are taken over canonical values, so 3.0 and 3 are the same result."""
+    path = write_history(tmp_path / "a.csv", [
+        ('2025-03-01T10:00:00.000000', '1.00', '2', 'addition', '3.0'),
+        ('2025-03-01T10:00:00', '1', '2', 'addition', '3.01'),
+    ])
+    report = merge_history(manager, [path])
+    assert (report.added, report.duplicates) == (1, 1)
+
+def test_merge_timestamps_with_offsets(manager, tmp_path):
+    """Files with UTC offsets merge, ordered by their time in UTC."""
+    path = write_history(tmp_path / "a.csv", [
+        ('2025-03-02T10:00:00+00:00', '5', '2', 'division', '2.5'),
+        ('2025-03-01T12:00:00+05:00', '9', '1', 'subtraction', '8'),
+    ])
+    report = merge_history(manager, [path, path])
+    assert (report.added, report.duplicates, report.failures) == (2, 2, [])
+    assert list(manager.get_history()['timestamp']) == [
+        '2025-03-01T12:00:00+05:00', '2025-03-01T10:00:00', '2025-03-02T10:00:00+00:00',
+        '2025-03-03T10:00:00']
+
+def test_hashes_do_not_depend_on_the_encoding():
+    """Scaled int64 and text fallback columns hash equal values alike."""
+    scaled = encode_frame(pd.DataFrame({
+        'timestamp': ['2025-03-01T10:00:00'], 'value1': ['1.50'], 'value2': ['-20'],
+        'operation': ['addition'], 'result': ['-18.5']}))
+    text = encode_frame(pd.DataFrame({
+        'timestamp': ['2025-03-01T10:00:00', 'yesterday'], 'value1': ['1.5', '1e400'],
+        'value2': ['-2E+1', '0'], 'operation': ['addition', 'addition'],
+        'result': ['-18.500', '0']}))
+    assert text[0][text_column('value1')].notna().tolist() == [False, True]
+    assert record_hashes(*scaled)[0] == record_hashes(*text)[0]
+
+def test_unreadable_files_are_reported_and_skipped(manager, tmp_path):
+    """A missing or malformed file does not stop the other files from merging."""
+    good = write_history(tmp_path / "good.csv", [('2025-03-05T10:00:00', '1', '1', 'addition', '2')])
+    bad = tmp_path / "bad.csv"
+    bad.write_text("when,what\n1,2\n", encoding='utf-8')
+    report = merge_history(manager, [str(tmp_path / "missing.csv"), str(bad), good])
+    assert report.files == 1 and report.added == 1
+    assert [path for path, _ in report.failures] == [str(tmp_path / "missing.csv"), str(bad)]
+    assert "missing columns" in report.failures[1][1]
+
+def test_history_merge_command(manager, tmp_path, monkeypatch, capsys):
+    """'history merge' reports what it added and skipped."""
+    path = write_history(tmp_path / "a.csv", [
+        ('2025-03-01T10:00:00', '1', '2', 'addition', '3'),
+        ('2025-03-05T10:00:00', '1', '1', 'addition', '2'),
+    ])
+    monkeypatch.setattr("calculator.history_manager.history_manager", manager)
+    HistoryCommand().execute('merge', path)
+    assert capsys.readouterr().out.strip() == \
+        "Merged 1 new records from 1 file(s); skipped 1 duplicates."
+    assert len(manager) == 3
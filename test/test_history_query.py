@@ -0,0 +1,117 @@
+"""Test module for the compiled history query language."""
+import re
+import pandas as pd
+import pytest
+from calculator.history_dtypes import encode_frame
+from calculator.history_manager import HistoryManager
+from calculator.history_query import (And, Compare, QueryError, compile_query, parse_query,
+                                      run_query, sql_prefilter)
+from calculator.plugins.history import HistoryCommand
+
+RECORDS = pd.DataFrame({
+    'timestamp': ['2025-02-28T23:59:59', '2025-03-01T10:00:00', '2025-03-02T08:30:00.250000',
+                  '2025-03-03T12:00:00'],
+    'value1': ['1', '200', '5.5', '7'],
+    'value2': ['2', '1', '0.5', '3'],
+    'operation': ['addition', 'division', 'division', 'power'],
+    'result': ['3', '200', '11', '343'],
+})
+
+@pytest.fixture(name="snapshot")
+def fixture_snapshot():
+    """Provide the sample records in their compact dtypes."""
+    return encode_frame(RECORDS)
+
+def matched(query, snapshot):
+    """Return the positions of the records matching a query."""
+    return list(run_query(query, *snapshot).positions())
+
+@pytest.mark.parametrize("query, positions", [
+    ("op = division and result > 100 and ts >= 2025-03-01", [1]),
+    ("op = division", [1, 2]),
+    ("op != division", [0, 3]),
+    ("op = nothing", []),
+    ("result >= 11 and result <= 200", [1, 2]),
+    ("v1 = 5.5", [2]),
+    ("v1 = 5.55", []),
+    ("v2 < 0.75", [2]),
+    ("result > 1e30", []),
+    ("ts >= 2025-03-01 and ts < 2025-03-03", [1, 2]),
+    ("ts > 2025-03-02T08:30:00.25", [3]),
+    ("op = addition or (op = power and not v2 > 3)", [0, 3]),
+    ("OP = 'division' AND V1 != 200", [2]),
+])
+def test_queries_select_matching_records(snapshot, query, positions):
+    """Comparisons on every field combine with and, or, not and parentheses."""
+    assert matched(query, snapshot) == positions
+
+def test_text_values_are_compared_as_numbers():
+    """Values kept as text (too precise for int64) still compare exactly."""
+    records = RECORDS.assign(result=['3', '1e400', '0.1234567890123456789012345', 'n/a'])
+    frame, scales = encode_frame(records)
+    assert scales['result'] == 0
+    assert matched("result > 1", (frame, scales)) == [0, 1]
+    assert matched("result != 3", (frame, scales)) == [1, 2, 3]
+    records = RECORDS.assign(result=['1e400', '0.1234567890123456789012345', 'n/a', 'x'])
+    frame, scales = encode_frame(records)
+    assert scales['result'] is None
+    assert matched("result > 1", (frame, scales)) == [0]
+
+@pytest.mark.parametrize("query, message", [
+    ("", "Empty query"),
+    ("size = 1", "Unknown field 'size'"),
+    ("op > division", "op can only be compared with = or !="),
+    ("result >", "Query ended where a value was expected"),
+    ("v1 = abc", "Invalid number 'abc'"),
+    ("ts >= someday", "Invalid timestamp 'someday'"),
+    ("(op = division", "Query ended where ')' was expected"),
+    ("op = division result > 1", "Unexpected 'result'"),
+])
+def test_invalid_queries_raise(query, message):
+    """Parse and compile errors are reported as QueryError."""
+    with pytest.raises(QueryError, match=re.escape(message)):
+        parse_query(query)
+
+def test_compiled_queries_are_cached():
+    """A query string is parsed and compiled once."""
+    query = compile_query("op = division and ts >= 2025-03-01")
+    assert compile_query("op = division and ts >= 2025-03-01") is query
+    assert query.plan == And((Compare('operation', '=', 'division'), query.bounds[0]))
+
+def test_sorted_time_ranges_are_lazy_slices(snapshot):
+    """A pure time range on ordered timestamps is a slice, decoded only when read."""
+    result = run_query("ts >= 2025-03-01 and ts <= 2025-03-02T08:30:00.25", *snapshot)
+    assert result.rows == slice(1, 3)
+    window = result.window(1, 2)
+    assert list(window.index) == [2]
+    assert window.iloc[0]['timestamp'] == '2025-03-02T08:30:00.250000'
+
+def test_unordered_timestamps_are_scanned():
+    """Without ordered timestamps the bounds are evaluated as masks."""
+    frame, scales = encode_frame(RECORDS.iloc[::-1].reset_index(drop=True))
+    assert matched("ts >= 2025-03-01 and ts < 2025-03-03", (frame, scales)) == [1, 2]
+
+def test_sql_prefilter_splits_the_plan():
+    """Operation tests become SQL; timestamp bounds are widened and also kept for numpy."""
+    where, params, residual = sql_prefilter(parse_query(
+        "op = division and ts > 2025-03-02T08:30:00.25 and result > 100"))
+    assert where == " WHERE operation = ? AND timestamp >= ?"
+    assert params == ['division', '2025-03-02T08:30:00']
+    assert residual == And((Compare('timestamp', '>', residual.terms[0].value),
+                            Compare('result', '>', 100)))
+    assert sql_prefilter(parse_query("op != power")) == (" WHERE operation != ?", ['power'], None)
+    assert sql_prefilter(parse_query("op = power or v1 > 2"))[:2] == ("", [])
+
+def test_history_query_command(tmp_path, monkeypatch, capsys):
+    """'history query' shows matches with their record ids."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.df = RECORDS
+    monkeypatch.setattr("calculator.history_manager.history_manager", manager)
+    command = HistoryCommand()
+    command.execute('query', '"op', '=', 'division', 'and', 'result', '>', '100"')
+    output = capsys.readouterr().out
+    assert output.startswith("Found 1 records:")
+    assert "200" in output and "addition" not in output
+    command.execute('query', 'op', '<', 'x')
+    assert capsys.readouterr().out.strip() == \
+        "Invalid query: op can only be compared with = or !="
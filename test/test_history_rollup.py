@@ -0,0 +1,80 @@
+"""Test module for materialized history rollups."""
+import os
+from decimal import Decimal
+import pandas as pd
+import pytest
+from calculator.calculation import Calculation
+from calculator.history_manager import HistoryManager
+from calculator.history_rollup import RollupStore
+from calculator.operation import addition, multiplication
+from calculator.sqlite_history import SQLiteHistoryManager
+
+RECORDS = pd.DataFrame([
+    {'timestamp': '2025-03-01T10:00:05', 'operation': 'addition', 'result': '10'},
+    {'timestamp': '2025-03-01T10:00:40', 'operation': 'addition', 'result': '2.5'},
+    {'timestamp': '2025-03-01T10:01:00', 'operation': 'addition', 'result': '1'},
+    {'timestamp': '2025-03-01T11:30:00', 'operation': 'division', 'result': '4'},
+])
+
+def test_rebuild_and_incremental_updates_agree():
+    """Rebuilding from history gives the same tables as adding records one by one."""
+    rebuilt = RollupStore(["minute", "hour"])
+    rebuilt.rebuild([RECORDS])
+    incremental = RollupStore(["minute", "hour"])
+    for record in RECORDS.itertuples():
+        incremental.add(record.timestamp, record.operation, record.result)
+    assert rebuilt.tables == incremental.tables
+    hourly = rebuilt.query("hour")
+    assert hourly.values.tolist() == [['2025-03-01T10', 'addition', 3, '13.5'],
+                                      ['2025-03-01T11', 'division', 1, '4']]
+
+def test_remove_drops_empty_buckets():
+    """Removing the last record of a bucket removes the bucket."""
+    store = RollupStore(["minute"])
+    store.rebuild([RECORDS])
+    store.remove('2025-03-01T10:01:00', 'addition', '1')
+    assert store.query("minute", "addition")['bucket'].tolist() == ['2025-03-01T10:00']
+
+def test_unknown_granularity():
+    """Only configured granularities can be queried."""
+    with pytest.raises(ValueError):
+        RollupStore(["fortnight"])
+    with pytest.raises(ValueError):
+        RollupStore(["hour"]).query("minute")
+
+def test_manager_maintains_and_persists_rollups(tmp_path):
+    """Rollups follow adds and deletes, and are reloaded from disk with the history."""
+    manager = HistoryManager(str(tmp_path / "history.csv"), rollups=RollupStore(["day"]))
+    manager.add_calculation(Calculation(Decimal('2'), Decimal('3'), addition))
+    manager.add_calculation(Calculation(Decimal('2'), Decimal('3'), multiplication))
+    manager.add_calculation(Calculation(Decimal('4'), Decimal('3'), addition))
+    manager.delete_record(0)
+    assert manager.get_rollup("day", "addition")[['count', 'sum']].values.tolist() == [[1, '7']]
+    manager.save_history()
+
+    reloaded = HistoryManager(manager.history_file, rollups=RollupStore(["day"]))
+    reloaded.load_history()
+    assert reloaded.get_rollup("day").equals(manager.get_rollup("day"))
+
+def test_sqlite_manager_rebuilds_stale_rollups(tmp_path):
+    """A SQLite history without a rollup file gets its rollups rebuilt on open."""
+    database = str(tmp_path / "history.db")
+    manager = SQLiteHistoryManager(database, rollups=RollupStore(["hour"]))
+    manager.add_calculation(Calculation(Decimal('2'), Decimal('3'), addition))
+    manager.close()
+    reopened = SQLiteHistoryManager(database, rollups=RollupStore(["hour"]))
+    assert reopened.get_rollup("hour")['count'].tolist() == [1]
+    reopened.close()
+
+def test_rollups_of_an_edited_history_file_are_rebuilt(tmp_path):
+    """Persisted rollups are ignored once the CSV changes, even with the same row count."""
+    manager = HistoryManager(str(tmp_path / "history.csv"), rollups=RollupStore(["day"]))
+    manager.add_calculation(Calculation(Decimal('2'), Decimal('3'), addition))
+    manager.save_history()
+    os.remove(manager.snapshot_file)
+    edited = pd.read_csv(manager.history_file, dtype=str).assign(
+        timestamp='2025-03-01T10:00:00', result='50')
+    edited.to_csv(manager.history_file, index=False)
+    reloaded = HistoryManager(manager.history_file, rollups=RollupStore(["day"]))
+    reloaded.load_history()
+    assert reloaded.get_rollup("day").values.tolist() == [['2025-03-01', 'addition', 1, '50']]
@@ -0,0 +1,75 @@
+"""Test module for per-session history partitions."""
+import pytest
+from calculator import Calculator
+from calculator.calculations import Calculations
+from calculator.commands.command_handler import CommandHandler
+from calculator.history_manager import HistoryManager
+from calculator.history_sessions import SessionHistories, current_history, history_session
+
+@pytest.fixture(name="shared")
+def fixture_shared(tmp_path, monkeypatch):
+    """Route the process-wide history to a fresh manager for the test."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    monkeypatch.setattr("calculator.history_manager.history_manager", manager)
+    return manager
+
+@pytest.fixture(name="registry")
+def fixture_registry(tmp_path, monkeypatch):
+    """Provide a session registry in a temporary directory, used as the default one."""
+    registry = SessionHistories(str(tmp_path / "sessions"))
+    monkeypatch.setattr("calculator.history_sessions.session_histories", registry)
+    return registry
+
+def test_sessions_have_separate_histories(shared, registry):
+    """Calculations go to the active session's history, and to the shared one outside."""
+    with Calculator.session("alice"):
+        Calculator.add_numbers(1, 2)
+        Calculator.multiply_numbers(3, 4)
+        assert len(Calculations.get_history()) == 2
+    with Calculator.session("bob"):
+        Calculator.subtract_numbers(5, 1)
+        assert [calculation.perform() for calculation in Calculations.get_history()] == [4]
+    Calculator.divide_numbers(8, 2)
+    assert current_history() is shared
+    assert len(shared) == 1
+    assert {name: len(manager) for name, manager in registry.resident().items()} == \
+        {"alice": 2, "bob": 1}
+
+def test_idle_sessions_are_evicted_and_reloaded(tmp_path, registry):
+    """Over the memory budget, the least recently used session is saved and dropped."""
+    registry.memory_budget = 0
+    with history_session("alice", registry):
+        Calculator.add_numbers(1, 2)
+        with history_session("bob", registry):
+            Calculator.add_numbers(3, 4)
+        assert set(registry.resident()) == {"alice"}
+    assert not registry.resident()
+    assert (tmp_path / "sessions" / "alice.csv").exists()
+    with history_session("alice", registry) as manager:
+        assert manager.get_history()['result'].tolist() == ['3']
+
+def test_sessions_in_use_are_not_evicted(registry):
+    """A session stays resident while it is active, whatever the budget."""
+    registry.memory_budget = 0
+    with history_session("alice", registry) as manager:
+        Calculator.add_numbers(1, 2)
+        registry.evict()
+        assert registry.resident() == {"alice": manager}
+
+def test_invalid_session_ids_raise(registry):
+    """Session ids cannot name files outside the session directory."""
+    with pytest.raises(ValueError, match="Invalid session id"):
+        with history_session("../secrets", registry):
+            pass
+    with pytest.raises(ValueError, match="Invalid session id"):
+        CommandHandler(session="")
+
+def test_command_handler_session(shared, registry, capsys):
+    """A handler made for a session runs its commands in that session's history."""
+    handler = CommandHandler(session="alice")
+    handler.execute_command("add 2 3")
+    handler.execute_command("history show")
+    output = capsys.readouterr().out
+    assert "Result: 5" in output and "addition" in output
+    assert len(registry.resident()["alice"]) == 1
+    assert len(shared) == 0
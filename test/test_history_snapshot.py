@@ -0,0 +1,141 @@
+"""Test module for warm-restart history snapshots."""
+import os
+import pickle
+import time
+from decimal import Decimal
+import pandas as pd
+import pytest
+from calculator.calculation import Calculation
+from calculator.history_manager import HistoryManager
+from calculator.operation import addition, division
+
+@pytest.fixture(name="saved")
+def fixture_saved(tmp_path):
+    """Provide a manager whose history was saved, and so snapshotted."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    for i in range(5):
+        manager.add_calculation(Calculation(Decimal(i), Decimal('0.25'), addition))
+    manager.add_calculation(Calculation(Decimal('1'), Decimal('3'), division))
+    assert manager.save_history()
+    return manager
+
+def fail_csv_read(*_args, **_kwargs):
+    """Stand-in for pd.read_csv in tests that must not parse the CSV."""
+    raise AssertionError("the history file was parsed")
+
+def test_restart_restores_records_and_rollups(saved, monkeypatch):
+    """A fresh manager loads the snapshot without parsing the CSV."""
+    assert os.path.exists(saved.snapshot_file)
+    monkeypatch.setattr(pd, "read_csv", fail_csv_read)
+    restarted = HistoryManager(saved.history_file)
+    assert restarted.load_history()
+    pd.testing.assert_frame_equal(restarted.get_history(), saved.get_history())
+    assert restarted.get_statistics() == saved.get_statistics()
+    pd.testing.assert_frame_equal(restarted.get_rollup('hour'), saved.get_rollup('hour'))
+
+def test_changed_history_file_invalidates_snapshot(saved):
+    """Records added to the CSV behind the snapshot's back are still loaded."""
+    with open(saved.history_file, 'a', encoding='utf-8') as stream:
+        stream.write("2025-03-01T00:00:00,2,2,addition,4\n")
+    restarted = HistoryManager(saved.history_file)
+    assert restarted.load_history()
+    assert len(restarted) == 7
+    assert restarted.get_rollup('hour', 'addition')['count'].sum() == 6
+
+def test_damaged_snapshot_falls_back_to_csv(saved):
+    """An unreadable snapshot is ignored rather than failing the load."""
+    with open(saved.snapshot_file, 'r+b') as stream:
+        stream.seek(40)
+        stream.write(b'\x00' * 16)
+        stream.truncate(60)
+    restarted = HistoryManager(saved.history_file)
+    assert restarted.load_history()
+    pd.testing.assert_frame_equal(restarted.get_history(), saved.get_history())
+
+def test_unsaved_changes_are_not_snapshotted(saved):
+    """Without write-behind, records added since the save keep the old snapshot."""
+    before = os.path.getmtime(saved.snapshot_file)
+    saved.add_calculation(Calculation(Decimal('9'), Decimal('9'), addition))
+    assert not saved.save_snapshot()
+    assert os.path.getmtime(saved.snapshot_file) == before
+
+def test_exit_snapshot_after_write_behind_flush(tmp_path, monkeypatch):
+    """In write-behind mode save_snapshot flushes the queue and then snapshots."""
+    path = str(tmp_path / "history.csv")
+    manager = HistoryManager(path, autosave_interval=60)
+    manager.add_calculation(Calculation(Decimal('2'), Decimal('3'), addition))
+    assert manager.save_history()
+    manager.add_calculation(Calculation(Decimal('4'), Decimal('5'), addition))
+    assert manager.save_snapshot()
+    manager.close()
+    monkeypatch.setattr(pd, "read_csv", fail_csv_read)
+    restarted = HistoryManager(path)
+    assert restarted.load_history()
+    assert list(restarted.get_history()['result']) == ['5', '9']
+
+def test_text_columns_round_trip(tmp_path, monkeypatch):
+    """Columns kept as text, with missing values, come back exactly."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.df = pd.DataFrame({
+        'timestamp': ['2025-03-01T10:00:00', 'yesterday'], 'value1': ['1', '1e400'],
+        'value2': ['2', None], 'operation': ['addition', 'power'],
+        'result': ['0.1234567890123456789012345', 'résultat']})
+    assert manager.save_history()
+    monkeypatch.setattr(pd, "read_csv", fail_csv_read)
+    restarted = HistoryManager(manager.history_file)
+    assert restarted.load_history()
+    assert restarted.scales == manager.scales
+    pd.testing.assert_frame_equal(restarted.get_history(), manager.get_history())
+
+def test_texts_with_nul_characters_round_trip(tmp_path, monkeypatch):
+    """Texts that contain the NUL separator take the row-by-row path intact."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.df = pd.DataFrame({
+        'timestamp': ['a\0b', ''], 'value1': ['1', '2'], 'value2': ['\0', '3'],
+        'operation': ['addition', 'addition'], 'result': ['x', '\0\0']})
+    assert manager.save_history()
+    monkeypatch.setattr(pd, "read_csv", fail_csv_read)
+    restarted = HistoryManager(manager.history_file)
+    assert restarted.load_history()
+    pd.testing.assert_frame_equal(restarted.get_history(), manager.get_history())
+
+def test_large_text_snapshot_loads_quickly(tmp_path, monkeypatch, record_property):
+    """Text columns of a large snapshot are rebuilt in bulk, not row by row."""
+    rows = 200_000
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.df = pd.DataFrame({
+        'timestamp': [f'day {i}' for i in range(rows)], 'value1': ['1e400'] * rows,
+        'value2': [str(i) for i in range(rows)], 'operation': ['power'] * rows,
+        'result': [f'résultat {i}' for i in range(rows)]})
+    assert manager.save_history()
+    monkeypatch.setattr(pd, "read_csv", fail_csv_read)
+    restarted = HistoryManager(manager.history_file)
+    start = time.perf_counter()
+    assert restarted.load_history()
+    elapsed = time.perf_counter() - start
+    record_property("snapshot_load_seconds", elapsed)
+    assert len(restarted) == rows
+    assert restarted.get_history()['result'].iloc[-1] == f'résultat {rows - 1}'
+    # About 0.2 s here, against 0.3 s with texts decoded row by row; the bound is for slow CI
+    assert elapsed < 1.0
+
+def test_snapshots_are_never_unpickled(saved):
+    """A pickle planted as the snapshot is rejected instead of executed."""
+    class Planted:  # pylint: disable=too-few-public-methods
+        """Object whose unpickling would raise."""
+        def __reduce__(self):
+            return (os.remove, (saved.history_file,))
+    with open(saved.snapshot_file, 'wb') as stream:
+        pickle.dump(Planted(), stream)
+    restarted = HistoryManager(saved.history_file)
+    assert restarted.load_history()
+    assert os.path.exists(saved.history_file)
+    assert len(restarted) == 6
+
+def test_failed_snapshot_write_leaves_no_temporary_file(saved, monkeypatch):
+    """A snapshot that cannot be written is cleaned up."""
+    def fail(*_args, **_kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr("calculator.history_snapshot.np.savez", fail)
+    assert not saved.save_snapshot()
+    assert not os.path.exists(saved.snapshot_file + ".tmp")
@@ -0,0 +1,61 @@
+"""Test module for streaming history statistics."""
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from calculator.history_manager import HistoryManager
+from calculator.history_stats import (QuantileSketch, RunningStats, compute_statistics,
+                                      history_statistics, iter_csv_chunks)
+
+@pytest.fixture(name="values")
+def fixture_values():
+    """Random results spanning several orders of magnitude and both signs."""
+    rng = np.random.default_rng(7)
+    return np.concatenate([rng.lognormal(3, 2, 5000), -rng.exponential(10, 1000), np.zeros(50)])
+
+def test_running_stats_match_numpy(values):
+    """Chunked Welford/Chan updates agree with whole-array statistics."""
+    stats = RunningStats()
+    for chunk in np.array_split(values, 7):
+        stats.update(chunk)
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.variance == pytest.approx(values.var(ddof=1))
+    assert (stats.min, stats.max) == (values.min(), values.max())
+
+def test_sketch_quantiles_within_relative_error(values):
+    """Merged sketches report quantiles within the configured relative error."""
+    left, right = QuantileSketch(0.01), QuantileSketch(0.01)
+    left.update(values[:3000])
+    right.update(values[3000:])
+    left.merge(right)
+    ordered = np.sort(values)
+    for q in (0.01, 0.5, 0.95, 0.99):
+        exact = ordered[int(q * (len(values) - 1))]
+        assert abs(left.quantile(q) - exact) <= 0.01 * abs(exact) + 1e-12
+    assert math.isnan(QuantileSketch().quantile(0.5))
+
+def test_compute_statistics_per_operation():
+    """Statistics are grouped by operation, with unparsable results skipped."""
+    chunk = pd.DataFrame({'operation': ['addition', 'addition', 'division', 'division'],
+                          'result': ['2', '4', '0.5', 'Infinity']})
+    stats = compute_statistics([chunk, chunk])
+    assert stats['addition']['count'] == 4
+    assert stats['addition']['mean'] == pytest.approx(3)
+    assert stats['addition']['stddev'] == pytest.approx(math.sqrt(4 / 3))
+    assert stats['division']['count'] == 2
+    assert stats['all']['count'] == 6
+    assert set(stats['all']) >= {'min', 'max', 'variance', 'p50', 'p95', 'p99'}
+
+def test_statistics_from_memory_and_disk_agree(tmp_path):
+    """Loaded and on-disk histories give the same summary."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.df = pd.DataFrame({'timestamp': ['2025-03-01T10:00:00'] * 3,
+                               'value1': ['1', '2', '3'], 'value2': ['1', '1', '1'],
+                               'operation': ['addition'] * 3, 'result': ['2', '3', '4']})
+    manager.save_history()
+    from_memory = history_statistics(manager)
+    from_disk = compute_statistics(iter_csv_chunks(manager.history_file, chunksize=2))
+    assert from_memory == from_disk
+    assert manager.get_statistics()['average_results'] == {'addition': '3'}
+    assert 'numeric_result' not in manager.df.columns
@@ -0,0 +1,146 @@
+"""Test module for background jobs, timeouts and cancellation."""
+import sys
+import threading
+from decimal import Decimal
+import pandas as pd
+import pytest
+from calculator import Calculator, operation
+from calculator.commands.command_handler import CommandHandler
+from calculator.history_manager import HistoryManager
+from calculator.jobs import JobCancelled, JobRunner, checkpoint
+
+def spin(started=None, limit=10 ** 9):
+    """Loop with a checkpoint per step until cancelled."""
+    if started is not None:
+        started.set()
+    for step in range(limit):
+        checkpoint(step, limit)
+
+@pytest.fixture(name="handler")
+def fixture_handler():
+    """Provide a command handler with one background worker."""
+    handler = CommandHandler(workers=1)
+    yield handler
+    handler.shutdown()
+
+@pytest.fixture(name="runner")
+def fixture_runner():
+    """Provide a job runner with one worker."""
+    runner = JobRunner(workers=1)
+    yield runner
+    runner.shutdown()
+
+def test_heavy_command_runs_in_background(handler, capsys):
+    """A heavy command is queued and its output is reported when it finishes."""
+    job = handler.execute_command("power 2 10")
+    assert job is not None
+    assert job.wait(5)
+    output = capsys.readouterr().out
+    assert f"[job {job.id}] started: power 2 10" in output
+    assert "Result: 1024" in output
+    assert job.status == 'done'
+
+def test_light_commands_run_inline(handler, capsys):
+    """Commands that are not heavy still run at the prompt."""
+    assert handler.execute_command("add 3 4") is None
+    assert capsys.readouterr().out.strip() == "Result: 7"
+
+def test_timeout_stops_a_job(runner):
+    """A job that runs past its timeout stops at its next checkpoint."""
+    job = runner.submit("spin", spin, timeout=0.1)
+    assert job.wait(5)
+    assert job.status == 'timed out'
+    assert job.progress is not None
+
+def test_cancel_running_and_queued_jobs(runner, capsys):
+    """Cancelling stops a running job and removes a queued one before it starts."""
+    started = threading.Event()
+    running = runner.submit("spin", spin, started)
+    queued = runner.submit("never", spin)
+    assert started.wait(5)
+    assert runner.cancel(queued.id)
+    assert runner.cancel(running.id)
+    assert running.wait(5) and queued.wait(5)
+    assert (running.status, queued.status) == ('cancelled', 'cancelled')
+    assert queued.started is None
+    assert not runner.cancel(running.id)
+    assert "cancelled after" in capsys.readouterr().out
+
+def test_jobs_and_cancel_commands(handler, capsys):
+    """'jobs' lists active jobs and 'cancel' validates its argument."""
+    handler.execute_command("jobs")
+    assert capsys.readouterr().out.strip() == "No background jobs running."
+    handler.execute_command("cancel")
+    assert capsys.readouterr().out.strip() == "Usage: cancel <job id>"
+    handler.execute_command("cancel 99")
+    assert capsys.readouterr().out.strip() == "No running job 99."
+
+def test_history_subcommands_choose_where_to_run(handler):
+    """Only history subcommands that scan the whole history are heavy."""
+    command = handler.commands['history']
+    assert command.is_heavy('stats')
+    assert not command.is_heavy('page', '1')
+    assert not command.is_heavy()
+
+def test_cancelled_save_keeps_unsaved_changes(tmp_path, monkeypatch):
+    """A save stopped at a checkpoint leaves the old file in place and the changes unsaved."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    manager.df = pd.DataFrame({'timestamp': ['2025-03-01T10:00:00'], 'value1': ['1'],
+                               'value2': ['2'], 'operation': ['addition'], 'result': ['3']})
+
+    def cancelled(*_):
+        raise JobCancelled('cancelled')
+    monkeypatch.setattr("calculator.history_manager.checkpoint", cancelled)
+    with pytest.raises(JobCancelled):
+        manager.save_history()
+    assert manager.has_unsaved_changes()
+    assert not list(tmp_path.iterdir())
+
+def test_stopped_jobs_do_not_block_the_pool_or_record(runner, tmp_path, monkeypatch):
+    """A job stuck between checkpoints is replaced, and its calculation is not recorded."""
+    manager = HistoryManager(str(tmp_path / "history.csv"))
+    monkeypatch.setattr("calculator.history_manager.history_manager", manager)
+    started, release, finished = threading.Event(), threading.Event(), threading.Event()
+
+    def stuck():
+        started.set()
+        release.wait(5)
+        try:
+            Calculator.add_numbers(1, 2)
+        finally:
+            finished.set()
+    job = runner.submit("stuck", stuck)
+    assert started.wait(5) and runner.cancel(job.id)
+    follower = runner.submit("add", Calculator.add_numbers, 3, 4)
+    assert follower.wait(5) and follower.status == 'done'
+    release.set()
+    assert finished.wait(5)
+    assert manager.get_history()['result'].tolist() == ['7']
+
+def test_factorial_in_a_job_stops_at_checkpoints(runner):
+    """Large factorials reach checkpoints inside jobs."""
+    job = runner.submit("factorial", operation.factorial,
+                        Decimal(operation.MAX_FACTORIAL_OPERAND), timeout=0.05)
+    assert job.wait(5)
+    assert job.status == 'timed out' and job.progress is not None
+
+def test_shutdown_restores_stdout():
+    """Job output is routed through sys.stdout only until the runners shut down."""
+    console = sys.stdout
+    first, second = JobRunner(workers=1), JobRunner(workers=1)
+    assert first.submit("spin", spin, None, 10).wait(5)
+    assert second.submit("spin", spin, None, 10).wait(5)
+    first.shutdown()
+    assert sys.stdout is not console
+    second.shutdown()
+    assert sys.stdout is console
+
+def test_finished_jobs_are_forgotten(runner, capsys):
+    """Jobs and their output are dropped from the runner once their end is reported."""
+    done = runner.submit("print", print, "x" * 1000)
+    stopped = runner.submit("spin", spin, timeout=0.1)
+    assert done.wait(5) and stopped.wait(5)
+    assert not runner.jobs
+    assert not runner.active()
+    assert not runner.cancel(done.id)
+    assert "x" * 1000 in capsys.readouterr().out
@@ -0,0 +1,42 @@
+"""Smoke test for the load generator in benchmarks/load_test.py."""
+import os
+import importlib.util
+from decimal import Decimal
+import pytest
+from calculator.history_manager import HistoryManager
+
+def load_benchmark():
+    """Import benchmarks/load_test.py, which is a script rather than a package module."""
+    path = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'load_test.py')
+    spec = importlib.util.spec_from_file_location('load_test', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(name="load_test")
+def fixture_load_test(tmp_path, monkeypatch):
+    """Provide the load generator, recording into a temporary history with known operands."""
+    module = load_benchmark()
+    monkeypatch.setattr("calculator.history_manager.history_manager",
+                        HistoryManager(str(tmp_path / "history.csv")))
+    monkeypatch.setattr(module, "make_operands",
+                        lambda count: [(Decimal('6'), Decimal('3')), (Decimal('1'), Decimal('0'))])
+    return module
+
+@pytest.mark.parametrize("mode", ["facade", "repl"])
+def test_failed_commands_are_counted(load_test, mode):
+    """Divisions by zero count as errors whether they raise or are printed."""
+    report = load_test.run_load(users=2, mode=mode, mix=load_test.parse_mix("division=3,history=1"),
+                                count=40, sample_interval=0.01)
+    assert report.operations == 40
+    assert 0 < report.errors < 40
+    assert report.latencies['all']['count'] == 40
+
+def test_unexpected_exceptions_do_not_stop_users(load_test, monkeypatch):
+    """A user thread counts any exception as an error and keeps going."""
+    def broken(*_):
+        raise KeyError('bucket')
+    monkeypatch.setattr(load_test.Calculator, "execute_operation", broken)
+    report = load_test.run_load(users=2, mix=load_test.parse_mix("addition=1"), count=20,
+                                sample_interval=0.01)
+    assert report.operations == report.errors == 20
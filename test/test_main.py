@@ -1,8 +1,14 @@
 """Test module for calculator main functionality."""
 import sys
 import os
+import io
+import json
+from decimal import Decimal
 import pytest
-from main import calculate_and_print
+from main import calculate_and_print, main, run_batch
+from calculator.calculation import Calculation
+from calculator.history_manager import HistoryManager
+from calculator.operation import addition
 # Add parent directory to Python path for imports
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -42,3 +48,71 @@ def test_calculate_and_print(value1_str, value2_str,
     calculate_and_print(value1_str, value2_str, operation_key)
     captured = capsys.readouterr()
     assert captured.out.strip() == expected_output
+
+
+BATCH_INPUT = """operation,value1,value2
+addition,5,3
+division,1,0
+unknown,9,3
+multiplication,a,3
+
+division,20,4
+"""
+
+def test_run_batch_writes_csv_rows_and_errors():
+    """Batch mode writes one output row per input row, with per-row errors."""
+    output = io.StringIO()
+    summary = run_batch(io.StringIO(BATCH_INPUT), output, chunk_size=2)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == "value1,value2,operation,result,error"
+    assert lines[1] == "5,3,addition,8,"
+    assert lines[2] == "1,0,division,,An error occurred: Cannot divide by zero"
+    assert lines[3] == "9,3,unknown,,Unknown operation: unknown"
+    assert lines[5] == "20,4,division,5,"
+    assert summary['rows'] == 5 and summary['errors'] == 3
+
+def test_run_batch_writes_json_lines_without_header():
+    """Rows without a header are read positionally and can be written as JSON lines."""
+    output = io.StringIO()
+    run_batch(io.StringIO("2,3,multiplication\n"), output, output_format='jsonl')
+    assert json.loads(output.getvalue()) == {
+        'value1': '2', 'value2': '3', 'operation': 'multiplication',
+        'result': '6', 'error': None}
+
+def test_main_batch_mode_with_files(tmp_path, capsys):
+    """--batch reads a file, picks the output format from the extension and reports throughput."""
+    input_path = tmp_path / "input.csv"
+    input_path.write_text(BATCH_INPUT, encoding='utf-8')
+    output_path = tmp_path / "output.jsonl"
+    main(['--batch', str(input_path), '--output', str(output_path)])
+    records = [json.loads(line) for line in output_path.read_text(encoding='utf-8').splitlines()]
+    assert [record['result'] for record in records] == ['8', None, None, None, '5']
+    assert "Processed 5 rows (3 errors)" in capsys.readouterr().err
+
+def test_main_single_calculation(capsys):
+    """Positional arguments still run a single calculation."""
+    main(['4', '5', 'multiplication'])
+    assert capsys.readouterr().out.strip() == "The result of 4 multiplication 5 is equal to 20"
+    with pytest.raises(SystemExit):
+        main(['4'])
+
+def test_arithmetic_errors_are_reported(capsys):
+    """A power that overflows the decimal context prints an error line instead of raising."""
+    calculate_and_print("1e999999", "10", 'power')
+    assert capsys.readouterr().out.startswith("An error occurred: ")
+
+def test_main_batch_record_saves_history(tmp_path, monkeypatch, capsys):
+    """--record adds the batch to the history file, after what it already held."""
+    history_path = tmp_path / "history.csv"
+    earlier = HistoryManager(str(history_path))
+    earlier.add_calculation(Calculation(Decimal('1'), Decimal('1'), addition))
+    assert earlier.save_history()
+    monkeypatch.setattr("calculator.history_manager.history_manager",
+                        HistoryManager(str(history_path)))
+    input_path = tmp_path / "input.csv"
+    input_path.write_text(BATCH_INPUT, encoding='utf-8')
+    main(['--batch', str(input_path), '--output', str(tmp_path / "output.csv"), '--record'])
+    capsys.readouterr()
+    saved = HistoryManager(str(history_path))
+    assert saved.load_history()
+    assert saved.get_history()['result'].tolist() == ['2', '8', '5']
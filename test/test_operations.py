@@ -1,8 +1,10 @@
 '''Operations Testing Module'''
-from decimal import Decimal
+import math
+from decimal import Decimal, localcontext
 import pytest
 from calculator.calculation import Calculation
 from calculator.operation import addition, multiplication, subtraction, division
+from calculator.operation import power, root, modulo, factorial
 
 
 def test_operation_addition():
@@ -30,3 +32,65 @@ def test_division_by_zero():
     with pytest.raises(ValueError, match="Cannot divide by zero"):
         calc = Calculation(Decimal('5'), Decimal('0'), division)
         calc.execute()
+
+@pytest.mark.parametrize("base, exponent, expected", [
+    ('2', '10', '1024'),
+    ('2', '-3', '0.125'),
+    ('1.5', '0', '1'),
+    ('2', '0.5', '1.414213562373095048801688724'),
+    ('16', '0.4', '3.031433133020796164694519603'),
+])
+def test_operation_power(base, exponent, expected):
+    '''Verify integer and fractional powers'''
+    assert power(Decimal(base), Decimal(exponent)) == Decimal(expected)
+
+@pytest.mark.parametrize("number, degree, expected", [
+    ('27', '3', '3'),
+    ('-8', '3', '-2'),
+    ('2', '2', '1.414213562373095048801688724'),
+    ('16', '2.5', '3.031433133020796164694519603'),
+    ('16', '-2', '0.25'),
+])
+def test_operation_root(number, degree, expected):
+    '''Verify integer, negative and fractional roots'''
+    assert root(Decimal(number), Decimal(degree)) == Decimal(expected)
+
+def test_operation_root_high_precision():
+    '''Newton roots are accurate to the working precision'''
+    with localcontext() as ctx:
+        ctx.prec = 500
+        result = root(Decimal(10), Decimal(7))
+        assert abs(power(result, Decimal(7)) - 10) < Decimal(10) ** -495
+        assert power(Decimal(3), Decimal('2.75')) == Decimal(3) ** Decimal('2.75')
+
+def test_operation_modulo():
+    '''Verify modulo, including quotients larger than the precision'''
+    assert modulo(Decimal('-10'), Decimal('3')) == Decimal('-1')
+    assert modulo(Decimal('5.5'), Decimal('0.4')) == Decimal('0.3')
+    assert modulo(Decimal(10 ** 5000 + 1), Decimal(7)) == (10 ** 5000 + 1) % 7
+
+def test_operation_factorial():
+    '''Verify factorial, rounded to the working precision'''
+    assert factorial(Decimal(5)) == Decimal(120)
+    assert factorial(Decimal(0)) == Decimal(1)
+    with localcontext() as ctx:
+        ctx.prec = 200
+        assert factorial(Decimal(100)) == Decimal(math.factorial(100))
+
+@pytest.mark.parametrize("function, first, second", [
+    (power, '0', '-1'),
+    (power, '-2', '0.5'),
+    (root, '-16', '2'),
+    (root, '4', '0'),
+    (modulo, '4', '0'),
+    (factorial, '-1', '0'),
+    (factorial, '2.5', '0'),
+    (factorial, '50001', '0'),
+    (factorial, '1E+400', '0'),
+    (modulo, '1E+1000002', '7'),
+    (modulo, '1E+999999', '1E-2'),
+])
+def test_extended_operation_errors(function, first, second):
+    '''Undefined inputs raise ValueError'''
+    with pytest.raises(ValueError):
+        function(Decimal(first), Decimal(second))
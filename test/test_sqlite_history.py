@@ -0,0 +1,136 @@
+"""Test module for the SQLite history backend."""
+import sqlite3
+from decimal import Decimal
+import pandas as pd
+import pytest
+from calculator.calculation import Calculation
+from calculator.history_dtypes import encode_frame
+from calculator.history_manager import HistoryManager, create_history_manager
+from calculator.history_query import run_query
+from calculator.operation import addition, division
+from calculator.sqlite_history import SQLiteHistoryManager
+from calculator.plugins.history import HistoryCommand
+
+QUERY_RECORDS = pd.DataFrame({
+    'timestamp': ['2025-02-28T23:59:59', '2025-03-01T10:00:00', '2025-03-02T08:30:00.250000',
+                  '2025-03-03T12:00:00'],
+    'value1': ['1', '200', '5.5', '7'],
+    'value2': ['2', '1', '0.5', '3'],
+    'operation': ['addition', 'division', 'division', 'power'],
+    'result': ['3', '200', '11', '343'],
+})
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path):
+    """Provide a SQLite history manager with a small batch size."""
+    manager = SQLiteHistoryManager(str(tmp_path / "history.db"), batch_size=3)
+    for i in range(5):
+        manager.add_calculation(Calculation(Decimal(i), Decimal('2'), addition))
+    manager.add_calculation(Calculation(Decimal('9'), Decimal('3'), division))
+    yield manager
+    manager.close()
+
+def test_batches_are_flushed_on_read(manager):
+    """Pending records are visible to readers and counted immediately."""
+    assert len(manager) == 6
+    history = manager.get_history()
+    assert list(history['result']) == ['2', '3', '4', '5', '6', '3']
+    assert list(history.index) == [1, 2, 3, 4, 5, 6]
+
+def test_records_persist_across_connections(manager):
+    """Saved records are read back by a new manager."""
+    assert manager.save_history()
+    reopened = SQLiteHistoryManager(manager.history_file)
+    assert len(reopened) == 6
+    assert reopened.load_history()
+    reopened.close()
+
+def test_failed_insert_keeps_pending_records(manager):
+    """Records whose insert fails stay queued and are written by the next flush."""
+    # pylint: disable=protected-access
+    manager._conn.execute("CREATE TRIGGER refuse BEFORE INSERT ON history "
+                          "BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    manager.add_calculation(Calculation(Decimal('1'), Decimal('1'), addition))
+    manager.add_calculation(Calculation(Decimal('2'), Decimal('2'), addition))
+    with pytest.raises(sqlite3.DatabaseError, match="disk full"):
+        manager.flush()
+    assert len(manager._pending) == 2
+    manager._conn.execute("DROP TRIGGER refuse")
+    assert manager.flush() == 2
+    assert list(manager.get_history()['result'])[-2:] == ['2', '4']
+
+def test_filter_delete_and_window(manager):
+    """Filtering, deleting by record id and windows use record ids."""
+    assert list(manager.filter_by_operation('division').index) == [6]
+    assert manager.delete_record(2)
+    assert not manager.delete_record(2)
+    assert len(manager) == 5
+    assert list(manager.get_window(0, 2).index) == [1, 3]
+
+def test_statistics_aggregate_in_sql(manager):
+    """Statistics match the shape of the CSV backend's statistics."""
+    stats = manager.get_statistics()
+    assert stats['total_calculations'] == 6
+    assert stats['operations_count'] == {'addition': 5, 'division': 1}
+    assert Decimal(stats['average_results']['addition']) == Decimal('4')
+    manager.clear_history()
+    assert manager.get_statistics()['status'] == 'empty'
+
+def test_history_command_works_with_sqlite(manager, monkeypatch, capsys):
+    """The history plugin commands run unchanged on the SQLite backend."""
+    monkeypatch.setattr("calculator.history_manager.history_manager", manager)
+    command = HistoryCommand()
+    command.execute('page', '1', '4')
+    command.execute('filter', 'division')
+    command.execute('delete', '6')
+    out = capsys.readouterr().out
+    assert "Page 1 of 2 (6 records)" in out
+    assert "Found 1 records for operation 'division'" in out
+    assert "Record 6 deleted." in out
+
+def test_backend_selected_by_environment(tmp_path, monkeypatch):
+    """HISTORY_BACKEND chooses the history manager implementation."""
+    monkeypatch.setenv("HISTORY_BACKEND", "sqlite")
+    monkeypatch.setenv("HISTORY_DB", str(tmp_path / "env.db"))
+    manager = create_history_manager()
+    assert isinstance(manager, SQLiteHistoryManager)
+    manager.close()
+    monkeypatch.setenv("HISTORY_BACKEND", "csv")
+    assert isinstance(create_history_manager(), HistoryManager)
+
+def test_statistics_average_exactly(tmp_path):
+    """Averages are exact decimals, as on the CSV backend."""
+    manager = SQLiteHistoryManager(str(tmp_path / "history.db"))
+    manager.add_calculation(Calculation(Decimal('0.05'), Decimal('0.05'), addition))
+    manager.add_calculation(Calculation(Decimal('0.1'), Decimal('0.1'), addition))
+    assert manager.get_statistics()['average_results'] == {'addition': '0.15'}
+    manager.close()
+
+@pytest.mark.parametrize("deleted", [[], [1], [2, 5]])
+def test_windows_match_positions(manager, deleted):
+    """Windows are the same slices of the history with or without id gaps."""
+    for record_id in deleted:
+        manager.delete_record(record_id)
+    history = manager.get_history()
+    for start, stop in [(0, 2), (1, 3), (len(history) - 2, len(history)), (3, 10), (7, 9)]:
+        window, expected = manager.get_window(start, stop), history.iloc[start:stop]
+        assert list(window.index) == list(expected.index)
+        assert window['result'].tolist() == expected['result'].tolist()
+
+@pytest.mark.parametrize("text", [
+    "op = division and result > 100 and ts >= 2025-03-01",
+    "op != division",
+    "ts >= 2025-03-01T10:00:00 and ts <= 2025-03-02T08:30:00.25",
+    "ts = 2025-03-01T10:00:00",
+    "op = addition or (op = power and not v2 > 3)",
+    "result >= 11",
+])
+def test_query_matches_the_csv_backend(tmp_path, text):
+    """Queries pushed down into SQL select the same records as the in-memory engine."""
+    manager = SQLiteHistoryManager(str(tmp_path / "history.db"))
+    manager.insert_records(*encode_frame(QUERY_RECORDS))
+    expected = run_query(text, *encode_frame(QUERY_RECORDS)).to_frame()
+    matches = manager.query(text).to_frame()
+    assert matches['timestamp'].tolist() == expected['timestamp'].tolist()
+    assert list(matches.index) == [position + 1 for position in expected.index]
+    manager.close()